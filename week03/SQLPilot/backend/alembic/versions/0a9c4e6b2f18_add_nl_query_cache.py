@@ -0,0 +1,44 @@
+"""Add natural-language query cache
+
+Revision ID: 0a9c4e6b2f18
+Revises: f6b3d9c81e57
+Create Date: 2026-10-18 18:02:51.116053
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a9c4e6b2f18'
+down_revision: Union[str, Sequence[str], None] = 'f6b3d9c81e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('nl_query_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('connection_id', sa.Integer(), nullable=False),
+    sa.Column('schema_version', sa.Integer(), nullable=False),
+    sa.Column('question_hash', sa.String(length=64), nullable=False),
+    sa.Column('normalized_question', sa.Text(), nullable=False),
+    sa.Column('sql', sa.Text(), nullable=False),
+    sa.Column('export_format', sa.String(length=20), nullable=True),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['connection_id'], ['db_connections.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('connection_id', 'schema_version', 'question_hash')
+    )
+    op.create_index(op.f('ix_nl_query_cache_last_used_at'), 'nl_query_cache', ['last_used_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_nl_query_cache_last_used_at'), table_name='nl_query_cache')
+    op.drop_table('nl_query_cache')
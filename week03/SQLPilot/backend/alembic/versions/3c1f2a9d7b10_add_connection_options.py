@@ -0,0 +1,28 @@
+"""Add per-connection options
+
+Revision ID: 3c1f2a9d7b10
+Revises: a476ab433139
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f2a9d7b10'
+down_revision: Union[str, Sequence[str], None] = 'a476ab433139'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('db_connections', sa.Column('options', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('db_connections', 'options')
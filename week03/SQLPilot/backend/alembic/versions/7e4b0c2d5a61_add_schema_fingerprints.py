@@ -0,0 +1,30 @@
+"""Add table fingerprints and connection schema version
+
+Revision ID: 7e4b0c2d5a61
+Revises: 3c1f2a9d7b10
+Create Date: 2026-10-18 11:03:27.540116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4b0c2d5a61'
+down_revision: Union[str, Sequence[str], None] = '3c1f2a9d7b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('db_connections', sa.Column('schema_version', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('table_metadata', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('table_metadata', 'fingerprint')
+    op.drop_column('db_connections', 'schema_version')
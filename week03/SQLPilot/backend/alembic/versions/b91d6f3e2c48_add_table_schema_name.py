@@ -0,0 +1,28 @@
+"""Add schema name to table metadata
+
+Revision ID: b91d6f3e2c48
+Revises: 7e4b0c2d5a61
+Create Date: 2026-10-18 13:47:09.201553
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b91d6f3e2c48'
+down_revision: Union[str, Sequence[str], None] = '7e4b0c2d5a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('table_metadata', sa.Column('schema_name', sa.String(length=100), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('table_metadata', 'schema_name')
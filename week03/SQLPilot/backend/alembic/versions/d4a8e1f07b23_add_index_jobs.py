@@ -0,0 +1,45 @@
+"""Add index jobs
+
+Revision ID: d4a8e1f07b23
+Revises: b91d6f3e2c48
+Create Date: 2026-10-18 15:12:44.318902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8e1f07b23'
+down_revision: Union[str, Sequence[str], None] = 'b91d6f3e2c48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('index_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('connection_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('trigger', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('tables_done', sa.Integer(), nullable=False),
+    sa.Column('tables_total', sa.Integer(), nullable=True),
+    sa.Column('error', sa.String(length=1000), nullable=True),
+    sa.Column('report', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['connection_id'], ['db_connections.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_index_jobs_connection_id'), 'index_jobs', ['connection_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_index_jobs_connection_id'), table_name='index_jobs')
+    op.drop_table('index_jobs')
@@ -0,0 +1,30 @@
+"""Add foreign key targets to column metadata
+
+Revision ID: f6b3d9c81e57
+Revises: e2c7f5a39d14
+Create Date: 2026-10-18 17:21:08.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b3d9c81e57'
+down_revision: Union[str, Sequence[str], None] = 'e2c7f5a39d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('column_metadata', sa.Column('foreign_table', sa.String(length=200), nullable=True))
+    op.add_column('column_metadata', sa.Column('foreign_column', sa.String(length=100), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('column_metadata', 'foreign_column')
+    op.drop_column('column_metadata', 'foreign_table')
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
-from app.api.endpoints import connections, query
+from app.api.endpoints import connections, query, jobs
 
 api_router = APIRouter()
 api_router.include_router(connections.router, prefix="/connections", tags=["connections"])
+api_router.include_router(jobs.router, prefix="/query/jobs", tags=["jobs"])
 api_router.include_router(query.router, prefix="/query", tags=["query"])
@@ -1,26 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from app.db.session import get_db, SessionLocal
+from app.db.session import get_db
 from app.models.metadata import DBConnection, TableMetadata
-from app.schemas.connection import DBConnectionCreate, DBConnection as DBConnectionSchema
-from app.services.metadata_service import MetadataService
-from app.schemas.metadata import TableMetadata as TableMetadataSchema
+from app.schemas.connection import DBConnectionCreate, DBConnectionUpdate, DBConnection as DBConnectionSchema
+from app.services.index_job_service import index_job_manager
+from app.services.engine_registry import engine_registry
+from app.services.cursor_registry import cursor_registry
+from app.services.result_cache import result_cache
+from app.services import schema_context
+from app.schemas.metadata import TableMetadata as TableMetadataSchema, IndexJob as IndexJobSchema
 
 router = APIRouter()
 
-def index_db_task(connection_id: int):
-    db = SessionLocal()
-    try:
-        service = MetadataService(db)
-        service.index_database(connection_id)
-    finally:
-        db.close()
-
 @router.post("/", response_model=DBConnectionSchema)
 def create_connection(
-    connection: DBConnectionCreate, 
-    background_tasks: BackgroundTasks,
+    connection: DBConnectionCreate,
     db: Session = Depends(get_db)
 ):
     db_connection = DBConnection(**connection.model_dump())
@@ -28,7 +23,7 @@ def create_connection(
     db.commit()
     db.refresh(db_connection)
     
-    background_tasks.add_task(index_db_task, db_connection.id)
+    index_job_manager.enqueue(db_connection.id, trigger="create")
     return db_connection
 
 @router.get("/", response_model=List[DBConnectionSchema])
@@ -43,6 +38,42 @@ def get_connection(connection_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Connection not found")
     return connection
 
+@router.put("/{connection_id}", response_model=DBConnectionSchema)
+def update_connection(
+    connection_id: int,
+    update: DBConnectionUpdate,
+    db: Session = Depends(get_db)
+):
+    connection = db.query(DBConnection).filter(DBConnection.id == connection_id).first()
+    if connection is None:
+        raise HTTPException(status_code=404, detail="Connection not found")
+
+    changes = update.model_dump(exclude_unset=True)
+    url_changed = "connection_url" in changes and changes["connection_url"] != connection.connection_url
+    for field, value in changes.items():
+        setattr(connection, field, value)
+    db.commit()
+    db.refresh(connection)
+
+    # Drop the pooled engine and cached results so the next query uses the new settings
+    engine_registry.invalidate(connection_id)
+    result_cache.invalidate(connection_id)
+    if url_changed:
+        index_job_manager.enqueue(connection_id, trigger="update")
+    return connection
+
+@router.delete("/{connection_id}", status_code=204)
+def delete_connection(connection_id: int, db: Session = Depends(get_db)):
+    connection = db.query(DBConnection).filter(DBConnection.id == connection_id).first()
+    if connection is None:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    db.delete(connection)
+    db.commit()
+    cursor_registry.close_connection(connection_id)
+    engine_registry.invalidate(connection_id)
+    result_cache.invalidate(connection_id)
+    schema_context.evict(connection_id)
+
 @router.get("/{connection_id}/schema", response_model=List[TableMetadataSchema])
 def get_connection_schema(connection_id: int, db: Session = Depends(get_db)):
     tables = db.query(TableMetadata).filter(TableMetadata.connection_id == connection_id).all()
@@ -52,3 +83,21 @@ def get_connection_schema(connection_id: int, db: Session = Depends(get_db)):
         if not conn:
             raise HTTPException(status_code=404, detail="Connection not found")
     return tables
+
+@router.post("/{connection_id}/reindex", response_model=IndexJobSchema, status_code=202)
+def reindex_connection(connection_id: int, db: Session = Depends(get_db)):
+    connection = db.query(DBConnection).filter(DBConnection.id == connection_id).first()
+    if connection is None:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    return index_job_manager.enqueue(connection_id)
+
+@router.get("/{connection_id}/index-status", response_model=IndexJobSchema)
+def get_index_status(connection_id: int, db: Session = Depends(get_db)):
+    job = index_job_manager.latest(db, connection_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Connection has not been indexed")
+    status = IndexJobSchema.model_validate(job)
+    progress = index_job_manager.progress(job.id)
+    if progress is not None:
+        status.tables_done, status.tables_total = progress
+    return status
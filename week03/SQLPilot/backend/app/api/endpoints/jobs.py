@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.models.metadata import DBConnection
+from app.schemas.job import QueryJobCreate, QueryJob as QueryJobSchema, QueryJobRows
+from app.services.job_service import job_manager, JobNotFoundError
+from app.services.export_service import ExportService, MEDIA_TYPES
+from app.core.config import settings
+
+router = APIRouter()
+
+@router.post("/", response_model=QueryJobSchema, status_code=202)
+def submit_job(request: QueryJobCreate, db: Session = Depends(get_db)):
+    connection = db.query(DBConnection).filter(DBConnection.id == request.connection_id).first()
+    if connection is None:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    try:
+        return job_manager.submit(connection, request.sql)
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+@router.get("/{job_id}", response_model=QueryJobSchema)
+def get_job(job_id: str):
+    try:
+        return job_manager.get(job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/{job_id}/rows", response_model=QueryJobRows)
+def get_job_rows(
+    job_id: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=settings.QUERY_MAX_PAGE_SIZE),
+):
+    try:
+        job = job_manager.get(job_id)
+        rows = job_manager.read_rows(job_id, offset, limit)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return QueryJobRows(
+        data=[dict(zip(job.columns, row)) for row in rows],
+        offset=offset,
+        status=job.status,
+        rows_fetched=job.rows_fetched,
+    )
+
+@router.get("/{job_id}/export")
+def export_job(job_id: str, format: str = "csv", db: Session = Depends(get_db)):
+    try:
+        job = job_manager.get(job_id)
+        if job.status != "succeeded":
+            raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+        stream = ExportService(db).export_batches(job.columns, job_manager.iter_batches(job_id), format)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    format = format.lower()
+    return StreamingResponse(
+        stream,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=export.{format}"}
+    )
+
+@router.delete("/{job_id}", status_code=204)
+def delete_job(job_id: str):
+    try:
+        job_manager.delete(job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
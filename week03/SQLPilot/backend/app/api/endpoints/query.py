@@ -1,65 +1,308 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+import uuid
+from dataclasses import asdict
+from typing import Optional, Tuple
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import SessionLocal, get_db
+from app.models.metadata import DBConnection
+from app.schemas.job import QueryJob as QueryJobSchema
 from app.schemas.query import SQLQueryRequest, NLQueryRequest, QueryResponse, ExportQueryRequest
-from app.services.query_service import QueryService
+from app.services.query_service import QueryService, QueryResult
+from app.services.serialization import ColumnConverters, json_encoder
+from app.services.cursor_registry import cursor_registry, CursorNotFoundError
+from app.services.query_control import query_control, QueryCancelledError, QueryTimeoutError
+from app.core.config import settings
 from app.services.llm_service import LLMService
-from app.services.export_service import ExportService
+from app.services.cost_guard import QueryReroutedError
+from app.services.job_service import job_manager
+from app.services.export_service import ExportService, MEDIA_TYPES, ACCEPT_FORMATS, FormatUnavailableError
 
 router = APIRouter()
 
+COLUMNAR_MEDIA_TYPE = "application/vnd.sqlpilot.columnar+json"
+
+def _wants_columnar(http_request: Request, format: Optional[str]) -> bool:
+    if format:
+        return format == "columnar"
+    return COLUMNAR_MEDIA_TYPE in http_request.headers.get("accept", "")
+
+def _binary_format(http_request: Request, format: Optional[str]) -> Optional[str]:
+    """msgpack or arrow when requested via the format parameter or the Accept header."""
+    if format in ("msgpack", "arrow"):
+        return format
+    accept = http_request.headers.get("accept", "")
+    for media_type in accept.split(","):
+        binary_format = ACCEPT_FORMATS.get(media_type.split(";")[0].strip())
+        if binary_format:
+            return binary_format
+    return None
+
+def _build_response(result: QueryResult, columnar: bool, **fields):
+    """
+    Default shape is QueryResponse with one dict per row. The columnar shape sends column
+    metadata once and rows as arrays, encoded directly without per-row model validation.
+    """
+    fields.update(
+        next_cursor=result.next_cursor,
+        cache_hit=result.cache_hit,
+        cache_age_seconds=result.cache_age,
+        truncated=result.truncated,
+        row_limit=result.row_limit,
+        query_id=result.query_id,
+    )
+    if not columnar:
+        return QueryResponse(data=result.records(), **fields)
+
+    converters = ColumnConverters(result.columns)
+    rows = converters.convert(result.rows)
+    body = {
+        "columns": [{"name": name, "type": type_name} for name, type_name in zip(result.columns, converters.types)],
+        "rows": rows,
+        "rows_affected": result.rows_affected,
+        **fields,
+    }
+    return Response(content=json_encoder.encode(body), media_type=COLUMNAR_MEDIA_TYPE)
+
 @router.post("/sql", response_model=QueryResponse)
-def execute_sql(request: SQLQueryRequest, db: Session = Depends(get_db)):
+def execute_sql(
+    request: SQLQueryRequest,
+    http_request: Request,
+    response: Response,
+    format: Optional[str] = Query(
+        default=None, description="'columnar' for the compact JSON shape, 'msgpack' or 'arrow' for binary row batches"
+    ),
+    db: Session = Depends(get_db)
+):
     service = QueryService(db)
     try:
-        data = service.execute_sql(request.connection_id, request.sql)
-        if isinstance(data, dict):
-             return QueryResponse(data=[data], sql=request.sql)
-        return QueryResponse(data=data, sql=request.sql)
+        binary_format = _binary_format(http_request, format)
+        if binary_format:
+            # Streamed batch by batch from the target cursor; paging and the result cache do not apply
+            _, warning = service.check_cost(request.connection_id, request.sql)
+            stream = ExportService(db).export_data(
+                request.connection_id, request.sql, binary_format,
+                apply_limit=True, max_rows=request.max_rows, query_id=request.query_id,
+            )
+            headers = {"X-Query-Warning": warning} if warning else None
+            return StreamingResponse(stream, media_type=MEDIA_TYPES[binary_format], headers=headers)
+
+        result = service.execute(
+            request.connection_id,
+            request.sql,
+            page_size=request.page_size,
+            use_cache=request.use_cache,
+            max_rows=request.max_rows,
+            query_id=request.query_id,
+            optimize=request.optimize,
+            guard=True,
+            estimate=request.explain,
+        )
+        fields = {"sql": request.sql}
+        if result.optimized is not None:
+            fields.update(sql=result.optimized_sql or request.sql, original_sql=request.sql, optimized=result.optimized)
+        if result.estimate is not None:
+            fields.update(estimate=asdict(result.estimate), warning=result.warning)
+        return _build_response(result, _wants_columnar(http_request, format), **fields)
+    except QueryReroutedError as e:
+        # Too expensive to run inline: the client follows the job instead (GET /query/jobs/{id})
+        job = job_manager.submit(db.get(DBConnection, request.connection_id), request.sql)
+        response.status_code = 202
+        return QueryResponse(
+            sql=request.sql, estimate=asdict(e.estimate), warning=str(e), job=QueryJobSchema.model_validate(job)
+        )
+    except QueryTimeoutError as e:
+        raise HTTPException(status_code=408, detail=str(e))
+    except QueryCancelledError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except FormatUnavailableError as e:
+        raise HTTPException(status_code=406, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/cursors/{cursor}/next", response_model=QueryResponse)
+def fetch_next_page(
+    cursor: str,
+    http_request: Request,
+    page_size: int = Query(default=1000, ge=1, le=settings.QUERY_MAX_PAGE_SIZE),
+    format: Optional[str] = Query(default=None, description="Set to 'columnar' for the compact response shape"),
+    db: Session = Depends(get_db)
+):
+    service = QueryService(db)
+    try:
+        result = service.fetch_page(cursor, page_size)
+        return _build_response(result, _wants_columnar(http_request, format))
+    except CursorNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/cursors/{cursor}", status_code=204)
+def close_cursor(cursor: str):
+    if not cursor_registry.close(cursor):
+        raise HTTPException(status_code=404, detail="Cursor not found or expired")
+
+async def _execute_best_candidate(
+    llm_service: LLMService, query_service: QueryService, request: NLQueryRequest, candidates: int
+) -> Tuple[QueryResult, str, Optional[str]]:
+    """
+    Executes the cheapest valid candidate. If it still fails on the target, the next one is tried,
+    which costs an EXPLAIN-vetted query instead of another LLM round trip. The one that runs is
+    cached for the question.
+    """
+    ranked = await llm_service.agenerate_candidates(request.connection_id, request.question, candidates)
+    valid = [candidate for candidate in ranked if candidate.error is None]
+    if not valid:
+        raise ValueError("No valid SQL candidate: " + "; ".join(candidate.error for candidate in ranked))
+    for i, candidate in enumerate(valid):
+        try:
+            result = await run_in_threadpool(
+                query_service.execute,
+                request.connection_id, candidate.sql, use_cache=request.use_cache, query_id=request.query_id
+            )
+            # Only SQL that actually ran is cached for the question
+            await llm_service.acache_candidate(request.connection_id, request.question, candidate)
+            return result, candidate.sql, candidate.export_format
+        except (QueryTimeoutError, QueryCancelledError):
+            raise
+        except Exception:
+            if i == len(valid) - 1:
+                raise
+
 @router.post("/natural-language", response_model=QueryResponse)
-def execute_nl_query(request: NLQueryRequest, db: Session = Depends(get_db)):
+async def execute_nl_query(
+    request: NLQueryRequest,
+    http_request: Request,
+    format: Optional[str] = Query(default=None, description="Set to 'columnar' for the compact response shape"),
+    db: Session = Depends(get_db)
+):
     llm_service = LLMService(db)
     query_service = QueryService(db)
     
     try:
-        # 1. Generate SQL
-        generated_sql, export_format = llm_service.generate_sql(request.connection_id, request.question)
-        
-        # 2. Execute SQL
-        data = query_service.execute_sql(request.connection_id, generated_sql)
+        candidates = request.candidates or settings.NL_CANDIDATES
+        if candidates > 1:
+            result, generated_sql, export_format = await _execute_best_candidate(
+                llm_service, query_service, request, candidates
+            )
+        else:
+            # 1. Generate SQL (awaited, so waiting on the LLM does not hold a worker thread)
+            generated_sql, export_format = await llm_service.agenerate_sql(request.connection_id, request.question)
+
+            # 2. Execute SQL
+            result = await run_in_threadpool(
+                query_service.execute,
+                request.connection_id, generated_sql, use_cache=request.use_cache, query_id=request.query_id
+            )
         
-        if isinstance(data, dict):
-             return QueryResponse(data=[data], sql=generated_sql, suggested_export_format=export_format)
-             
-        return QueryResponse(data=data, sql=generated_sql, suggested_export_format=export_format)
+        return _build_response(
+            result, _wants_columnar(http_request, format), sql=generated_sql, suggested_export_format=export_format
+        )
         
+    except QueryTimeoutError as e:
+        raise HTTPException(status_code=408, detail=str(e))
+    except QueryCancelledError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json_encoder.encode(data)}\n\n"
+
+async def _nl_events(request: NLQueryRequest):
+    """
+    Stage events for a natural-language query: LLM tokens, the validated SQL, then row batches.
+    If the client goes away, the generator is closed: the LLM stream and the target cursor are
+    closed with it. The response body outlives the request's dependencies, so the generator
+    opens its own session.
+    """
+    db = SessionLocal()
+    llm_service = LLMService(db)
+    query_service = QueryService(db)
+    query_id = request.query_id or uuid.uuid4().hex
+    streamed = None
+    try:
+        yield _sse("stage", {"stage": "generating"})
+        async for kind, value in llm_service.astream_sql(request.connection_id, request.question):
+            if kind == "token":
+                yield _sse("token", {"text": value})
+            elif kind == "repair":
+                yield _sse("repair", {"errors": value})
+            else:
+                generated_sql, export_format = value
+
+        # Validate before announcing the SQL as final
+        await run_in_threadpool(query_service.parse, request.connection_id, generated_sql)
+        yield _sse("sql", {"sql": generated_sql, "suggested_export_format": export_format})
+
+        yield _sse("stage", {"stage": "executing", "query_id": query_id})
+        streamed = await run_in_threadpool(
+            query_service.stream_sql, request.connection_id, generated_sql, apply_limit=True, query_id=query_id
+        )
+        converters = ColumnConverters(streamed.columns)
+        yield _sse("columns", {"columns": streamed.columns})
+        while not streamed.exhausted:
+            rows = await run_in_threadpool(streamed.fetch, settings.NL_STREAM_BATCH_SIZE)
+            if rows:
+                yield _sse("rows", {"rows": converters.convert(rows), "types": converters.types})
+        yield _sse("done", {"row_count": streamed.rows_read, "truncated": streamed.truncated, "row_limit": streamed.max_rows})
+
+    except QueryTimeoutError as e:
+        yield _sse("error", {"status": 408, "detail": str(e)})
+    except QueryCancelledError as e:
+        yield _sse("error", {"status": 409, "detail": str(e)})
+    except ValueError as e:
+        yield _sse("error", {"status": 400, "detail": str(e)})
+    except Exception as e:
+        yield _sse("error", {"status": 500, "detail": str(e)})
+    finally:
+        # Shielded: this also runs when the client disconnects and the stream is cancelled
+        with anyio.CancelScope(shield=True):
+            if streamed is not None:
+                await run_in_threadpool(streamed.close)
+            await run_in_threadpool(db.close)
+
+@router.post("/natural-language/stream")
+async def stream_nl_query(request: NLQueryRequest):
+    """Server-Sent Events variant of /natural-language."""
+    return StreamingResponse(
+        _nl_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/export")
-def export_query_result(request: ExportQueryRequest, db: Session = Depends(get_db)):
+def export_query_result(request: ExportQueryRequest, http_request: Request, db: Session = Depends(get_db)):
     service = ExportService(db)
     try:
+        # A binary Accept header takes precedence over the requested format
+        format = (_binary_format(http_request, None) or request.format).lower()
+
         # Use generator to stream response
-        stream = service.export_data(request.connection_id, request.sql, request.format)
+        stream = service.export_data(request.connection_id, request.sql, format)
         
-        filename = f"export.{request.format}"
-        media_type = "text/csv" if request.format == "csv" else "application/json"
+        filename = f"export.{format}"
+        media_type = MEDIA_TYPES[format]
         
         return StreamingResponse(
             stream, 
             media_type=media_type,
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
+    except FormatUnavailableError as e:
+        raise HTTPException(status_code=406, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/{query_id}", status_code=204)
+def cancel_query(query_id: str):
+    if not query_control.cancel(query_id):
+        raise HTTPException(status_code=404, detail="Query not found or already finished")
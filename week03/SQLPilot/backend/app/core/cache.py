@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU mapping.
+    on_evict is called with (key, value) whenever an entry is dropped because the cache is full
+    or because it was removed explicitly, so owners can release resources held by the value.
+    """
+
+    def __init__(self, maxsize: int, on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        evicted = []
+        with self._lock:
+            if key in self._data:
+                old = self._data.pop(key)
+                if old is not value:
+                    evicted.append((key, old))
+            self._data[key] = value
+            while self.maxsize and len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False))
+        self._notify(evicted)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data.pop(key)
+        self._notify([(key, value)])
+        return value
+
+    def pop_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Removes every entry matching predicate(key, value) and returns how many were dropped."""
+        with self._lock:
+            evicted = [(k, v) for k, v in self._data.items() if predicate(k, v)]
+            for k, _ in evicted:
+                del self._data[k]
+        self._notify(evicted)
+        return len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            evicted = list(self._data.items())
+            self._data.clear()
+        self._notify(evicted)
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        with self._lock:
+            return iter(list(self._data.items()))
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def _notify(self, evicted) -> None:
+        # Callbacks run outside the lock so they may do slow work (e.g. closing connections).
+        if self.on_evict:
+            for key, value in evicted:
+                self.on_evict(key, value)
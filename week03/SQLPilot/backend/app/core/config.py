@@ -14,6 +14,99 @@ class Settings(BaseSettings):
     OLLAMA_BASE_URL: str = "http://localhost:11434/v1"
     OLLAMA_MODEL: str = "llama3"
 
+    # Target database engines
+    TARGET_POOL_SIZE: int = 5
+    TARGET_POOL_MAX_OVERFLOW: int = 10
+    TARGET_POOL_RECYCLE_SECONDS: int = 1800
+    TARGET_ENGINE_CACHE_SIZE: int = 32
+    TARGET_ENGINE_IDLE_SECONDS: int = 600
+
+    # Schema indexing
+    INDEX_REFLECTION_WORKERS: int = 4
+    # Indexing jobs: at most INDEX_JOB_WORKERS run at once, and at most INDEX_JOB_MAX_PER_HOST against one database server
+    INDEX_JOB_WORKERS: int = 2
+    INDEX_JOB_MAX_PER_HOST: int = 1
+    INDEX_JOB_MAX_ATTEMPTS: int = 3
+    INDEX_JOB_RETRY_DELAY_SECONDS: float = 5
+    # Connections whose rendered schema prompt is kept in memory (it is also persisted in schema_artifacts)
+    SCHEMA_PROMPT_CACHE_SIZE: int = 128
+    # Schemas with more tables than this only get the tables relevant to the question in the prompt
+    SCHEMA_PROMPT_FULL_MAX_TABLES: int = 30
+    SCHEMA_RETRIEVAL_TOP_K: int = 8
+    # Foreign-key neighbours added per retrieved table and in total (tables they reference come first)
+    SCHEMA_RETRIEVAL_NEIGHBORS_PER_TABLE: int = 3
+    SCHEMA_RETRIEVAL_MAX_NEIGHBORS: int = 8
+    # Optional "module:factory" returning an object with embed(texts) -> vectors, blended into retrieval
+    SCHEMA_EMBEDDING_BACKEND: str | None = None
+
+    # LLM client (shared per endpoint; retries use exponential backoff)
+    LLM_TIMEOUT_SECONDS: float = 60
+    LLM_MAX_RETRIES: int = 2
+    LLM_MAX_CONNECTIONS: int = 20
+
+    # Candidate SQL generation: with more than one, candidates are requested in parallel and the
+    # valid one with the lowest EXPLAIN cost is executed (requests may ask for up to NL_MAX_CANDIDATES)
+    NL_CANDIDATES: int = 1
+    NL_MAX_CANDIDATES: int = 5
+    NL_CANDIDATE_TEMPERATURE: float = 0.7
+    EXPLAIN_TIMEOUT_SECONDS: float = 5
+    # Dialect the LLM is asked to write (e.g. "postgres"), transpiled to each connection's own
+    # dialect; None asks for the connection's dialect directly
+    LLM_SQL_DIALECT: str | None = None
+    # Generated SQL referencing unknown tables/columns is sent back to the LLM with the errors this often
+    NL_REPAIR_ATTEMPTS: int = 1
+
+    # Natural-language -> SQL cache (0 TTL disables it)
+    NL_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    NL_CACHE_MAX_ENTRIES: int = 10000
+    # Reuse SQL of a differently worded question at least this similar (0-1); None only reuses exact matches
+    NL_CACHE_SIMILARITY_THRESHOLD: float | None = None
+    NL_CACHE_SIMILARITY_CANDIDATES: int = 200
+
+    # Row cap for /query/sql results (connections may override via options.max_rows; 0 disables)
+    QUERY_MAX_ROWS: int = 10000
+
+    # Statement timeout for /query/sql and exports, applied per fetch on open cursors
+    # (connections may override via options.statement_timeout; 0 disables)
+    QUERY_STATEMENT_TIMEOUT_SECONDS: float = 30
+
+    # Paged queries
+    QUERY_MAX_PAGE_SIZE: int = 10000
+    QUERY_MAX_OPEN_CURSORS: int = 64
+    QUERY_CURSOR_TTL_SECONDS: int = 300
+    # Rows per "rows" event of /query/natural-language/stream
+    NL_STREAM_BATCH_SIZE: int = 500
+
+    # Background query jobs
+    QUERY_JOB_WORKERS: int = 4
+    QUERY_JOB_MAX_PER_CONNECTION: int = 2
+    QUERY_JOB_BATCH_SIZE: int = 5000
+    QUERY_JOB_SPOOL_DIR: str | None = None # must be owned by the service user, mode 0700; defaults to a private temporary directory
+    QUERY_JOB_RETENTION_SECONDS: int = 3600
+    QUERY_JOB_MAX_RETAINED: int = 100
+    QUERY_JOB_STATEMENT_TIMEOUT_SECONDS: float = 0 # connections may override via options.job_statement_timeout
+
+    # Result cache (opt-in per request; connections may override the TTL via options.result_cache_ttl)
+    QUERY_CACHE_TTL_SECONDS: int = 300
+    QUERY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    QUERY_CACHE_MAX_ENTRY_BYTES: int = 8 * 1024 * 1024
+    QUERY_CACHE_SPILL_DIR: str | None = None # must be owned by the service user, mode 0700; unset disables spilling
+
+    # EXPLAIN-based cost guard for /query/sql (connections may override via options.guard_max_rows,
+    # guard_max_cost and guard_action); 0 disables a limit. Actions: reject, warn, job
+    QUERY_GUARD_MAX_ROWS: float = 0
+    QUERY_GUARD_MAX_COST: float = 0
+    QUERY_GUARD_ACTION: str = "reject"
+
+    # SQL validation
+    SQL_PARSE_CACHE_SIZE: int = 2048
+    SQL_TRANSPILE_CACHE_SIZE: int = 1024
+    # Optimized statements kept per connection (see SQLQueryRequest.optimize)
+    SQL_OPTIMIZE_CACHE_SIZE: int = 512
+
+    # Export
+    EXPORT_BATCH_SIZE: int = 1000
+
     model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
@@ -0,0 +1,28 @@
+import atexit
+import os
+import shutil
+import stat
+import tempfile
+from typing import Optional
+
+
+def private_directory(path: Optional[str], prefix: str) -> str:
+    """
+    A directory only the current user can read or write, for files the service loads back
+    (pickled spools and spills must not be replaceable by other local users).
+    Without a path, a fresh mkdtemp directory that is removed at exit. A configured path is
+    created with mode 0700 if missing; an existing one must be a real directory owned by the
+    current user with no group or other access, otherwise PermissionError is raised.
+    """
+    if not path:
+        path = tempfile.mkdtemp(prefix=prefix)
+        atexit.register(shutil.rmtree, path, ignore_errors=True)
+        return path
+
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} is not a directory")
+    if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        raise PermissionError(f"{path} must be owned by the service user and not accessible to others (mode 0700)")
+    return path
@@ -1,6 +1,6 @@
-from typing import List, Optional
+from typing import Any, List, Optional
 from datetime import datetime
-from sqlalchemy import String, Integer, ForeignKey, DateTime, Boolean
+from sqlalchemy import String, Integer, ForeignKey, DateTime, Boolean, JSON, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
 
@@ -12,20 +12,45 @@ class DBConnection(Base):
     db_type: Mapped[str] = mapped_column(String(50)) # postgres, mysql, sqlite
     connection_url: Mapped[str] = mapped_column(String(500)) # Encrypted ideally
     created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    options: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True) # per-connection overrides of query settings
+    schema_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0") # bumped whenever re-indexing finds changes
 
     tables: Mapped[List["TableMetadata"]] = relationship(back_populates="connection", cascade="all, delete-orphan")
+    index_jobs: Mapped[List["IndexJob"]] = relationship(back_populates="connection", cascade="all, delete-orphan")
+    schema_artifacts: Mapped[List["SchemaArtifact"]] = relationship(back_populates="connection", cascade="all, delete-orphan")
+    nl_cache_entries: Mapped[List["NLQueryCacheEntry"]] = relationship(back_populates="connection", cascade="all, delete-orphan")
+
+    def get_option(self, name: str, default: Any = None) -> Any:
+        return (self.options or {}).get(name, default)
+
+    def snapshot(self) -> "DBConnection":
+        """Detached copy for use outside the owning session, e.g. in worker threads."""
+        return DBConnection(
+            id=self.id,
+            name=self.name,
+            db_type=self.db_type,
+            connection_url=self.connection_url,
+            options=self.options,
+            schema_version=self.schema_version,
+        )
 
 class TableMetadata(Base):
     __tablename__ = "table_metadata"
 
     id: Mapped[int] = mapped_column(primary_key=True)
     connection_id: Mapped[int] = mapped_column(ForeignKey("db_connections.id"))
+    schema_name: Mapped[Optional[str]] = mapped_column(String(100), nullable=True) # None for the default schema
     table_name: Mapped[str] = mapped_column(String(100))
     description: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    fingerprint: Mapped[Optional[str]] = mapped_column(String(64), nullable=True) # hash of the reflected columns/keys
 
     connection: Mapped["DBConnection"] = relationship(back_populates="tables")
     columns: Mapped[List["ColumnMetadata"]] = relationship(back_populates="table", cascade="all, delete-orphan")
 
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.schema_name}.{self.table_name}" if self.schema_name else self.table_name
+
 class ColumnMetadata(Base):
     __tablename__ = "column_metadata"
 
@@ -35,5 +60,63 @@ class ColumnMetadata(Base):
     data_type: Mapped[str] = mapped_column(String(50))
     is_primary_key: Mapped[bool] = mapped_column(Boolean, default=False)
     is_foreign_key: Mapped[bool] = mapped_column(Boolean, default=False)
+    foreign_table: Mapped[Optional[str]] = mapped_column(String(200), nullable=True) # qualified name of the referenced table
+    foreign_column: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
 
     table: Mapped["TableMetadata"] = relationship(back_populates="columns")
+
+class IndexJob(Base):
+    __tablename__ = "index_jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    connection_id: Mapped[int] = mapped_column(ForeignKey("db_connections.id"), index=True)
+    status: Mapped[str] = mapped_column(String(20), default="queued") # queued, running, succeeded, failed
+    trigger: Mapped[str] = mapped_column(String(20), default="manual") # create, update, manual
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    tables_done: Mapped[int] = mapped_column(Integer, default=0)
+    tables_total: Mapped[Optional[int]] = mapped_column(Integer, nullable=True) # unknown until reflection starts
+    error: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
+    report: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True) # added/updated/removed tables
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    connection: Mapped["DBConnection"] = relationship(back_populates="index_jobs")
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+
+class SchemaArtifact(Base):
+    """Derived text rendered from a connection's metadata (e.g. the LLM schema prompt), cached per schema version."""
+    __tablename__ = "schema_artifacts"
+    __table_args__ = (UniqueConstraint("connection_id", "kind"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    connection_id: Mapped[int] = mapped_column(ForeignKey("db_connections.id"))
+    kind: Mapped[str] = mapped_column(String(50)) # ddl
+    schema_version: Mapped[int] = mapped_column(Integer)
+    content: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+    connection: Mapped["DBConnection"] = relationship(back_populates="schema_artifacts")
+
+class NLQueryCacheEntry(Base):
+    """SQL generated for a natural-language question, reused while the schema version is unchanged."""
+    __tablename__ = "nl_query_cache"
+    __table_args__ = (UniqueConstraint("connection_id", "schema_version", "question_hash"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    connection_id: Mapped[int] = mapped_column(ForeignKey("db_connections.id"))
+    schema_version: Mapped[int] = mapped_column(Integer)
+    question_hash: Mapped[str] = mapped_column(String(64)) # sha256 of the normalized question
+    normalized_question: Mapped[str] = mapped_column(Text)
+    sql: Mapped[str] = mapped_column(Text)
+    export_format: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    last_used_at: Mapped[datetime] = mapped_column(default=datetime.utcnow, index=True)
+
+    connection: Mapped["DBConnection"] = relationship(back_populates="nl_cache_entries")
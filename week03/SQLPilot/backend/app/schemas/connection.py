@@ -1,14 +1,22 @@
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
+from typing import Any, Dict, Optional
 
 class DBConnectionBase(BaseModel):
     name: str
     db_type: str
     connection_url: str
+    options: Optional[Dict[str, Any]] = None
 
 class DBConnectionCreate(DBConnectionBase):
     pass
 
+class DBConnectionUpdate(BaseModel):
+    name: Optional[str] = None
+    db_type: Optional[str] = None
+    connection_url: Optional[str] = None
+    options: Optional[Dict[str, Any]] = None
+
 class DBConnection(DBConnectionBase):
     id: int
     created_at: datetime
@@ -0,0 +1,26 @@
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+class QueryJobCreate(BaseModel):
+    connection_id: int
+    sql: str
+
+class QueryJob(BaseModel):
+    id: str
+    connection_id: int
+    sql: str
+    status: str # queued, running, succeeded, failed, cancelled
+    error: Optional[str] = None
+    columns: List[str]
+    rows_fetched: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class QueryJobRows(BaseModel):
+    data: List[Dict[str, Any]]
+    offset: int
+    status: str
+    rows_fetched: int
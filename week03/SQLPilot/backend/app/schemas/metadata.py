@@ -1,15 +1,35 @@
 from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 class ColumnMetadata(BaseModel):
     column_name: str
     data_type: str
     is_primary_key: bool
     is_foreign_key: bool
+    foreign_table: Optional[str] = None
+    foreign_column: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
 class TableMetadata(BaseModel):
+    schema_name: Optional[str] = None
     table_name: str
     description: Optional[str] = None
     columns: List[ColumnMetadata]
     model_config = ConfigDict(from_attributes=True)
+
+class IndexJob(BaseModel):
+    id: int
+    connection_id: int
+    status: str # queued, running, succeeded, failed
+    trigger: str
+    attempts: int
+    tables_done: int
+    tables_total: Optional[int] = None
+    error: Optional[str] = None
+    report: Optional[Dict[str, Any]] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    model_config = ConfigDict(from_attributes=True)
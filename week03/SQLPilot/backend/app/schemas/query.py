@@ -1,21 +1,58 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Union, Optional
+from app.core.config import settings
+from app.schemas.job import QueryJob
 
 class SQLQueryRequest(BaseModel):
     connection_id: int
     sql: str
+    # When set, only the first page is returned along with a cursor for the rest
+    page_size: Optional[int] = Field(default=None, ge=1, le=settings.QUERY_MAX_PAGE_SIZE)
+    use_cache: bool = False
+    # Tightens the connection's row cap for this query
+    max_rows: Optional[int] = Field(default=None, ge=1)
+    # Client-chosen id for cancelling the query while it runs (DELETE /query/{query_id})
+    query_id: Optional[str] = Field(default=None, max_length=64)
+    # Rewrite the statement with the sqlglot optimizer before running it (single SELECTs only)
+    optimize: bool = False
+    # Return the planner's estimate even when the connection has no cost limits
+    explain: bool = False
 
 class NLQueryRequest(BaseModel):
     connection_id: int
     question: str
+    use_cache: bool = False
+    query_id: Optional[str] = Field(default=None, max_length=64)
+    # Candidate queries to generate and rank by EXPLAIN cost (defaults to NL_CANDIDATES)
+    candidates: Optional[int] = Field(default=None, ge=1, le=settings.NL_MAX_CANDIDATES)
 
 class ExportQueryRequest(BaseModel):
     connection_id: int
     sql: str
-    format: str
+    format: str # csv, json or ndjson
+
+class QueryEstimate(BaseModel):
+    # Planner cost in the database's own units
+    cost: Optional[float] = None
+    rows: Optional[float] = None
+    details: List[str] = []
 
 class QueryResponse(BaseModel):
     data: Optional[List[Dict[str, Any]]] = None
     sql: Optional[str] = None
     error: Optional[str] = None
     suggested_export_format: Optional[str] = None
+    next_cursor: Optional[str] = None
+    cache_hit: Optional[bool] = None
+    cache_age_seconds: Optional[float] = None
+    truncated: bool = False
+    row_limit: Optional[int] = None
+    query_id: Optional[str] = None
+    # Set when optimization was requested: sql is then the statement that ran
+    optimized: Optional[bool] = None
+    original_sql: Optional[str] = None
+    estimate: Optional[QueryEstimate] = None
+    # Cost guard warning when the query ran although over a limit
+    warning: Optional[str] = None
+    # Set instead of data when the cost guard moved the query to a background job
+    job: Optional[QueryJob] = None
@@ -0,0 +1,70 @@
+from typing import List, Optional, Tuple
+from app.core.config import settings
+from app.models.metadata import DBConnection
+from app.services.explain_service import ExplainError, ExplainService, PlanEstimate
+from app.services.query_control import QueryTimeoutError
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRejectedError(ValueError):
+    """The planner's estimate exceeds the connection's limits."""
+
+    def __init__(self, message: str, estimate: PlanEstimate):
+        super().__init__(message)
+        self.estimate = estimate
+
+
+class QueryReroutedError(Exception):
+    """The query is too expensive to run inline and should run as a background job instead."""
+
+    def __init__(self, message: str, estimate: PlanEstimate):
+        super().__init__(message)
+        self.estimate = estimate
+
+
+class CostGuard:
+    """
+    Pre-flight admission control: EXPLAINs a statement (see ExplainService) and compares the
+    estimate with the connection's guard_max_rows / guard_max_cost options (QUERY_GUARD_MAX_*
+    by default; 0 disables a limit). Over a limit, guard_action decides: "reject" raises
+    QueryRejectedError, "warn" lets the query run with a warning, "job" raises
+    QueryReroutedError so the caller can submit it to the job manager.
+    Statements the planner rejects or cannot plan in time are let through; running them
+    reports the real error.
+    """
+
+    def __init__(self, explain_service: Optional[ExplainService] = None):
+        self.explain_service = explain_service or ExplainService()
+
+    def check(self, connection: DBConnection, sql: str, estimate: bool = False) -> Tuple[Optional[PlanEstimate], Optional[str]]:
+        """
+        (estimate, warning) for the statement. Without limits configured nothing is explained
+        unless estimate is set.
+        """
+        max_rows = connection.get_option("guard_max_rows", settings.QUERY_GUARD_MAX_ROWS)
+        max_cost = connection.get_option("guard_max_cost", settings.QUERY_GUARD_MAX_COST)
+        if not (max_rows or max_cost or estimate):
+            return None, None
+        try:
+            plan = self.explain_service.explain(connection, sql)
+        except (ExplainError, QueryTimeoutError) as e:
+            logger.info(f"Skipping cost guard for connection {connection.id}: {e}")
+            return None, None
+
+        exceeded: List[str] = []
+        if max_rows and plan.rows is not None and plan.rows > max_rows:
+            exceeded.append(f"{plan.rows:,.0f} estimated rows (limit {max_rows:,.0f})")
+        if max_cost and plan.cost is not None and plan.cost > max_cost:
+            exceeded.append(f"estimated cost {plan.cost:,.0f} (limit {max_cost:,.0f})")
+        if not exceeded:
+            return plan, None
+
+        message = "Query exceeds the connection's cost limits: " + ", ".join(exceeded)
+        action = connection.get_option("guard_action", settings.QUERY_GUARD_ACTION)
+        if action == "warn":
+            return plan, message
+        if action == "job":
+            raise QueryReroutedError(message, plan)
+        raise QueryRejectedError(message, plan)
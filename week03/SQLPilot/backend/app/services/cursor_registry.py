@@ -0,0 +1,84 @@
+import secrets
+import threading
+import time
+from typing import List, Optional, Tuple
+from app.core.cache import LRUCache
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CursorNotFoundError(LookupError):
+    pass
+
+
+class _CursorEntry:
+    def __init__(self, connection_id: int, streamed):
+        self.connection_id = connection_id
+        self.streamed = streamed
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class CursorRegistry:
+    """
+    Keeps open result sets of paged queries between requests, addressed by opaque tokens.
+    Each open cursor holds a pooled target connection, so the number of cursors is capped
+    and cursors idle for longer than the TTL are closed.
+    """
+
+    def __init__(self, max_cursors: int, ttl: float):
+        self.ttl = ttl
+        self._entries = LRUCache(max_cursors, on_evict=self._close_entry)
+
+    def register(self, connection_id: int, streamed) -> str:
+        self._evict_expired()
+        token = secrets.token_urlsafe(24)
+        self._entries.set(token, _CursorEntry(connection_id, streamed))
+        return token
+
+    def fetch(self, token: str, page_size: int) -> Tuple[List[str], List[tuple], Optional[str]]:
+        """Returns (columns, rows, next_token); next_token is None once the result is exhausted."""
+        self._evict_expired()
+        entry = self._entries.get(token)
+        if entry is None:
+            raise CursorNotFoundError("Cursor not found or expired")
+
+        with entry.lock:
+            try:
+                rows = entry.streamed.fetch(page_size)
+            except Exception:
+                self.close(token)
+                raise
+            entry.last_used = time.monotonic()
+            columns = entry.streamed.columns
+            exhausted = entry.streamed.exhausted
+
+        if exhausted:
+            self.close(token)
+            return columns, rows, None
+        return columns, rows, token
+
+    def close(self, token: str) -> bool:
+        return self._entries.pop(token) is not None
+
+    def close_connection(self, connection_id: int) -> None:
+        self._entries.pop_where(lambda _, entry: entry.connection_id == connection_id)
+
+    def _evict_expired(self) -> None:
+        deadline = time.monotonic() - self.ttl
+        self._entries.pop_where(lambda _, entry: entry.last_used < deadline and not entry.lock.locked())
+
+    @staticmethod
+    def _close_entry(token, entry: _CursorEntry) -> None:
+        try:
+            entry.streamed.close()
+        except Exception as e:
+            logger.warning(f"Error closing cursor: {e}")
+
+
+cursor_registry = CursorRegistry(
+    max_cursors=settings.QUERY_MAX_OPEN_CURSORS,
+    ttl=settings.QUERY_CURSOR_TTL_SECONDS,
+)
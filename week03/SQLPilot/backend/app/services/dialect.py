@@ -0,0 +1,120 @@
+from functools import lru_cache
+from typing import Optional
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import ArgumentError
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.metadata import DBConnection
+from app.services.security_service import SecurityService
+
+# DBConnection.db_type or SQLAlchemy backend name -> sqlglot dialect
+SQLGLOT_DIALECTS = {
+    "postgres": "postgres",
+    "postgresql": "postgres",
+    "redshift": "redshift",
+    "mysql": "mysql",
+    "mariadb": "mysql",
+    "sqlite": "sqlite",
+    "mssql": "tsql",
+    "oracle": "oracle",
+    "snowflake": "snowflake",
+    "bigquery": "bigquery",
+    "duckdb": "duckdb",
+    "trino": "trino",
+    "clickhouse": "clickhouse",
+}
+
+# sqlglot dialect -> name used when instructing the LLM
+DIALECT_NAMES = {
+    "postgres": "PostgreSQL",
+    "redshift": "Amazon Redshift",
+    "mysql": "MySQL",
+    "sqlite": "SQLite",
+    "tsql": "SQL Server (T-SQL)",
+    "oracle": "Oracle",
+    "snowflake": "Snowflake",
+    "bigquery": "BigQuery",
+    "duckdb": "DuckDB",
+    "trino": "Trino",
+    "clickhouse": "ClickHouse",
+}
+
+# sqlglot dialect -> schema that unqualified names resolve to (MySQL: the URL's database)
+DEFAULT_SCHEMAS = {
+    "postgres": "public",
+    "redshift": "public",
+    "sqlite": "main",
+    "duckdb": "main",
+    "tsql": "dbo",
+    "snowflake": "public",
+}
+
+# (sql, source dialect, target dialect) -> transpiled sql
+_transpile_cache = LRUCache(settings.SQL_TRANSPILE_CACHE_SIZE)
+
+
+@lru_cache(maxsize=256)
+def _url_backend(connection_url: str) -> Optional[str]:
+    try:
+        return make_url(connection_url).get_backend_name()
+    except ArgumentError:
+        return None
+
+
+def resolve_dialect(connection: DBConnection) -> Optional[str]:
+    """
+    sqlglot dialect of a connection: options.dialect if set, otherwise derived from db_type or
+    the URL's backend. None (sqlglot's generic dialect) when neither is recognised.
+    """
+    explicit = connection.get_option("dialect", None)
+    if explicit:
+        return explicit
+    for name in (connection.db_type, _url_backend(connection.connection_url)):
+        dialect = SQLGLOT_DIALECTS.get((name or "").lower())
+        if dialect:
+            return dialect
+    return None
+
+
+@lru_cache(maxsize=256)
+def url_database(connection_url: str) -> Optional[str]:
+    try:
+        return make_url(connection_url).database
+    except ArgumentError:
+        return None
+
+
+def default_schema(connection: DBConnection) -> Optional[str]:
+    """
+    The schema the connection's unqualified table names live in, i.e. the one the metadata
+    stores as None. None when the dialect has no fixed default.
+    """
+    dialect = resolve_dialect(connection)
+    if dialect == "mysql":
+        return url_database(connection.connection_url) or None
+    return DEFAULT_SCHEMAS.get(dialect)
+
+
+def dialect_name(dialect: Optional[str]) -> str:
+    if not dialect:
+        return "standard SQL"
+    return DIALECT_NAMES.get(dialect, dialect)
+
+
+def transpile(sql: str, read: Optional[str], write: Optional[str]) -> str:
+    """
+    Rewrites SQL from one dialect into another; repeated statements come from a cache. Both the
+    source and the output are validated by SecurityService.parse in their own dialect (raises
+    ValueError), since the output is what runs and generation can change its meaning.
+    """
+    if read == write:
+        return sql
+    key = (sql.strip(), read, write)
+    transpiled = _transpile_cache.get(key)
+    if transpiled is None:
+        security_service = SecurityService()
+        parsed = security_service.parse(sql, read)
+        transpiled = ";\n".join(expression.sql(dialect=write) for expression in parsed.expressions)
+        security_service.parse(transpiled, write)
+        _transpile_cache.set(key, transpiled)
+    return transpiled
@@ -0,0 +1,76 @@
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from app.core.cache import LRUCache
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _EngineEntry:
+    def __init__(self, engine: Engine, connection_url: str):
+        self.engine = engine
+        self.connection_url = connection_url
+        self.last_used = time.monotonic()
+
+
+class EngineRegistry:
+    """
+    Process-wide cache of SQLAlchemy engines for target databases, keyed by DBConnection.id.
+    Engines keep their connection pool between requests; least recently used and idle engines
+    are disposed so the process does not hold connections to databases nobody is querying.
+    """
+
+    def __init__(self, max_engines: int, idle_timeout: float):
+        self.idle_timeout = idle_timeout
+        self._entries = LRUCache(max_engines, on_evict=self._dispose_entry)
+        self._lock = threading.Lock()
+
+    def get_engine(self, connection) -> Engine:
+        self._evict_idle()
+        entry = self._entries.get(connection.id)
+        if entry is None or entry.connection_url != connection.connection_url:
+            with self._lock:
+                entry = self._entries.get(connection.id)
+                if entry is None or entry.connection_url != connection.connection_url:
+                    # URL changed (or first use): replacing the entry disposes the stale engine
+                    entry = _EngineEntry(self._create_engine(connection.connection_url), connection.connection_url)
+                    self._entries.set(connection.id, entry)
+        entry.last_used = time.monotonic()
+        return entry.engine
+
+    def invalidate(self, connection_id: int) -> None:
+        self._entries.pop(connection_id)
+
+    def dispose_all(self) -> None:
+        self._entries.clear()
+
+    def _create_engine(self, connection_url: str) -> Engine:
+        kwargs = {"pool_pre_ping": True}
+        if make_url(connection_url).get_backend_name() != "sqlite":
+            # SQLite uses file/singleton pools that do not accept sizing arguments
+            kwargs.update(
+                pool_size=settings.TARGET_POOL_SIZE,
+                max_overflow=settings.TARGET_POOL_MAX_OVERFLOW,
+                pool_recycle=settings.TARGET_POOL_RECYCLE_SECONDS,
+            )
+        return create_engine(connection_url, **kwargs)
+
+    def _evict_idle(self) -> None:
+        if not self.idle_timeout:
+            return
+        deadline = time.monotonic() - self.idle_timeout
+        self._entries.pop_where(lambda _, entry: entry.last_used < deadline)
+
+    @staticmethod
+    def _dispose_entry(connection_id, entry: _EngineEntry) -> None:
+        logger.info(f"Disposing engine for connection {connection_id}")
+        entry.engine.dispose()
+
+
+engine_registry = EngineRegistry(
+    max_engines=settings.TARGET_ENGINE_CACHE_SIZE,
+    idle_timeout=settings.TARGET_ENGINE_IDLE_SECONDS,
+)
@@ -0,0 +1,112 @@
+import json
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from app.core.config import settings
+from app.models.metadata import DBConnection
+from app.services.engine_registry import engine_registry
+from app.services.query_control import query_control
+import logging
+
+logger = logging.getLogger(__name__)
+
+# SQLite's EXPLAIN QUERY PLAN has no cost model; full scans are ranked far above index lookups
+SQLITE_SCAN_COST = 1000.0
+SQLITE_SEARCH_COST = 10.0
+
+
+class ExplainError(ValueError):
+    """The target database rejected the statement while planning it."""
+
+
+@dataclass
+class PlanEstimate:
+    # Planner cost in the database's own units; only comparable within one connection
+    cost: Optional[float] = None
+    # Estimated rows returned (or scanned, where that is all the planner reports)
+    rows: Optional[float] = None
+    details: List[str] = field(default_factory=list)
+
+
+class ExplainService:
+    """
+    Runs EXPLAIN (never ANALYZE, so nothing is executed) on the pooled target engine and
+    extracts the planner's estimates:
+      - postgresql: EXPLAIN (FORMAT JSON) -> Total Cost / Plan Rows of the root node
+      - mysql/mariadb: EXPLAIN FORMAT=JSON -> query_cost / rows examined
+      - sqlite: EXPLAIN QUERY PLAN -> heuristic cost from full scans vs. index searches
+    Other dialects are planned with a plain EXPLAIN and get no estimate.
+    """
+
+    def explain(self, connection: DBConnection, sql: str) -> PlanEstimate:
+        engine = engine_registry.get_engine(connection)
+        backend = engine.dialect.name
+        sql = sql.strip().rstrip(";")
+        try:
+            with query_control.track(None, connection.id, settings.EXPLAIN_TIMEOUT_SECONDS) as handle, \
+                    engine.connect() as conn:
+                handle.attach(conn, engine)
+                try:
+                    if backend == "postgresql":
+                        return self._postgres(conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar())
+                    if backend in ("mysql", "mariadb"):
+                        return self._mysql(conn.execute(text(f"EXPLAIN FORMAT=JSON {sql}")).scalar())
+                    if backend == "sqlite":
+                        return self._sqlite(conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall())
+                    conn.execute(text(f"EXPLAIN {sql}")).fetchall()
+                    return PlanEstimate()
+                except DBAPIError as e:
+                    error = handle.translate(e)
+                    if error is e:
+                        raise ExplainError(str(e.orig)) from e
+                    raise error from e
+                finally:
+                    handle.detach()
+        except ExplainError:
+            raise
+        except Exception as e:
+            logger.error(f"Error explaining query: {e}")
+            raise e
+
+    @staticmethod
+    def _postgres(plan: Any) -> PlanEstimate:
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]["Plan"]
+        return PlanEstimate(cost=root.get("Total Cost"), rows=root.get("Plan Rows"), details=[root.get("Node Type", "")])
+
+    @staticmethod
+    def _mysql(plan: Any) -> PlanEstimate:
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        block = plan.get("query_block", {})
+        cost = block.get("cost_info", {}).get("query_cost")
+        tables = []
+
+        def collect(node: Any) -> None:
+            if isinstance(node, dict):
+                if "table_name" in node and "rows_examined_per_scan" in node:
+                    tables.append(node)
+                for value in node.values():
+                    collect(value)
+            elif isinstance(node, list):
+                for value in node:
+                    collect(value)
+
+        collect(block)
+        rows = max((float(t["rows_examined_per_scan"]) for t in tables), default=None)
+        return PlanEstimate(
+            cost=float(cost) if cost is not None else None,
+            rows=rows,
+            details=[f"{t['table_name']}: {t.get('access_type', '')}" for t in tables],
+        )
+
+    @staticmethod
+    def _sqlite(rows: List[Any]) -> PlanEstimate:
+        details = [row[-1] for row in rows]
+        cost = sum(
+            SQLITE_SCAN_COST if detail.startswith("SCAN") else SQLITE_SEARCH_COST if detail.startswith("SEARCH") else 0.0
+            for detail in details
+        )
+        return PlanEstimate(cost=cost, details=details)
@@ -1,63 +1,114 @@
 import csv
-import json
+import functools
 import io
-from typing import List, Dict, Any, Generator
+from typing import Iterator, List, Optional, Union
 from sqlalchemy.orm import Session
-from app.services.query_service import QueryService
+from app.core.config import settings
+from app.services.query_service import QueryService, StreamedResult
+from app.services import serialization
+from app.services.serialization import ColumnConverters, json_encoder, msgpack_stream, arrow_stream, arrow_types
+
+SUPPORTED_FORMATS = ("csv", "json", "ndjson", "msgpack", "arrow")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "msgpack": "application/vnd.msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Accept header values that select a binary row-batch format
+ACCEPT_FORMATS = {
+    "application/vnd.msgpack": "msgpack",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/vnd.apache.arrow.stream": "arrow",
+}
+
+class FormatUnavailableError(ValueError):
+    """The format is known but its optional library is not installed."""
 
 class ExportService:
     def __init__(self, db: Session):
         self.query_service = QueryService(db)
 
-    def export_data(self, connection_id: int, sql: str, format: str) -> Generator[str, None, None]:
-        # Execute query using existing service logic
-        # We need to get the raw result or data list. 
-        # QueryService.execute_sql returns a list of dicts or a message dict.
-        
-        data = self.query_service.execute_sql(connection_id, sql)
-        
-        if isinstance(data, dict) and "message" in data:
-            # It was a non-returning query (INSERT/UPDATE), nothing to export
-            yield ""
-            return
-
-        if not data:
-            yield ""
-            return
-
-        if format.lower() == 'csv':
-            yield from self._to_csv(data)
-        elif format.lower() == 'json':
-            yield self._to_json(data)
-        else:
+    def export_data(
+        self,
+        connection_id: int,
+        sql: str,
+        format: str,
+        apply_limit: bool = False,
+        max_rows: Optional[int] = None,
+        query_id: Optional[str] = None,
+    ) -> Iterator[Union[str, bytes]]:
+        """
+        Executes the query and returns a generator of export chunks.
+        The query runs (and errors surface) before the first chunk, but rows are only
+        read from the target cursor as the response is consumed.
+        """
+        writer = self._writer(format)
+        streamed = self.query_service.stream_sql(
+            connection_id, sql, apply_limit=apply_limit, max_rows=max_rows, query_id=query_id
+        )
+        if writer is arrow_stream:
+            writer = functools.partial(arrow_stream, types=arrow_types(streamed.dialect, streamed.description))
+        return self._stream(streamed, writer)
+
+    def export_batches(self, columns: List[str], batches: Iterator[List[tuple]], format: str) -> Iterator[Union[str, bytes]]:
+        """Formats rows that were already fetched, e.g. the spooled result of a query job."""
+        return self._writer(format)(columns, batches)
+
+    def _writer(self, format: str):
+        format = format.lower()
+        if format not in SUPPORTED_FORMATS:
             raise ValueError(f"Unsupported format: {format}")
+        if format == "msgpack" and serialization.msgpack is None:
+            raise FormatUnavailableError("MessagePack output requires the optional 'msgpack' package")
+        if format == "arrow" and serialization.pyarrow is None:
+            raise FormatUnavailableError("Arrow output requires the optional 'pyarrow' package")
+        writers = {
+            "csv": self._to_csv,
+            "json": self._to_json,
+            "ndjson": self._to_ndjson,
+            "msgpack": msgpack_stream,
+            "arrow": arrow_stream,
+        }
+        return writers[format]
 
-    def _to_csv(self, data: List[Dict[str, Any]]) -> Generator[str, None, None]:
-        if not data:
-            return
-        
+    def _stream(self, streamed: StreamedResult, writer) -> Iterator[str]:
+        try:
+            yield from writer(streamed.columns, streamed.batches(settings.EXPORT_BATCH_SIZE))
+        finally:
+            streamed.close()
+
+    def _to_csv(self, columns: List[str], batches: Iterator[List[tuple]]) -> Iterator[str]:
         output = io.StringIO()
-        # Get headers from the first dictionary
-        headers = list(data[0].keys())
-        writer = csv.DictWriter(output, fieldnames=headers)
+        writer = csv.writer(output)
         
-        # Write header
-        writer.writeheader()
+        # Header goes out immediately so time-to-first-byte does not depend on the result size
+        writer.writerow(columns)
         yield output.getvalue()
-        output.seek(0)
-        output.truncate(0)
         
-        # Write rows
-        for row in data:
-            writer.writerow(row)
-            yield output.getvalue()
+        # One chunk per fetched batch rather than per row
+        for rows in batches:
             output.seek(0)
             output.truncate(0)
+            writer.writerows(rows)
+            yield output.getvalue()
 
-    def _to_json(self, data: List[Dict[str, Any]]) -> str:
-        # For JSON, we typically return the whole list at once or stream array elements.
-        # Streaming valid JSON array is a bit tricky (comma handling), 
-        # but for simplicity we can dump the whole thing if it fits in memory, 
-        # or do a simple manual stream: [ ... , ... ]
-        
-        return json.dumps(data, default=str, indent=2)
+    def _to_json(self, columns: List[str], batches: Iterator[List[tuple]]) -> Iterator[str]:
+        # A single JSON array written element by element; the separator is emitted
+        # ahead of every batch except the first so the document stays valid
+        converters = ColumnConverters(columns)
+        yield "["
+        separator = ""
+        for rows in batches:
+            yield separator + ",".join(json_encoder.encode(record) for record in converters.records(rows))
+            separator = ","
+        yield "]"
+
+    def _to_ndjson(self, columns: List[str], batches: Iterator[List[tuple]]) -> Iterator[str]:
+        converters = ColumnConverters(columns)
+        for rows in batches:
+            yield "".join(json_encoder.encode(record) + "\n" for record in converters.records(rows))
@@ -0,0 +1,198 @@
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import ArgumentError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.metadata import IndexJob
+from app.services.metadata_service import MetadataService
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def host_key(connection_url: str) -> str:
+    """Identifies the database server a connection talks to (the file, for SQLite)."""
+    try:
+        url = make_url(connection_url)
+    except ArgumentError:
+        return connection_url
+    if url.host:
+        return f"{url.host}:{url.port or ''}"
+    return f"{url.drivername}:{url.database or ''}"
+
+
+class IndexJobManager:
+    """
+    Runs schema indexing as persistent jobs (rows in index_jobs) on a bounded worker pool.
+    At most max_per_host jobs run against the same database server; the rest wait in a
+    per-host queue without occupying a worker. Failed jobs are retried up to max_attempts
+    times, and jobs left queued or running by a previous process are picked up by resume().
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_per_host: int,
+        max_attempts: int,
+        retry_delay: float,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.workers = workers
+        self.max_per_host = max_per_host
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.session_factory = session_factory
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-job")
+        self._pending: Dict[str, deque] = defaultdict(deque)
+        self._running: Dict[str, int] = defaultdict(int)
+        # Live (tables done, tables total) of running jobs; persisted when the job finishes
+        self._progress: Dict[int, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, connection_id: int, trigger: str = "manual") -> IndexJob:
+        """Queues a re-index, reusing a job that is already queued for the connection."""
+        with self.session_factory() as db:
+            job = (
+                db.query(IndexJob)
+                .filter(IndexJob.connection_id == connection_id, IndexJob.status == QUEUED)
+                .first()
+            )
+            if job is None:
+                job = IndexJob(connection_id=connection_id, status=QUEUED, trigger=trigger)
+                db.add(job)
+                db.commit()
+                db.refresh(job)
+                self._queue(job.id, job.connection.connection_url)
+            db.expunge(job)
+            return job
+
+    def resume(self) -> int:
+        """Re-queues jobs interrupted by a restart. Returns how many were picked up."""
+        with self.session_factory() as db:
+            jobs = (
+                db.query(IndexJob)
+                .filter(IndexJob.status.in_((QUEUED, RUNNING)))
+                .order_by(IndexJob.id)
+                .all()
+            )
+            for job in jobs:
+                job.status = QUEUED
+            db.commit()
+            queued = [(job.id, job.connection.connection_url) for job in jobs]
+        for job_id, connection_url in queued:
+            self._queue(job_id, connection_url)
+        if queued:
+            logger.info(f"Resumed {len(queued)} index jobs")
+        return len(queued)
+
+    def latest(self, db: Session, connection_id: int) -> Optional[IndexJob]:
+        return (
+            db.query(IndexJob)
+            .filter(IndexJob.connection_id == connection_id)
+            .order_by(IndexJob.id.desc())
+            .first()
+        )
+
+    def progress(self, job_id: int) -> Optional[Tuple[int, int]]:
+        """Live (tables done, tables total) of a running job; None once it has finished."""
+        return self._progress.get(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _queue(self, job_id: int, connection_url: str) -> None:
+        host = host_key(connection_url)
+        with self._lock:
+            self._pending[host].append(job_id)
+        self._dispatch(host)
+
+    def _dispatch(self, host: str) -> None:
+        with self._lock:
+            pending = self._pending[host]
+            while pending and self._running[host] < self.max_per_host:
+                job_id = pending.popleft()
+                self._running[host] += 1
+                self._executor.submit(self._run, job_id, host)
+
+    def _run(self, job_id: int, host: str) -> None:
+        retry = False
+        try:
+            retry = self._index(job_id)
+        except Exception as e:
+            logger.error(f"Index job {job_id} crashed: {e}")
+        finally:
+            self._progress.pop(job_id, None)
+            with self._lock:
+                self._running[host] -= 1
+        if retry:
+            timer = threading.Timer(self.retry_delay, self._queue_retry, args=(job_id, host))
+            timer.daemon = True
+            timer.start()
+        self._dispatch(host)
+
+    def _queue_retry(self, job_id: int, host: str) -> None:
+        with self._lock:
+            self._pending[host].append(job_id)
+        self._dispatch(host)
+
+    def _index(self, job_id: int) -> bool:
+        """Runs one attempt of the job. Returns True if it failed and should be retried."""
+        with self.session_factory() as db:
+            job = db.get(IndexJob, job_id)
+            if job is None or job.status != QUEUED:
+                # Connection deleted, or the job was already picked up
+                return False
+            job.status = RUNNING
+            job.attempts += 1
+            job.started_at = datetime.utcnow()
+            job.error = None
+            db.commit()
+
+            def progress(done: int, total: int) -> None:
+                self._progress[job_id] = (done, total)
+
+            try:
+                report = MetadataService(db).index_database(job.connection_id, progress=progress)
+            except Exception as e:
+                logger.error(f"Index job {job_id} attempt {job.attempts} failed: {e}")
+                db.rollback()
+                job = db.get(IndexJob, job_id)
+                if job is None:
+                    return False
+                job.error = str(e)[:1000]
+                retry = job.attempts < self.max_attempts
+                job.status = QUEUED if retry else FAILED
+                if not retry:
+                    job.finished_at = datetime.utcnow()
+                db.commit()
+                return retry
+
+            job = db.get(IndexJob, job_id)
+            if job is None:
+                return False
+            job.tables_done, job.tables_total = self._progress.get(job_id, (0, 0))
+            job.report = report
+            job.status = SUCCEEDED if report is not None else FAILED
+            if report is None:
+                job.error = "Connection not found"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            return False
+
+
+index_job_manager = IndexJobManager(
+    workers=settings.INDEX_JOB_WORKERS,
+    max_per_host=settings.INDEX_JOB_MAX_PER_HOST,
+    max_attempts=settings.INDEX_JOB_MAX_ATTEMPTS,
+    retry_delay=settings.INDEX_JOB_RETRY_DELAY_SECONDS,
+)
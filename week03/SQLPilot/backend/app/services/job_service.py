@@ -0,0 +1,249 @@
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from app.core.config import settings
+from app.core.files import private_directory
+from app.models.metadata import DBConnection
+from app.services.engine_registry import engine_registry
+from app.services.query_control import query_control, QueryCancelledError
+from app.services.security_service import SecurityService
+from app.services.dialect import resolve_dialect
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobNotFoundError(LookupError):
+    pass
+
+
+class QueryJob:
+    def __init__(self, job_id: str, connection: DBConnection, sql: str, spool_path: str):
+        self.id = job_id
+        self.connection = connection
+        self.connection_id = connection.id
+        self.sql = sql
+        self.spool_path = spool_path
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.columns: List[str] = []
+        self.rows_fetched = 0
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.finished_monotonic: Optional[float] = None
+        # (file offset, first row index, row count) of every spooled batch
+        self.batches: List[Tuple[int, int, int]] = []
+        self.cancel_requested = False
+
+
+class QueryJobManager:
+    """
+    Runs queries in the background on a bounded worker pool and spools their results to disk
+    as pickled row batches, so clients can poll for status and page through or export the
+    result later. At most max_per_connection jobs run against one connection at a time; the
+    rest wait in a per-connection queue without occupying a worker.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_per_connection: int,
+        spool_dir: Optional[str],
+        retention_seconds: float,
+        max_retained: int,
+        batch_size: int,
+    ):
+        self.max_per_connection = max_per_connection
+        # Resolved on first submit: a private temporary directory unless one is configured
+        self._configured_spool_dir = spool_dir
+        self.spool_dir: Optional[str] = None
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self.batch_size = batch_size
+        self.security_service = SecurityService()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query-job")
+        self._jobs: Dict[str, QueryJob] = {}
+        self._pending: Dict[int, deque] = defaultdict(deque)
+        self._running: Dict[int, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def submit(self, connection: DBConnection, sql: str) -> QueryJob:
+        # Reject unsafe SQL up front rather than in the worker
+        self.security_service.validate_sql(sql, resolve_dialect(connection))
+        self._evict_expired()
+        spool_dir = self._spool_directory()
+
+        job_id = uuid.uuid4().hex
+        # Detached copy: the worker must not touch the request's session
+        job = QueryJob(job_id, connection.snapshot(), sql, os.path.join(spool_dir, f"{job_id}.spool"))
+        with self._lock:
+            self._jobs[job_id] = job
+            self._pending[job.connection_id].append(job)
+        self._dispatch(job.connection_id)
+        return job
+
+    def get(self, job_id: str) -> QueryJob:
+        self._evict_expired()
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise JobNotFoundError(f"Job {job_id} not found")
+        return job
+
+    def cancel(self, job_id: str) -> QueryJob:
+        job = self.get(job_id)
+        with self._lock:
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                self._pending[job.connection_id].remove(job)
+                self._finish(job, CANCELLED)
+                return job
+        query_control.cancel(job_id)
+        return job
+
+    def delete(self, job_id: str) -> None:
+        job = self.cancel(job_id)
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            if job.status in FINISHED_STATES:
+                self._remove_spool(job)
+            # A running job removes its spool file when it finishes
+
+    def read_rows(self, job_id: str, offset: int, limit: int) -> List[tuple]:
+        """Rows [offset, offset + limit) of the spooled result; available while the job is still running."""
+        job = self.get(job_id)
+        end = offset + limit
+        rows: List[tuple] = []
+        if not job.batches:
+            return rows
+        with open(job.spool_path, "rb") as f:
+            for file_offset, first_row, count in list(job.batches):
+                if first_row + count <= offset:
+                    continue
+                if first_row >= end:
+                    break
+                f.seek(file_offset)
+                batch = pickle.load(f)
+                rows.extend(batch[max(offset - first_row, 0):end - first_row])
+        return rows
+
+    def iter_batches(self, job_id: str) -> Iterator[List[tuple]]:
+        job = self.get(job_id)
+        if not job.batches:
+            return
+        with open(job.spool_path, "rb") as f:
+            for file_offset, _, _ in list(job.batches):
+                f.seek(file_offset)
+                yield pickle.load(f)
+
+    def _spool_directory(self) -> str:
+        # Spools are unpickled when read, so the directory must not be writable by anyone else;
+        # a configured directory is re-checked (and re-created) on every submit
+        with self._lock:
+            if self.spool_dir is None or self._configured_spool_dir:
+                self.spool_dir = private_directory(self._configured_spool_dir, "sqlpilot-jobs-")
+            return self.spool_dir
+
+    def _dispatch(self, connection_id: int) -> None:
+        with self._lock:
+            pending = self._pending[connection_id]
+            while pending and self._running[connection_id] < self.max_per_connection:
+                job = pending.popleft()
+                job.status = RUNNING
+                self._running[connection_id] += 1
+                self._executor.submit(self._run, job)
+
+    def _run(self, job: QueryJob) -> None:
+        job.started_at = datetime.utcnow()
+        timeout = job.connection.get_option("job_statement_timeout", settings.QUERY_JOB_STATEMENT_TIMEOUT_SECONDS)
+        status = SUCCEEDED
+        try:
+            engine = engine_registry.get_engine(job.connection)
+            with query_control.track(job.id, job.connection_id, timeout) as handle, \
+                    engine.connect() as conn, open(job.spool_path, "wb") as spool:
+                handle.attach(conn, engine)
+                try:
+                    result = conn.execution_options(stream_results=True).execute(text(job.sql))
+                    if not result.returns_rows:
+                        raise ValueError("Query does not return rows")
+                    job.columns = list(result.keys())
+                    while not job.cancel_requested:
+                        rows = [tuple(row) for row in result.fetchmany(self.batch_size)]
+                        if not rows:
+                            break
+                        file_offset = spool.tell()
+                        pickle.dump(rows, spool, protocol=pickle.HIGHEST_PROTOCOL)
+                        spool.flush()
+                        job.batches.append((file_offset, job.rows_fetched, len(rows)))
+                        job.rows_fetched += len(rows)
+                    result.close()
+                except DBAPIError as e:
+                    raise handle.translate(e) from e
+                finally:
+                    handle.detach()
+            if job.cancel_requested:
+                status = CANCELLED
+        except QueryCancelledError:
+            status = CANCELLED
+        except Exception as e:
+            logger.error(f"Query job {job.id} failed: {e}")
+            job.error = str(e)
+            status = FAILED
+
+        with self._lock:
+            self._finish(job, status)
+            self._running[job.connection_id] -= 1
+            if job.id not in self._jobs:
+                # Deleted while running
+                self._remove_spool(job)
+        self._dispatch(job.connection_id)
+
+    def _finish(self, job: QueryJob, status: str) -> None:
+        job.status = status
+        job.finished_at = datetime.utcnow()
+        job.finished_monotonic = time.monotonic()
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.status in FINISHED_STATES),
+                key=lambda job: job.finished_monotonic,
+            )
+            overflow = len(finished) - self.max_retained
+            for i, job in enumerate(finished):
+                if i < overflow or now - job.finished_monotonic > self.retention_seconds:
+                    del self._jobs[job.id]
+                    self._remove_spool(job)
+
+    @staticmethod
+    def _remove_spool(job: QueryJob) -> None:
+        try:
+            os.remove(job.spool_path)
+        except FileNotFoundError:
+            pass
+
+
+job_manager = QueryJobManager(
+    workers=settings.QUERY_JOB_WORKERS,
+    max_per_connection=settings.QUERY_JOB_MAX_PER_CONNECTION,
+    spool_dir=settings.QUERY_JOB_SPOOL_DIR,
+    retention_seconds=settings.QUERY_JOB_RETENTION_SECONDS,
+    max_retained=settings.QUERY_JOB_MAX_RETAINED,
+    batch_size=settings.QUERY_JOB_BATCH_SIZE,
+)
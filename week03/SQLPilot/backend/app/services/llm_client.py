@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import httpx
+import openai
+from app.core.config import settings
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+    )
+
+
+def _client_kwargs(base_url: Optional[str], api_key: Optional[str]) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"timeout": settings.LLM_TIMEOUT_SECONDS, "max_retries": settings.LLM_MAX_RETRIES}
+    if base_url:
+        kwargs["base_url"] = base_url
+    if api_key:
+        kwargs["api_key"] = api_key
+    return kwargs
+
+
+_clients: Dict[Tuple[Optional[str], Optional[str]], openai.OpenAI] = {}
+# Async clients hold connections bound to the event loop that created them
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Optional[str], Optional[str]], openai.AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url: Optional[str] = None, api_key: Optional[str] = None) -> openai.OpenAI:
+    """
+    Process-wide client per endpoint, so calls reuse its keep-alive connection pool. Timeouts
+    and retries (with the SDK's exponential backoff) come from the LLM_* settings.
+    """
+    key = (base_url, api_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = openai.OpenAI(
+                http_client=openai.DefaultHttpxClient(limits=_limits()), **_client_kwargs(base_url, api_key)
+            )
+            _clients[key] = client
+        return client
+
+
+def get_async_client(base_url: Optional[str] = None, api_key: Optional[str] = None) -> openai.AsyncOpenAI:
+    """Async counterpart of get_client, shared per running event loop."""
+    loop = asyncio.get_running_loop()
+    key = (base_url, api_key)
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = openai.AsyncOpenAI(
+                http_client=openai.DefaultAsyncHttpxClient(limits=_limits()), **_client_kwargs(base_url, api_key)
+            )
+            clients[key] = client
+        return client
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for a key is in flight, other callers
+    with the same key wait for it and share its result (or exception) instead of repeating it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop_key = (asyncio.get_running_loop(), key)
+        future = self._async_calls.get(loop_key)
+        if future is not None:
+            # shield: a waiter being cancelled must not cancel the shared call
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(fn())
+        self._async_calls[loop_key] = future
+        future.add_done_callback(lambda _: self._async_calls.pop(loop_key, None))
+        return await asyncio.shield(future)
+
+
+single_flight = SingleFlight()
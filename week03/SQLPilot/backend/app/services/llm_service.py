@@ -1,43 +1,231 @@
+import asyncio
+import copy
 import json
-import openai
-from typing import Tuple, Optional
-from sqlalchemy.orm import Session
-from app.models.metadata import TableMetadata
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple, Optional
+from sqlalchemy.orm import Session, sessionmaker
+from app.models.metadata import DBConnection
+from app.services.explain_service import ExplainService, PlanEstimate
+from app.services.query_control import QueryTimeoutError
+from app.services.security_service import SecurityService
+from app.services.dialect import dialect_name, resolve_dialect, transpile
+from app.services.llm_client import get_client, get_async_client, single_flight
+from app.services.nl_cache import NLQueryCache, normalize_question
+from app.services.schema_context import SchemaContextService
+from app.services.schema_validator import SchemaValidationError, SchemaValidator
 from app.core.config import settings
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class SQLCandidate:
+    sql: str
+    export_format: Optional[str] = None
+    estimate: Optional[PlanEstimate] = None
+    # Why the candidate was rejected (security check or EXPLAIN failure)
+    error: Optional[str] = None
+    # Schema version it was generated against; None for an answer taken from the NL cache
+    schema_version: Optional[int] = None
+
+    @property
+    def cost(self) -> Optional[float]:
+        return self.estimate.cost if self.estimate else None
+
 class LLMService:
     def __init__(self, db: Session):
         self.db = db
+        # The async methods do their database work in worker threads, each on a session of its own
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
         self.provider = os.getenv("LLM_PROVIDER", "openai").lower()
         self.ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1")
         self.model = os.getenv("OLLAMA_MODEL", "llama3") if self.provider == "ollama" else "gpt-3.5-turbo"
 
     def generate_sql(self, connection_id: int, question: str) -> Tuple[str, Optional[str]]:
-        # 1. Fetch schema for context
-        tables = self.db.query(TableMetadata).filter(TableMetadata.connection_id == connection_id).all()
-        
-        if not tables:
+        schema_version, cached, messages = self._prepare(connection_id, question)
+        if cached is not None:
+            return cached
+
+        def complete() -> Tuple[str, Optional[str]]:
+            client = get_client(*self._client_args())
+            conversation = list(messages)
+            for _ in range(settings.NL_REPAIR_ATTEMPTS + 1):
+                response = client.chat.completions.create(
+                    model=self.model, messages=conversation, temperature=0, response_format={"type": "json_object"}
+                )
+                content = response.choices[0].message.content
+                sql, export_format, errors = self._check(connection_id, content)
+                if not errors:
+                    return self._finish(connection_id, schema_version, question, sql, export_format)
+                conversation += self._repair_messages(content, errors)
+            raise SchemaValidationError(errors)
+
+        # 3. Call LLM; identical concurrent questions share one upstream call
+        try:
+            return single_flight.do(self._flight_key(connection_id, schema_version, question), complete)
+        except Exception as e:
+            logger.error(f"LLM Error: {e}")
+            raise e
+
+    async def agenerate_sql(self, connection_id: int, question: str) -> Tuple[str, Optional[str]]:
+        """
+        Same as generate_sql, but awaits the LLM instead of blocking a worker thread. Identical
+        concurrent questions share each completion call; everything else runs per request.
+        """
+        schema_version, cached, messages = await self._in_thread(LLMService._prepare, connection_id, question)
+        if cached is not None:
+            return cached
+
+        try:
+            sql, export_format, errors = await self._arepair(
+                connection_id, self._flight_key(connection_id, schema_version, question),
+                messages, settings.NL_REPAIR_ATTEMPTS + 1,
+            )
+        except Exception as e:
+            logger.error(f"LLM Error: {e}")
+            raise e
+        if errors:
+            raise SchemaValidationError(errors)
+        return await self._in_thread(LLMService._finish, connection_id, schema_version, question, sql, export_format)
+
+    async def astream_sql(self, connection_id: int, question: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streams generation as ("token", text) events while the model writes, then one
+        ("result", (sql, export_format)). SQL failing the schema check yields ("repair", errors)
+        before the corrected result. A cached answer yields the result alone. Closing the
+        iterator early closes the upstream request.
+        """
+        schema_version, cached, messages = await self._in_thread(LLMService._prepare, connection_id, question)
+        if cached is not None:
+            yield "result", cached
+            return
+
+        try:
+            stream = await get_async_client(*self._client_args()).chat.completions.create(
+                model=self.model, messages=messages, temperature=0, response_format={"type": "json_object"}, stream=True
+            )
+        except Exception as e:
+            logger.error(f"LLM Error: {e}")
+            raise e
+        parts = []
+        try:
+            async for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    parts.append(text)
+                    yield "token", text
+        finally:
+            await stream.close()
+        content = "".join(parts)
+        sql, export_format, errors = await self._in_thread(LLMService._check, connection_id, content)
+        if errors and settings.NL_REPAIR_ATTEMPTS:
+            yield "repair", errors
+            sql, export_format, errors = await self._arepair(
+                connection_id, self._flight_key(connection_id, schema_version, question),
+                messages + self._repair_messages(content, errors), settings.NL_REPAIR_ATTEMPTS,
+            )
+        if errors:
+            raise SchemaValidationError(errors)
+        yield "result", await self._in_thread(LLMService._finish, connection_id, schema_version, question, sql, export_format)
+
+    async def agenerate_candidates(self, connection_id: int, question: str, n: int) -> List[SQLCandidate]:
+        """
+        Requests n candidate queries concurrently (the first at temperature 0, the rest sampled),
+        validates each with SecurityService, the schema validator and an EXPLAIN on the target, and
+        returns them ranked:
+        valid candidates by estimated cost, then the rejected ones with their errors.
+        A cached answer is returned as the only candidate. Nothing is cached here: the caller
+        passes the candidate that ran successfully to acache_candidate.
+        """
+        schema_version, cached, messages = await self._in_thread(LLMService._prepare, connection_id, question)
+        if cached is not None:
+            return [SQLCandidate(*cached)]
+        client = get_async_client(*self._client_args())
+
+        async def complete(temperature: float) -> Tuple[str, Optional[str]]:
+            response = await client.chat.completions.create(
+                model=self.model, messages=messages, temperature=temperature, response_format={"type": "json_object"}
+            )
+            return self._parse(response.choices[0].message.content)
+
+        temperatures = [0] + [settings.NL_CANDIDATE_TEMPERATURE] * (n - 1)
+        completions = await asyncio.gather(*(complete(t) for t in temperatures), return_exceptions=True)
+        answers: Dict[str, Optional[str]] = {}
+        for completion in completions:
+            # Sampled candidates often repeat each other
+            if not isinstance(completion, BaseException):
+                answers.setdefault(completion[0], completion[1])
+        if not answers:
+            logger.error(f"LLM Error: {completions[0]}")
+            raise completions[0]
+
+        connection = await self._in_thread(lambda service: service.db.get(DBConnection, connection_id).snapshot())
+        candidates = await asyncio.gather(*(
+            self._in_thread(LLMService._evaluate, connection, sql, export_format) for sql, export_format in answers.items()
+        ))
+        for candidate in candidates:
+            candidate.schema_version = schema_version
+        ranked = sorted(
+            enumerate(candidates),
+            key=lambda item: (
+                item[1].error is not None,
+                item[1].cost is None,
+                item[1].cost or 0,
+                item[0],
+            ),
+        )
+        return [candidate for _, candidate in ranked]
+
+    async def acache_candidate(self, connection_id: int, question: str, candidate: SQLCandidate) -> None:
+        """Caches the answer of a candidate that executed successfully."""
+        if candidate.schema_version is not None:
+            await self._in_thread(
+                LLMService._finish, connection_id, candidate.schema_version, question, candidate.sql, candidate.export_format
+            )
+
+    def _evaluate(self, connection: DBConnection, sql: str, export_format: Optional[str]) -> SQLCandidate:
+        """Vets one candidate: security check, schema check and an EXPLAIN on the target."""
+        try:
+            sql, dialect = self._target_sql(connection.id, sql)
+            SecurityService().validate_sql(sql, dialect)
+            # Other candidates cover for invalid ones, so there is no repair pass here
+            sql, errors = self._check_schema(connection.id, sql, dialect)
+            if errors:
+                raise SchemaValidationError(errors)
+            return SQLCandidate(sql, export_format, estimate=ExplainService().explain(connection, sql))
+        except (ValueError, QueryTimeoutError) as e:
+            return SQLCandidate(sql, export_format, error=str(e))
+
+    async def _in_thread(self, method: Callable[..., Any], *args: Any) -> Any:
+        """
+        Runs method(service, *args) in a worker thread on a copy of this service with a session of
+        its own: the database calls would block the event loop, and a Session is not thread-safe.
+        """
+        def run():
+            with self.session_factory() as db:
+                service = copy.copy(self)
+                service.db = db
+                return method(service, *args)
+        return await asyncio.to_thread(run)
+
+    def _prepare(self, connection_id: int, question: str) -> Tuple[int, Optional[Tuple[str, Optional[str]]], List[Dict[str, str]]]:
+        """(schema version, cached answer or None, chat messages for the LLM)."""
+        # 0. Reuse the SQL generated for the same question against the same schema version
+        connection = self.db.get(DBConnection, connection_id)
+        schema_version = (connection.schema_version or 0) if connection else 0
+        cached = NLQueryCache(self.db).get(connection_id, schema_version, question)
+        if cached is not None:
+            return schema_version, cached, []
+
+        # 1. Fetch schema for context (only the relevant tables for large schemas)
+        schema_text = SchemaContextService(self.db).get_prompt_schema(connection_id, question)
+
+        if not schema_text:
              raise ValueError("No schema metadata found for this connection. Please index the database first.")
 
-        schema_text = ""
-        for table in tables:
-            # Generate DDL-like schema for better LLM understanding
-            schema_text += f"CREATE TABLE {table.table_name} (\n"
-            cols = []
-            for col in table.columns:
-                col_def = f"  {col.column_name} {col.data_type}"
-                if col.is_primary_key:
-                    col_def += " PRIMARY KEY"
-                # Note: FKs could be added here if we stored the target table/col in metadata efficiently
-                cols.append(col_def)
-            schema_text += ",\n".join(cols)
-            schema_text += "\n);\n\n"
-            
-        # 2. Construct Prompt
+        # 2. Construct Prompt (in the dialect the answer is transpiled from, if any)
+        sql_dialect = dialect_name(settings.LLM_SQL_DIALECT or (resolve_dialect(connection) if connection else None))
         system_prompt = f"""You are an expert database engineer. Convert the user's natural language question into a valid SQL query.
 The database schema is as follows:
 {schema_text}
@@ -48,63 +236,132 @@ Rules:
 3. "export_format": "csv" or "json" if the user explicitly asks for export or save as file, otherwise null.
 4. Do not use markdown blocks (```json).
 5. Do not add explanations or introductory text.
-6. Ensure the SQL is compatible with PostgreSQL.
+6. Ensure the SQL is compatible with {sql_dialect}.
 7. If the question cannot be answered with the schema, return "sql": "SELECT 'ERROR: Cannot answer'"
 """
-        
-        # 3. Call LLM
-        try:
-            client = None
-            if self.provider == "ollama":
-                # Ollama is OpenAI compatible
-                client = openai.OpenAI(
-                    base_url=self.ollama_base_url,
-                    api_key="ollama" # Required but ignored
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": question}
+        ]
+        return schema_version, None, messages
+
+    def _client_args(self) -> Tuple[Optional[str], Optional[str]]:
+        """(base_url, api_key) of the shared client for the configured provider."""
+        if self.provider == "ollama":
+            # Ollama is OpenAI compatible
+            return self.ollama_base_url, "ollama" # Required but ignored
+        # OpenAI
+        if not os.getenv("OPENAI_API_KEY"):
+            raise ValueError("OPENAI_API_KEY is not set. Please configure it in .env or use LLM_PROVIDER=ollama.")
+        return None, None
+
+    def _flight_key(self, connection_id: int, schema_version: int, question: str) -> Tuple:
+        return (self.provider, self.model, connection_id, schema_version, normalize_question(question))
+
+    def _finish(self, connection_id: int, schema_version: int, question: str, sql: str, export_format: Optional[str]) -> Tuple[str, Optional[str]]:
+        NLQueryCache(self.db).put(connection_id, schema_version, question, sql, export_format)
+        return sql, export_format
+
+    async def _arepair(
+        self, connection_id: int, flight_key: Tuple, messages: List[Dict[str, str]], tries: int
+    ) -> Tuple[str, Optional[str], List[Dict[str, Any]]]:
+        """
+        Asks the LLM up to `tries` times until its SQL passes the schema check, feeding the errors
+        back each time. Returns (sql, export_format, errors) of the last answer.
+        """
+        client = get_async_client(*self._client_args())
+        conversation = list(messages)
+        sql, export_format, errors = "", None, []
+        for _ in range(tries):
+            async def complete() -> str:
+                response = await client.chat.completions.create(
+                    model=self.model, messages=conversation, temperature=0, response_format={"type": "json_object"}
                 )
-            else:
-                # OpenAI
-                if not os.getenv("OPENAI_API_KEY"):
-                    raise ValueError("OPENAI_API_KEY is not set. Please configure it in .env or use LLM_PROVIDER=ollama.")
-                
-                client = openai.OpenAI()
-
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": question}
-                ],
-                temperature=0,
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Basic cleanup if LLM returns markdown
-            if content.startswith("```"):
-                lines = content.split("\n")
-                if lines[0].startswith("```"):
-                    lines = lines[1:]
-                if lines[-1].startswith("```"):
-                    lines = lines[:-1]
-                content = "\n".join(lines)
-            
+                return response.choices[0].message.content
+
+            # Concurrent identical conversations share the call; the key adds the turns after the question
+            key = flight_key + tuple(message["content"] for message in conversation[2:])
+            content = await single_flight.do_async(key, complete)
+            sql, export_format, errors = await self._in_thread(LLMService._check, connection_id, content)
+            if not errors:
+                break
+            conversation = conversation + self._repair_messages(content, errors)
+        return sql, export_format, errors
+
+    def _check(self, connection_id: int, content: str) -> Tuple[str, Optional[str], List[Dict[str, Any]]]:
+        """Parses an LLM answer and checks its SQL against the schema: (sql, export_format, errors)."""
+        sql, export_format = self._parse(content)
+        sql, dialect = self._target_sql(connection_id, sql)
+        sql, errors = self._check_schema(connection_id, sql, dialect)
+        return sql, export_format, errors
+
+    def _target_sql(self, connection_id: int, sql: str) -> Tuple[str, Optional[str]]:
+        """The generated SQL in the connection's dialect, and that dialect."""
+        connection = self.db.get(DBConnection, connection_id)
+        dialect = resolve_dialect(connection) if connection else None
+        source = settings.LLM_SQL_DIALECT
+        if source and dialect and source != dialect:
             try:
-                result = json.loads(content)
-                sql = result.get("sql", "").strip()
-                export_format = result.get("export_format")
-                if export_format:
-                    export_format = export_format.lower()
-                    if export_format not in ["csv", "json"]:
-                        export_format = None
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails, treat entire content as SQL
-                logger.warning("LLM did not return valid JSON. Falling back to raw text as SQL.")
-                sql = content.strip()
-                export_format = None
-            
-            return sql, export_format
+                sql = transpile(sql, source, dialect)
+            except ValueError:
+                # Left as written; the problem is reported when it is validated for execution
+                pass
+        return sql, dialect
 
-        except Exception as e:
-            logger.error(f"LLM Error: {e}")
-            raise e
+    def _check_schema(self, connection_id: int, sql: str, dialect: Optional[str]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Resolves the SQL's tables and columns against the indexed metadata. Returns the SQL
+        (rewritten if references were qualified) and the structured errors, if any.
+        """
+        try:
+            parsed = SecurityService().parse(sql, dialect)
+        except ValueError:
+            # Syntax and safety problems are reported when the SQL is validated for execution
+            return sql, []
+        validator = SchemaValidator(self.db)
+        results = [validator.validate(connection_id, expression) for expression in parsed.expressions]
+        errors = [error for result in results for error in result.errors]
+        if not errors and any(result.rewritten for result in results):
+            sql = ";\n".join(result.expression.sql(dialect=parsed.dialect) for result in results)
+        return sql, errors
+
+    @staticmethod
+    def _repair_messages(content: str, errors: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Follow-up turn feeding the schema errors of an answer back to the LLM."""
+        return [
+            {"role": "assistant", "content": content},
+            {"role": "user", "content": (
+                "The SQL references tables or columns that do not exist in the schema:\n"
+                f"{json.dumps(errors)}\n"
+                "Fix only these references, using the suggestions where they fit, and answer in the same JSON format."
+            )},
+        ]
+
+    @staticmethod
+    def _parse(content: str) -> Tuple[str, Optional[str]]:
+        content = content.strip()
+
+        # Basic cleanup if LLM returns markdown
+        if content.startswith("```"):
+            lines = content.split("\n")
+            if lines[0].startswith("```"):
+                lines = lines[1:]
+            if lines[-1].startswith("```"):
+                lines = lines[:-1]
+            content = "\n".join(lines)
+
+        try:
+            result = json.loads(content)
+            sql = result.get("sql", "").strip()
+            export_format = result.get("export_format")
+            if export_format:
+                export_format = export_format.lower()
+                if export_format not in ["csv", "json"]:
+                    export_format = None
+        except json.JSONDecodeError:
+            # Fallback if JSON parsing fails, treat entire content as SQL
+            logger.warning("LLM did not return valid JSON. Falling back to raw text as SQL.")
+            sql = content.strip()
+            export_format = None
+
+        return sql, export_format
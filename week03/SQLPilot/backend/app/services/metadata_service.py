@@ -1,15 +1,40 @@
-from sqlalchemy import create_engine, inspect
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import inspect, insert, delete
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.reflection import ObjectKind
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.models.metadata import DBConnection, TableMetadata, ColumnMetadata
+from app.services.engine_registry import engine_registry
+from app.services.result_cache import result_cache
+from app.services import nl_cache, schema_context
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Catalog schemas that never hold user tables
+SYSTEM_SCHEMAS = {"information_schema", "pg_catalog", "pg_toast", "mysql", "performance_schema", "sys"}
+SYSTEM_SCHEMA_PREFIXES = ("pg_temp_", "pg_toast_temp_")
+# Dialects whose schemas are separate databases; only the connected one is indexed by default
+DATABASE_SCHEMA_DIALECTS = {"mysql", "mariadb"}
+
 class MetadataService:
     def __init__(self, db: Session):
         self.db = db
 
-    def index_database(self, connection_id: int):
+    def index_database(
+        self, connection_id: int, progress: Optional[Callable[[int, int], None]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Re-indexes the connection's schema incrementally. Only tables whose fingerprint changed
+        are rewritten, and everything is committed at once so readers keep seeing the previous
+        metadata until the new version is complete.
+        progress, if given, is called with (tables done, tables total) as each schema is merged.
+        Returns a report of added, updated and removed tables.
+        """
         connection = self.db.query(DBConnection).filter(DBConnection.id == connection_id).first()
         if not connection:
             logger.error(f"Connection {connection_id} not found")
@@ -17,46 +42,193 @@ class MetadataService:
 
         try:
             # Connect to the target database
-            target_engine = create_engine(connection.connection_url)
+            target_engine = engine_registry.get_engine(connection)
             inspector = inspect(target_engine)
+            schemas = self._schemas(inspector, connection)
 
-            # Clear existing metadata for this connection
-            self.db.query(TableMetadata).filter(TableMetadata.connection_id == connection_id).delete()
-            
-            table_names = inspector.get_table_names()
-            view_names = inspector.get_view_names()
-            all_names = table_names + view_names
-            
-            for table_name in all_names:
-                table_metadata = TableMetadata(
-                    connection_id=connection_id,
-                    table_name=table_name
-                )
-                self.db.add(table_metadata)
-                self.db.flush() # flush to get ID
-
-                columns = inspector.get_columns(table_name)
-                pk_constraint = inspector.get_pk_constraint(table_name)
-                pks = pk_constraint.get('constrained_columns', [])
-                
-                # FKs
-                fks = inspector.get_foreign_keys(table_name)
-                fk_columns = [col for fk in fks for col in fk['constrained_columns']]
-
-                for col in columns:
-                    column_metadata = ColumnMetadata(
-                        table_id=table_metadata.id,
-                        column_name=col['name'],
-                        data_type=str(col['type']),
-                        is_primary_key=col['name'] in pks,
-                        is_foreign_key=col['name'] in fk_columns
-                    )
-                    self.db.add(column_metadata)
+            existing = {
+                (table.schema_name, table.table_name): table
+                for table in self.db.query(TableMetadata).filter(TableMetadata.connection_id == connection_id)
+            }
+            report = {"added": [], "updated": [], "removed": [], "unchanged": 0}
+            seen = set()
+            total = self._count_tables(inspector, schemas) if progress else 0
+            if progress:
+                progress(0, total)
+
+            # Each schema's tables are merged into the session as soon as that schema is reflected
+            for schema, reflected in self._reflect_schemas(target_engine, inspector, schemas):
+                self._merge(connection_id, schema, reflected, existing, report)
+                seen.update((schema, table_name) for table_name in reflected)
+                if progress:
+                    progress(len(seen), max(total, len(seen)))
+
+            removed = [key for key in existing if key not in seen]
+            if removed:
+                removed_ids = [existing[key].id for key in removed]
+                self.db.execute(delete(ColumnMetadata).where(ColumnMetadata.table_id.in_(removed_ids)))
+                self.db.execute(delete(TableMetadata).where(TableMetadata.id.in_(removed_ids)))
+                report["removed"] = [existing[key].qualified_name for key in removed]
+
+            changed = bool(report["added"] or report["updated"] or report["removed"])
+            if changed:
+                connection.schema_version = (connection.schema_version or 0) + 1
+                # Prompt context and retrieval index for the new version, committed with it
+                schema_context.rebuild(self.db, connection_id, connection.schema_version)
+                # SQL generated against the old schema may reference dropped tables or columns
+                nl_cache.invalidate(self.db, connection_id)
+            report["schema_version"] = connection.schema_version
 
             self.db.commit()
-            logger.info(f"Successfully indexed database {connection.name}")
+            if changed:
+                # Cached results may no longer match the schema
+                result_cache.invalidate(connection_id)
+            logger.info(
+                f"Successfully indexed database {connection.name}: {len(report['added'])} added, "
+                f"{len(report['updated'])} updated, {len(report['removed'])} removed, {report['unchanged']} unchanged"
+            )
+            return report
 
         except Exception as e:
             logger.error(f"Error indexing database {connection.name}: {e}")
             self.db.rollback()
             raise e
+
+    def _schemas(self, inspector, connection: DBConnection) -> List[Optional[str]]:
+        """
+        Schemas to index: options.schemas if set, otherwise every non-system schema (on MySQL,
+        where schemas are databases, only the connection's database). The default schema is
+        represented as None so its tables stay unqualified.
+        """
+        default_schema = inspector.default_schema_name
+        configured = connection.get_option("schemas")
+        if configured:
+            names = configured
+        elif inspector.dialect.name in DATABASE_SCHEMA_DIALECTS:
+            names = []
+        else:
+            try:
+                names = [
+                    name for name in inspector.get_schema_names()
+                    if name not in SYSTEM_SCHEMAS and not name.startswith(SYSTEM_SCHEMA_PREFIXES)
+                ]
+            except NotImplementedError:
+                names = []
+        schemas = [None if name == default_schema else name for name in names]
+        if None not in schemas and not configured:
+            schemas.insert(0, None)
+        return list(dict.fromkeys(schemas))
+
+    @staticmethod
+    def _count_tables(inspector, schemas: List[Optional[str]]) -> int:
+        return sum(
+            len(inspector.get_table_names(schema=schema)) + len(inspector.get_view_names(schema=schema))
+            for schema in schemas
+        )
+
+    def _reflect_schemas(self, engine: Engine, inspector, schemas: List[Optional[str]]):
+        """Yields (schema, reflected tables) as each schema finishes."""
+        if len(schemas) <= 1:
+            # Nothing to parallelize; also keeps single-connection pools (e.g. SQLite :memory:) working
+            for schema in schemas:
+                yield schema, self._reflect(inspector, schema)
+            return
+
+        def reflect(schema):
+            # Each worker reflects over its own pooled connection
+            with engine.connect() as conn:
+                return self._reflect(inspect(conn), schema)
+
+        with ThreadPoolExecutor(max_workers=settings.INDEX_REFLECTION_WORKERS) as executor:
+            futures = {executor.submit(reflect, schema): schema for schema in schemas}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def _merge(
+        self,
+        connection_id: int,
+        schema: Optional[str],
+        reflected: Dict[str, List[Dict[str, Any]]],
+        existing: Dict[Tuple[Optional[str], str], TableMetadata],
+        report: Dict[str, Any],
+    ) -> None:
+        """Stages inserts/updates for one schema's tables whose fingerprint changed."""
+        changed_tables = []
+        for table_name, columns in reflected.items():
+            fingerprint = self._fingerprint(columns)
+            table_metadata = existing.get((schema, table_name))
+            if table_metadata is None:
+                table_metadata = TableMetadata(connection_id=connection_id, schema_name=schema, table_name=table_name)
+                self.db.add(table_metadata)
+                report["added"].append(table_metadata.qualified_name)
+            elif table_metadata.fingerprint != fingerprint:
+                report["updated"].append(table_metadata.qualified_name)
+            else:
+                report["unchanged"] += 1
+                continue
+            table_metadata.fingerprint = fingerprint
+            changed_tables.append((table_metadata, columns, table_metadata.id is not None))
+
+        # One flush assigns ids to all new tables; columns are then written with bulk statements
+        self.db.flush()
+        stale_ids = [table.id for table, _, existed in changed_tables if existed]
+        if stale_ids:
+            self.db.execute(delete(ColumnMetadata).where(ColumnMetadata.table_id.in_(stale_ids)))
+        column_rows = [{"table_id": table.id, **col} for table, columns, _ in changed_tables for col in columns]
+        if column_rows:
+            self.db.execute(insert(ColumnMetadata), column_rows)
+
+    def _reflect(self, inspector, schema: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Column rows (as ColumnMetadata kwargs) per table or view name."""
+        try:
+            # Bulk catalog queries: a handful of round trips regardless of the number of tables
+            multi_columns = inspector.get_multi_columns(schema=schema, kind=ObjectKind.ANY)
+            multi_pks = inspector.get_multi_pk_constraint(schema=schema, kind=ObjectKind.ANY)
+            multi_fks = inspector.get_multi_foreign_keys(schema=schema, kind=ObjectKind.ANY)
+            tables = [
+                (key[1], columns, multi_pks.get(key) or {}, multi_fks.get(key) or [])
+                for key, columns in multi_columns.items()
+            ]
+        except (AttributeError, NotImplementedError):
+            # Older dialects without get_multi_* support: three queries per table
+            table_names = inspector.get_table_names(schema=schema)
+            view_names = inspector.get_view_names(schema=schema)
+            tables = [
+                (
+                    table_name,
+                    inspector.get_columns(table_name, schema=schema),
+                    inspector.get_pk_constraint(table_name, schema=schema),
+                    inspector.get_foreign_keys(table_name, schema=schema),
+                )
+                for table_name in table_names + view_names
+            ]
+
+        default_schema = inspector.default_schema_name
+        reflected = {}
+        for table_name, columns, pk_constraint, fks in tables:
+            pks = pk_constraint.get('constrained_columns') or []
+            # constrained column -> (referenced table, referenced column), named like TableMetadata.qualified_name
+            references = {}
+            for fk in fks:
+                referred_schema = fk.get('referred_schema')
+                if referred_schema == default_schema:
+                    referred_schema = None
+                referred_table = f"{referred_schema}.{fk['referred_table']}" if referred_schema else fk['referred_table']
+                for col, referred_col in zip(fk['constrained_columns'], fk['referred_columns']):
+                    references.setdefault(col, (referred_table, referred_col))
+            reflected[table_name] = [
+                {
+                    "column_name": col['name'],
+                    "data_type": str(col['type']),
+                    "is_primary_key": col['name'] in pks,
+                    "is_foreign_key": col['name'] in references,
+                    "foreign_table": references.get(col['name'], (None, None))[0],
+                    "foreign_column": references.get(col['name'], (None, None))[1],
+                }
+                for col in columns
+            ]
+        return reflected
+
+    @staticmethod
+    def _fingerprint(columns: List[Dict[str, Any]]) -> str:
+        return hashlib.sha256(json.dumps(columns, sort_keys=True).encode("utf-8")).hexdigest()
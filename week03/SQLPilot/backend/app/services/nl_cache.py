@@ -0,0 +1,188 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from typing import Dict, Optional, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.metadata import NLQueryCacheEntry
+
+# Sentence punctuation and quotes only: operators, signs and units (> < = - + $ %) change the
+# question, and so does a decimal point or thousands separator between digits
+_PUNCTUATION_RE = re.compile(r"[?!;:\"'`\u2018\u2019\u201c\u201d]|[.,](?!\d)|(?<!\d)[.,]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Hits are buffered and written in batches of this many (or with the next put)
+HIT_FLUSH_SIZE = 100
+
+
+class _Bookkeeping:
+    """
+    Process-wide state that keeps writes and counts off the cache's hot paths: pending hits per
+    entry id, and an approximate entry count that is only re-read from the table after a sweep.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # entry id -> (entry created_at, hits, last used)
+        self.hits: Dict[int, Tuple[datetime, int, datetime]] = {}
+        self.entries: Optional[int] = None
+
+    def record_hit(self, entry: NLQueryCacheEntry) -> int:
+        with self.lock:
+            _, hits, _ = self.hits.get(entry.id, (None, 0, None))
+            self.hits[entry.id] = (entry.created_at, hits + 1, datetime.utcnow())
+            return len(self.hits)
+
+    def take_hits(self) -> Dict[int, Tuple[datetime, int, datetime]]:
+        with self.lock:
+            hits, self.hits = self.hits, {}
+            return hits
+
+
+_bookkeeping = _Bookkeeping()
+
+
+def normalize_question(question: str) -> str:
+    """Folds case, width, sentence punctuation and whitespace so trivially different phrasings share an entry."""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = _PUNCTUATION_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def invalidate(db: Session, connection_id: int) -> None:
+    """Drops the connection's entries within the caller's transaction; called by re-indexing."""
+    db.execute(delete(NLQueryCacheEntry).where(NLQueryCacheEntry.connection_id == connection_id))
+
+
+class NLQueryCache:
+    """
+    Persistent cache of generated SQL keyed by (connection, schema version, normalized question).
+    Entries expire after NL_CACHE_TTL_SECONDS and the least recently used are evicted beyond
+    NL_CACHE_MAX_ENTRIES. With NL_CACHE_SIMILARITY_THRESHOLD set, a miss falls back to the most
+    similar recent question of the same connection and schema version.
+    Lookups do not write: hit counts and last-used times are buffered and written with the next
+    put, or every HIT_FLUSH_SIZE hits (flush_hits).
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @property
+    def enabled(self) -> bool:
+        return settings.NL_CACHE_TTL_SECONDS > 0
+
+    def get(self, connection_id: int, schema_version: int, question: str) -> Optional[Tuple[str, Optional[str]]]:
+        """(sql, export_format) for the question, or None on a miss."""
+        if not self.enabled:
+            return None
+        normalized = normalize_question(question)
+        fresh_since = datetime.utcnow() - timedelta(seconds=settings.NL_CACHE_TTL_SECONDS)
+        entries = self.db.query(NLQueryCacheEntry).filter(
+            NLQueryCacheEntry.connection_id == connection_id,
+            NLQueryCacheEntry.schema_version == schema_version,
+            NLQueryCacheEntry.created_at >= fresh_since,
+        )
+        entry = entries.filter(NLQueryCacheEntry.question_hash == _hash(normalized)).first()
+        if entry is None and settings.NL_CACHE_SIMILARITY_THRESHOLD is not None:
+            entry = self._most_similar(
+                normalized,
+                entries.order_by(NLQueryCacheEntry.last_used_at.desc()).limit(settings.NL_CACHE_SIMILARITY_CANDIDATES),
+            )
+        if entry is None:
+            return None
+
+        if _bookkeeping.record_hit(entry) >= HIT_FLUSH_SIZE:
+            self.flush_hits()
+        return entry.sql, entry.export_format
+
+    def flush_hits(self) -> None:
+        """Writes the buffered hit counts and last-used times."""
+        self._write_hits()
+        self.db.commit()
+
+    def put(self, connection_id: int, schema_version: int, question: str, sql: str, export_format: Optional[str]) -> None:
+        if not self.enabled or not sql:
+            return
+        normalized = normalize_question(question)
+        question_hash = _hash(normalized)
+        now = datetime.utcnow()
+        # Replaces an expired entry for the same question, if any
+        self.db.execute(delete(NLQueryCacheEntry).where(
+            NLQueryCacheEntry.connection_id == connection_id,
+            NLQueryCacheEntry.schema_version == schema_version,
+            NLQueryCacheEntry.question_hash == question_hash,
+        ))
+        self.db.add(NLQueryCacheEntry(
+            connection_id=connection_id,
+            schema_version=schema_version,
+            question_hash=question_hash,
+            normalized_question=normalized,
+            sql=sql,
+            export_format=export_format,
+            hits=0,
+            created_at=now,
+            last_used_at=now,
+        ))
+        # Buffered hits go out with this transaction, so eviction sees current last-used times
+        self._write_hits()
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # The same question was answered concurrently
+            self.db.rollback()
+            return
+
+        with _bookkeeping.lock:
+            if _bookkeeping.entries is not None:
+                _bookkeeping.entries += 1
+            entries = _bookkeeping.entries
+        if entries is None:
+            entries = self._count()
+        if entries > settings.NL_CACHE_MAX_ENTRIES:
+            self._evict()
+
+    def _write_hits(self) -> None:
+        for entry_id, (created_at, hits, last_used_at) in _bookkeeping.take_hits().items():
+            # created_at guards against the id having been reused by a newer entry since the hit
+            self.db.execute(
+                update(NLQueryCacheEntry)
+                .where(NLQueryCacheEntry.id == entry_id, NLQueryCacheEntry.created_at == created_at)
+                .values(hits=NLQueryCacheEntry.hits + hits, last_used_at=last_used_at)
+            )
+
+    def _evict(self) -> None:
+        """
+        Drops expired entries and the least recently used ones, down to 90% of
+        NL_CACHE_MAX_ENTRIES so the next sweep is a while away.
+        """
+        expired_before = datetime.utcnow() - timedelta(seconds=settings.NL_CACHE_TTL_SECONDS)
+        self.db.execute(delete(NLQueryCacheEntry).where(NLQueryCacheEntry.created_at < expired_before))
+        keep = settings.NL_CACHE_MAX_ENTRIES - settings.NL_CACHE_MAX_ENTRIES // 10
+        latest = select(NLQueryCacheEntry.id).order_by(NLQueryCacheEntry.last_used_at.desc()).limit(keep)
+        self.db.execute(delete(NLQueryCacheEntry).where(NLQueryCacheEntry.id.not_in(latest)))
+        self.db.commit()
+        self._count()
+
+    def _count(self) -> int:
+        entries = self.db.scalar(select(func.count(NLQueryCacheEntry.id)))
+        with _bookkeeping.lock:
+            _bookkeeping.entries = entries
+        return entries
+
+    @staticmethod
+    def _most_similar(normalized: str, candidates) -> Optional[NLQueryCacheEntry]:
+        best, best_ratio = None, settings.NL_CACHE_SIMILARITY_THRESHOLD
+        for candidate in candidates:
+            ratio = SequenceMatcher(None, normalized, candidate.normalized_question).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = candidate, ratio
+        return best
+
+
+def _hash(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
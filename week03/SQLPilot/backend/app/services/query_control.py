@@ -0,0 +1,141 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+# SQLite calls the progress handler every N virtual machine instructions
+SQLITE_PROGRESS_STEPS = 10000
+
+
+class QueryCancelledError(Exception):
+    pass
+
+
+class QueryTimeoutError(Exception):
+    pass
+
+
+class QueryHandle:
+    """
+    Controls one running statement: applies the dialect's statement timeout and knows how
+    to interrupt the statement on the server from another thread.
+      - postgresql: SET LOCAL statement_timeout, cancel via the driver's cancel()
+      - mysql/mariadb: SET SESSION max_execution_time, cancel via KILL QUERY on a second connection
+      - sqlite: progress handler checking the deadline, cancel via interrupt()
+    Other dialects run without a timeout and cannot be cancelled.
+    """
+
+    def __init__(self, query_id: str, connection_id: int, timeout: Optional[float]):
+        self.query_id = query_id
+        self.connection_id = connection_id
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.cancelled = False
+        self._cancel_fn: Optional[Callable[[], None]] = None
+        self._reset_fn: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+
+    def attach(self, conn: Connection, engine: Engine) -> None:
+        dbapi_connection = conn.connection.dbapi_connection
+        backend = conn.dialect.name
+        timeout_ms = int(self.timeout * 1000) if self.timeout else 0
+
+        cancel_fn = None
+        if backend == "sqlite":
+            dbapi_connection.set_progress_handler(self._sqlite_progress, SQLITE_PROGRESS_STEPS)
+            cancel_fn = dbapi_connection.interrupt
+            self._reset_fn = lambda: dbapi_connection.set_progress_handler(None, 0)
+        elif backend == "postgresql":
+            if timeout_ms:
+                # Transaction scoped, so it is gone when the connection returns to the pool
+                conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+            if hasattr(dbapi_connection, "cancel"):
+                cancel_fn = dbapi_connection.cancel
+        elif backend in ("mysql", "mariadb"):
+            if timeout_ms:
+                conn.execute(text(f"SET SESSION max_execution_time = {timeout_ms}"))
+                self._reset_fn = lambda: conn.execute(text("SET SESSION max_execution_time = 0"))
+            thread_id = conn.execute(text("SELECT CONNECTION_ID()")).scalar()
+            cancel_fn = lambda: self._kill_mysql_query(engine, thread_id)
+
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelledError(f"Query {self.query_id} was cancelled")
+            self._cancel_fn = cancel_fn
+
+    def restart(self) -> None:
+        """Starts the timeout over, for statements that run in steps (fetches from an open cursor)."""
+        if self.timeout:
+            self.deadline = time.monotonic() + self.timeout
+
+    def detach(self) -> None:
+        with self._lock:
+            self._cancel_fn = None
+        if self._reset_fn:
+            try:
+                self._reset_fn()
+            except Exception as e:
+                logger.warning(f"Could not reset statement timeout: {e}")
+            self._reset_fn = None
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            cancel_fn = self._cancel_fn
+        if cancel_fn:
+            cancel_fn()
+
+    def translate(self, error: Exception) -> Exception:
+        """Maps a driver error caused by our own interrupt to a cancel/timeout error."""
+        if self.cancelled:
+            return QueryCancelledError(f"Query {self.query_id} was cancelled")
+        if self.deadline and time.monotonic() >= self.deadline:
+            return QueryTimeoutError(f"Query exceeded the statement timeout of {self.timeout:g}s")
+        return error
+
+    def _sqlite_progress(self) -> int:
+        # A non-zero return value aborts the running statement
+        return int(self.cancelled or (self.deadline is not None and time.monotonic() >= self.deadline))
+
+    @staticmethod
+    def _kill_mysql_query(engine: Engine, thread_id: int) -> None:
+        with engine.connect() as conn:
+            conn.execute(text(f"KILL QUERY {int(thread_id)}"))
+
+
+class QueryControl:
+    """Registry of running statements addressable by query id, used for cancellation."""
+
+    def __init__(self):
+        self._handles: Dict[str, QueryHandle] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, query_id: Optional[str], connection_id: int, timeout: Optional[float]) -> Iterator[QueryHandle]:
+        handle = QueryHandle(query_id or uuid.uuid4().hex, connection_id, timeout)
+        with self._lock:
+            if handle.query_id in self._handles:
+                raise ValueError(f"Query {handle.query_id} is already running")
+            self._handles[handle.query_id] = handle
+        try:
+            yield handle
+        finally:
+            with self._lock:
+                self._handles.pop(handle.query_id, None)
+
+    def cancel(self, query_id: str) -> bool:
+        with self._lock:
+            handle = self._handles.get(query_id)
+        if handle is None:
+            return False
+        handle.cancel()
+        return True
+
+
+query_control = QueryControl()
@@ -1,38 +1,345 @@
-from sqlalchemy import create_engine, text
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
 from app.models.metadata import DBConnection
-from app.services.security_service import SecurityService
+from app.services.security_service import ParsedSQL, SecurityService
+from app.services.dialect import resolve_dialect
+from app.services.engine_registry import engine_registry
+from app.services.cursor_registry import cursor_registry
+from app.services.result_cache import result_cache, fingerprint_sql
+from app.services.sql_rewrite import limit_query
+from app.services.sql_optimizer import QueryOptimizer
+from app.services.cost_guard import CostGuard
+from app.services.explain_service import PlanEstimate
+from app.services.query_control import query_control, QueryHandle
+from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class QueryResult:
+    columns: List[str] = field(default_factory=list)
+    rows: List[tuple] = field(default_factory=list)
+    # Set for statements that do not return rows
+    rows_affected: Optional[int] = None
+    # Opaque token for fetching the next page of a paged query
+    next_cursor: Optional[str] = None
+    # None when the result cache was not consulted
+    cache_hit: Optional[bool] = None
+    cache_age: Optional[float] = None
+    # Row cap applied to the query and whether rows beyond it were dropped
+    row_limit: Optional[int] = None
+    truncated: bool = False
+    query_id: Optional[str] = None
+    # None when optimization was not requested, otherwise whether the statement was rewritten
+    optimized: Optional[bool] = None
+    optimized_sql: Optional[str] = None
+    # Planner estimate from the cost guard, and its warning when over a limit
+    estimate: Optional[PlanEstimate] = None
+    warning: Optional[str] = None
+
+    @property
+    def returns_rows(self) -> bool:
+        return self.rows_affected is None
+
+    def records(self) -> List[Dict[str, Any]]:
+        if not self.returns_rows:
+            return [{"message": "Query executed successfully", "rows_affected": self.rows_affected}]
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+class StreamedResult:
+    """
+    An open result set on a dedicated target connection, read in batches.
+    Uses server-side cursors where the driver supports them, so memory is bounded by the batch size.
+    """
+
+    def __init__(self, conn, result, max_rows: Optional[int] = None, handle: Optional[QueryHandle] = None,
+                 on_close: Optional[Callable[[], None]] = None):
+        self.conn = conn
+        self.result = result
+        # Applies the statement timeout and lets query_control cancel the stream
+        self.handle = handle
+        self._on_close = on_close
+        self.columns = list(result.keys())
+        # Driver-reported column types, e.g. for the Arrow schema (see serialization.arrow_types)
+        self.dialect = conn.dialect.name
+        self.description = result.cursor.description if result.cursor is not None else None
+        self.max_rows = max_rows
+        self.rows_read = 0
+        self.exhausted = False
+        # Set when rows beyond max_rows were left unread
+        self.truncated = False
+        self._lookahead: List[tuple] = []
+
+    def fetch(self, size: int) -> List[tuple]:
+        if self.max_rows is not None:
+            size = min(size, self.max_rows - self.rows_read)
+        if self.handle:
+            self.handle.restart()
+        # Read one row ahead so callers know a page is the last one without an extra empty round trip
+        try:
+            fetched = self.result.fetchmany(size + 1 - len(self._lookahead))
+        except DBAPIError as e:
+            raise (self.handle.translate(e) if self.handle else e) from e
+        rows = self._lookahead + [tuple(row) for row in fetched]
+        self._lookahead = rows[size:]
+        rows = rows[:size]
+        self.rows_read += len(rows)
+        if not self._lookahead:
+            self.exhausted = True
+        elif self.max_rows is not None and self.rows_read >= self.max_rows:
+            self.exhausted = True
+            self.truncated = True
+        return rows
+
+    def batches(self, size: int) -> Iterator[List[tuple]]:
+        while not self.exhausted:
+            rows = self.fetch(size)
+            if rows:
+                yield rows
+
+    def close(self):
+        try:
+            if self.handle:
+                self.handle.detach()
+            self.result.close()
+        finally:
+            self.conn.close()
+            if self._on_close:
+                self._on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 class QueryService:
     def __init__(self, db: Session):
         self.db = db
         self.security_service = SecurityService()
 
+    def parse(self, connection_id: int, sql: str) -> ParsedSQL:
+        """Validates SQL in the connection's dialect; raises ValueError if it is invalid or unsafe."""
+        return self.security_service.parse(sql, resolve_dialect(self._get_connection(connection_id)))
+
+    def check_cost(self, connection_id: int, sql: str, estimate: bool = False) -> Tuple[Optional[PlanEstimate], Optional[str]]:
+        """
+        CostGuard pre-flight for callers that run the statement themselves (e.g. binary
+        streaming): validates the SQL, then checks it as written, before any row cap.
+        """
+        connection = self._get_connection(connection_id)
+        self.security_service.parse(sql, resolve_dialect(connection))
+        return CostGuard().check(connection, sql, estimate=estimate)
+
     def execute_sql(self, connection_id: int, sql: str):
-        connection = self.db.query(DBConnection).filter(DBConnection.id == connection_id).first()
-        if not connection:
-            raise ValueError(f"Connection {connection_id} not found")
+        result = self.execute(connection_id, sql)
+        records = result.records()
+        return records if result.returns_rows else records[0]
+
+    def execute(
+        self,
+        connection_id: int,
+        sql: str,
+        page_size: Optional[int] = None,
+        use_cache: bool = False,
+        max_rows: Optional[int] = None,
+        apply_limit: bool = True,
+        query_id: Optional[str] = None,
+        optimize: bool = False,
+        guard: bool = False,
+        estimate: bool = False,
+    ) -> QueryResult:
+        """
+        Runs a query and returns its full result. Row-returning queries are capped at the
+        connection's max_rows option (or QUERY_MAX_ROWS), tightened by max_rows if given; pass
+        apply_limit=False to opt out. Paged queries are bounded by page size instead.
+        With optimize, a single SELECT is rewritten by QueryOptimizer before it runs.
+        With guard, the statement is checked by CostGuard first (before the row cap is added, so
+        row estimates are not capped by it; cached results skip the check), which may raise
+        QueryRejectedError or QueryReroutedError; estimate also returns the planner's estimate
+        when no limits are configured.
+        The statement runs under the connection's statement timeout and can be cancelled
+        through query_control using query_id (generated when not given).
+        """
+        connection = self._get_connection(connection_id)
 
         # Validate SQL
-        self.security_service.validate_sql(sql)
+        parsed = self.security_service.parse(sql, resolve_dialect(connection))
+
+        if page_size:
+            plan, warning = CostGuard().check(connection, sql, estimate=estimate) if guard else (None, None)
+            result = self._execute_paged(connection_id, sql, page_size, query_id)
+            result.estimate, result.warning = plan, warning
+            return result
+
+        statements = parsed.expressions
+        optimized = QueryOptimizer(self.db).optimize(connection, parsed) if optimize else None
+        if optimized is not None:
+            statements = [optimized]
+            sql = optimized.sql(dialect=parsed.dialect)
+        optimized_sql = sql if optimized is not None else None
+        guarded_sql = sql
+
+        row_limit = self._row_limit(connection, apply_limit, max_rows)
+        if row_limit and len(statements) == 1:
+            limited = limit_query(statements[0], row_limit)
+            if limited is not None:
+                statements = [limited]
+                sql = limited.sql(dialect=parsed.dialect)
 
+        cache_ttl = connection.get_option("result_cache_ttl", settings.QUERY_CACHE_TTL_SECONDS) if use_cache else 0
+        if cache_ttl:
+            fingerprint = fingerprint_sql(statements, parsed.dialect)
+            cached = result_cache.get(connection.id, fingerprint, cache_ttl)
+            if cached is not None:
+                columns, rows, age = cached
+                result = QueryResult(columns=columns, rows=rows, cache_hit=True, cache_age=age)
+                return self._truncate(self._mark_optimized(result, optimize, optimized_sql), row_limit)
+
+        plan, warning = CostGuard().check(connection, guarded_sql, estimate=estimate) if guard else (None, None)
+        result = self._run(connection, sql, row_limit, query_id)
+        result.estimate, result.warning = plan, warning
+
+        if cache_ttl and result.returns_rows:
+            result_cache.put(connection.id, fingerprint, result.columns, result.rows)
+            result.cache_hit = False
+            result.cache_age = 0.0
+        return self._truncate(self._mark_optimized(result, optimize, optimized_sql), row_limit)
+
+    def _run(
+        self,
+        connection: DBConnection,
+        sql: str,
+        row_limit: Optional[int] = None,
+        query_id: Optional[str] = None,
+    ) -> QueryResult:
+        timeout = connection.get_option("statement_timeout", settings.QUERY_STATEMENT_TIMEOUT_SECONDS)
         try:
-            # Create engine for the target database
-            target_engine = create_engine(connection.connection_url)
+            # Reuse the pooled engine for the target database
+            target_engine = engine_registry.get_engine(connection)
             
-            with target_engine.connect() as conn:
-                result = conn.execute(text(sql))
-                
-                if result.returns_rows:
-                    data = [dict(row) for row in result.mappings()]
-                    return data
-                else:
-                    conn.commit()
-                    return {"message": "Query executed successfully", "rows_affected": result.rowcount}
+            with query_control.track(query_id, connection.id, timeout) as handle, target_engine.connect() as conn:
+                handle.attach(conn, target_engine)
+                try:
+                    result = conn.execute(text(sql))
+                    
+                    if result.returns_rows:
+                        # Never read past the cap, even for statements the LIMIT rewrite could not touch
+                        rows = result.fetchmany(row_limit + 1) if row_limit else result.fetchall()
+                        return QueryResult(
+                            columns=list(result.keys()), rows=[tuple(row) for row in rows], query_id=handle.query_id
+                        )
+                    else:
+                        conn.commit()
+                        return QueryResult(rows_affected=result.rowcount, query_id=handle.query_id)
+                except DBAPIError as e:
+                    raise handle.translate(e) from e
+                finally:
+                    handle.detach()
+
+        except Exception as e:
+            logger.error(f"Error executing query: {e}")
+            raise e
+
+    @staticmethod
+    def _row_limit(connection: DBConnection, apply_limit: bool, max_rows: Optional[int]) -> Optional[int]:
+        if not apply_limit:
+            return None
+        row_limit = connection.get_option("max_rows", settings.QUERY_MAX_ROWS)
+        if max_rows:
+            row_limit = min(row_limit, max_rows) if row_limit else max_rows
+        return row_limit
+
+    @staticmethod
+    def _mark_optimized(result: QueryResult, optimize: bool, optimized_sql: Optional[str]) -> QueryResult:
+        if optimize:
+            result.optimized = optimized_sql is not None
+            result.optimized_sql = optimized_sql
+        return result
+
+    @staticmethod
+    def _truncate(result: QueryResult, row_limit: Optional[int]) -> QueryResult:
+        if not row_limit or not result.returns_rows:
+            return result
+        result.row_limit = row_limit
+        if len(result.rows) > row_limit:
+            result.rows = result.rows[:row_limit]
+            result.truncated = True
+        return result
 
+    def stream_sql(
+        self,
+        connection_id: int,
+        sql: str,
+        apply_limit: bool = False,
+        max_rows: Optional[int] = None,
+        query_id: Optional[str] = None,
+    ) -> StreamedResult:
+        """
+        Executes a row-returning query and leaves the cursor open for batched reads.
+        Unlike execute, no row cap applies unless apply_limit is set. The connection's statement
+        timeout applies to the execution and then to each fetch on its own, so slow readers are not
+        cut off. The stream can be cancelled through query_control with its query_id until it is
+        closed. The caller owns the returned result and must close it.
+        """
+        connection = self._get_connection(connection_id)
+        parsed = self.security_service.parse(sql, resolve_dialect(connection))
+
+        row_limit = self._row_limit(connection, apply_limit, max_rows)
+        if row_limit and parsed.single is not None:
+            limited = limit_query(parsed.single, row_limit)
+            if limited is not None:
+                sql = limited.sql(dialect=parsed.dialect)
+
+        timeout = connection.get_option("statement_timeout", settings.QUERY_STATEMENT_TIMEOUT_SECONDS)
+        engine = engine_registry.get_engine(connection)
+        tracking = ExitStack()
+        conn = engine.connect()
+        handle = None
+        try:
+            handle = tracking.enter_context(query_control.track(query_id, connection.id, timeout))
+            handle.attach(conn, engine)
+            try:
+                result = conn.execution_options(stream_results=True).execute(text(sql))
+            except DBAPIError as e:
+                raise handle.translate(e) from e
+            if not result.returns_rows:
+                raise ValueError("Query does not return rows")
+            return StreamedResult(conn, result, max_rows=row_limit or None, handle=handle, on_close=tracking.close)
         except Exception as e:
+            if handle:
+                handle.detach()
+            conn.close()
+            tracking.close()
             logger.error(f"Error executing query: {e}")
             raise e
+
+    def fetch_page(self, cursor: str, page_size: int) -> QueryResult:
+        columns, rows, next_cursor = cursor_registry.fetch(cursor, page_size)
+        return QueryResult(columns=columns, rows=rows, next_cursor=next_cursor)
+
+    def _execute_paged(self, connection_id: int, sql: str, page_size: int, query_id: Optional[str] = None) -> QueryResult:
+        streamed = self.stream_sql(connection_id, sql, query_id=query_id)
+        try:
+            rows = streamed.fetch(page_size)
+        except Exception:
+            streamed.close()
+            raise
+        if streamed.exhausted:
+            streamed.close()
+            return QueryResult(columns=streamed.columns, rows=rows, query_id=streamed.handle.query_id)
+        return QueryResult(
+            columns=streamed.columns, rows=rows, query_id=streamed.handle.query_id,
+            next_cursor=cursor_registry.register(connection_id, streamed),
+        )
+
+    def _get_connection(self, connection_id: int) -> DBConnection:
+        connection = self.db.query(DBConnection).filter(DBConnection.id == connection_id).first()
+        if not connection:
+            raise ValueError(f"Connection {connection_id} not found")
+        return connection
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from sqlglot import exp
+from app.core.config import settings
+from app.core.files import private_directory
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint_sql(expressions: List[exp.Expression], dialect: Optional[str] = None) -> str:
+    """Stable hash of the normalized statements, so formatting and keyword case do not split cache entries."""
+    normalized = ";".join(e.sql(dialect=dialect, normalize=True, comments=False) for e in expressions)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class _CachedResult:
+    def __init__(self, columns: List[str], rows: List[tuple], created_at: float, payload: bytes):
+        self.columns = columns
+        self.rows = rows
+        self.created_at = created_at
+        self.payload = payload
+
+
+class ResultCache:
+    """
+    Results of read-only queries keyed by (connection id, SQL fingerprint).
+    Memory use is bounded by max_bytes (pickled size); least recently used entries are evicted
+    first and, when spill_dir is set, written to disk so they can still be served later.
+    Spilled entries are unpickled when loaded, so spill_dir must be private to the service
+    user (see private_directory); spilling is skipped while it is not.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, spill_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.spill_dir = spill_dir
+        self._entries: "OrderedDict[Tuple[int, str], _CachedResult]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, connection_id: int, fingerprint: str, ttl: float) -> Optional[Tuple[List[str], List[tuple], float]]:
+        """Returns (columns, rows, age_seconds) for a live entry, or None."""
+        key = (connection_id, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            entry = self._load_spilled(key)
+            if entry is None:
+                return None
+            self._store(key, entry)
+
+        age = time.time() - entry.created_at
+        if age > ttl:
+            self._drop(key)
+            return None
+        return entry.columns, entry.rows, age
+
+    def put(self, connection_id: int, fingerprint: str, columns: List[str], rows: List[tuple]) -> None:
+        created_at = time.time()
+        try:
+            payload = pickle.dumps((columns, rows, created_at), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"Result not cacheable: {e}")
+            return
+        if len(payload) > min(self.max_entry_bytes, self.max_bytes):
+            return
+        self._store((connection_id, fingerprint), _CachedResult(columns, rows, created_at, payload))
+
+    def invalidate(self, connection_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == connection_id]:
+                self._bytes -= len(self._entries.pop(key).payload)
+        if self.spill_dir and os.path.isdir(self.spill_dir):
+            prefix = f"{connection_id}-"
+            for name in os.listdir(self.spill_dir):
+                if name.startswith(prefix):
+                    self._remove_file(os.path.join(self.spill_dir, name))
+
+    def _store(self, key, entry: _CachedResult) -> None:
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.payload)
+            self._entries[key] = entry
+            self._bytes += len(entry.payload)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_key, evicted_entry = self._entries.popitem(last=False)
+                self._bytes -= len(evicted_entry.payload)
+                evicted.append((evicted_key, evicted_entry))
+        for evicted_key, evicted_entry in evicted:
+            self._spill(evicted_key, evicted_entry)
+
+    def _drop(self, key) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= len(entry.payload)
+        if self.spill_dir:
+            self._remove_file(self._spill_path(key))
+
+    def _spill_directory(self) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        try:
+            return private_directory(self.spill_dir, "sqlpilot-cache-")
+        except OSError as e:
+            logger.warning(f"Not spilling cached results to {self.spill_dir}: {e}")
+            return None
+
+    def _spill(self, key, entry: _CachedResult) -> None:
+        if not self._spill_directory():
+            return
+        try:
+            tmp_path = self._spill_path(key) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(entry.payload)
+            os.replace(tmp_path, self._spill_path(key))
+        except OSError as e:
+            logger.warning(f"Could not spill cached result to disk: {e}")
+
+    def _load_spilled(self, key) -> Optional[_CachedResult]:
+        if not self._spill_directory():
+            return None
+        path = self._spill_path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            return None
+        self._remove_file(path)
+        columns, rows, created_at = pickle.loads(payload)
+        return _CachedResult(columns, rows, created_at, payload)
+
+    def _spill_path(self, key) -> str:
+        connection_id, fingerprint = key
+        return os.path.join(self.spill_dir, f"{connection_id}-{fingerprint}.pkl")
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+result_cache = ResultCache(
+    max_bytes=settings.QUERY_CACHE_MAX_BYTES,
+    max_entry_bytes=settings.QUERY_CACHE_MAX_ENTRY_BYTES,
+    spill_dir=settings.QUERY_CACHE_SPILL_DIR,
+)
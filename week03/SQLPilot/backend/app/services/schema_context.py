@@ -0,0 +1,182 @@
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.metadata import DBConnection, TableMetadata, SchemaArtifact
+from app.services.schema_retrieval import SchemaIndex, embedding_backend, table_document
+
+DDL = "ddl"
+RETRIEVAL = "retrieval"
+
+# (connection id, kind) -> (schema_version, loaded artifact or derived value)
+_schema_prompt_cache = LRUCache(settings.SCHEMA_PROMPT_CACHE_SIZE)
+
+
+def render_table_ddl(table: TableMetadata) -> str:
+    """DDL-like description of a table, which LLMs understand better than a plain listing."""
+    cols = []
+    for col in table.columns:
+        col_def = f"  {col.column_name} {col.data_type}"
+        if col.is_primary_key:
+            col_def += " PRIMARY KEY"
+        if col.foreign_table:
+            col_def += f" REFERENCES {col.foreign_table}({col.foreign_column})"
+        cols.append(col_def)
+    return f"CREATE TABLE {table.qualified_name} (\n" + ",\n".join(cols) + "\n);\n\n"
+
+
+def render_ddl(tables: List[TableMetadata]) -> str:
+    return "".join(render_table_ddl(table) for table in tables)
+
+
+def build_retrieval_index(tables: List[TableMetadata]) -> SchemaIndex:
+    neighbors: Dict[str, List[str]] = defaultdict(list)
+    references: Dict[str, List[str]] = defaultdict(list)
+    for table in tables:
+        for col in table.columns:
+            if col.foreign_table and col.foreign_table != table.qualified_name:
+                references[table.qualified_name].append(col.foreign_table)
+                neighbors[table.qualified_name].append(col.foreign_table)
+                neighbors[col.foreign_table].append(table.qualified_name)
+    documents = [
+        table_document(
+            table.qualified_name,
+            render_table_ddl(table),
+            [col.column_name for col in table.columns],
+            table.description,
+            list(dict.fromkeys(neighbors[table.qualified_name])),
+            list(dict.fromkeys(references[table.qualified_name])),
+        )
+        for table in tables
+    ]
+    return SchemaIndex.build(documents, embedding_backend())
+
+
+# kind -> (build stored content from the tables, load stored content)
+_ARTIFACTS = {
+    DDL: (render_ddl, lambda content: content),
+    RETRIEVAL: (lambda tables: build_retrieval_index(tables).dumps(), SchemaIndex.loads),
+}
+
+
+def load_tables(db: Session, connection_id: int) -> List[TableMetadata]:
+    return (
+        db.query(TableMetadata)
+        .options(joinedload(TableMetadata.columns))
+        .filter(TableMetadata.connection_id == connection_id)
+        .order_by(TableMetadata.id)
+        .execution_options(populate_existing=True)
+        .all()
+    )
+
+
+def rebuild(db: Session, connection_id: int, schema_version: int) -> None:
+    """
+    Replaces the connection's artifacts within the caller's transaction; called by re-indexing
+    once the new metadata has been flushed.
+    """
+    db.execute(delete(SchemaArtifact).where(SchemaArtifact.connection_id == connection_id))
+    evict(connection_id)
+    tables = load_tables(db, connection_id)
+    if not tables:
+        return
+    for kind, (build, _) in _ARTIFACTS.items():
+        db.add(SchemaArtifact(connection_id=connection_id, kind=kind, schema_version=schema_version, content=build(tables)))
+
+
+def evict(connection_id: int) -> None:
+    """Drops the in-memory copies only, e.g. when the connection is deleted."""
+    _schema_prompt_cache.pop_where(lambda key, _: key[0] == connection_id)
+
+
+def cached(connection_id: int, kind: str, schema_version: int, build: Callable[[], Any]) -> Any:
+    """
+    In-process value derived from the metadata that is cheap enough not to persist; it shares the
+    artifacts' LRU, so it is dropped along with them on re-indexing and deletion.
+    """
+    entry = _schema_prompt_cache.get((connection_id, kind))
+    if entry is not None and entry[0] == schema_version:
+        return entry[1]
+    value = build()
+    if value is not None:
+        _schema_prompt_cache.set((connection_id, kind), (schema_version, value))
+    return value
+
+
+class SchemaContextService:
+    """
+    Serves the schema context for a connection's prompts. Artifacts are built once per schema
+    version from a single eager-loaded query (normally by re-indexing), persisted in
+    schema_artifacts so they survive restarts, and kept in an in-process LRU.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_ddl(self, connection_id: int) -> Optional[str]:
+        """Rendered schema for the connection, or None if it has not been indexed."""
+        return self._get(connection_id, DDL)
+
+    def get_index(self, connection_id: int) -> Optional[SchemaIndex]:
+        return self._get(connection_id, RETRIEVAL)
+
+    def get_prompt_schema(self, connection_id: int, question: str) -> Optional[str]:
+        """
+        Schema context for a question: the whole schema when it is small, otherwise only the
+        most relevant tables and their join partners.
+        """
+        index = self.get_index(connection_id)
+        if index is None:
+            return None
+        if len(index) <= settings.SCHEMA_PROMPT_FULL_MAX_TABLES:
+            return self.get_ddl(connection_id)
+        names = index.search(question, settings.SCHEMA_RETRIEVAL_TOP_K, embedding_backend())
+        if not names:
+            # Nothing matched; the whole schema beats an empty one
+            return self.get_ddl(connection_id)
+        return index.render(names)
+
+    def _get(self, connection_id: int, kind: str) -> Any:
+        connection = self.db.get(DBConnection, connection_id)
+        if connection is None:
+            return None
+        version = connection.schema_version or 0
+
+        cached = _schema_prompt_cache.get((connection_id, kind))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        build, load = _ARTIFACTS[kind]
+        artifact = (
+            self.db.query(SchemaArtifact)
+            .filter(SchemaArtifact.connection_id == connection_id, SchemaArtifact.kind == kind)
+            .first()
+        )
+        if artifact is not None and artifact.schema_version == version:
+            content = artifact.content
+        else:
+            # Indexed before this artifact existed, or the stored copy is stale
+            tables = load_tables(self.db, connection_id)
+            if not tables:
+                return None
+            content = build(tables)
+            self._store(artifact, connection_id, kind, version, content)
+
+        value = load(content)
+        _schema_prompt_cache.set((connection_id, kind), (version, value))
+        return value
+
+    def _store(self, artifact: Optional[SchemaArtifact], connection_id: int, kind: str, version: int, content: str) -> None:
+        if artifact is None:
+            artifact = SchemaArtifact(connection_id=connection_id, kind=kind)
+            self.db.add(artifact)
+        artifact.schema_version = version
+        artifact.content = content
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # Another request stored it concurrently; its copy is just as good
+            self.db.rollback()
@@ -0,0 +1,179 @@
+import importlib
+import json
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Protocol
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Table names say more about relevance than any single column
+TABLE_NAME_WEIGHT = 3
+# Share of the final score taken by embedding similarity when a backend is configured
+EMBEDDING_WEIGHT = 0.5
+
+STOPWORDS = {
+    "a", "an", "and", "are", "by", "each", "for", "from", "how", "in", "is", "many", "me", "much",
+    "of", "on", "or", "per", "show", "than", "that", "the", "their", "to", "what", "which", "who",
+    "with", "all", "list", "give", "get", "find", "top",
+}
+
+_WORD_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+class EmbeddingBackend(Protocol):
+    def embed(self, texts: List[str]) -> List[List[float]]: ...
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word stems; identifiers are split on underscores and camelCase."""
+    tokens = []
+    for word in _WORD_RE.findall(text or ""):
+        word = word.lower()
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+@lru_cache(maxsize=1)
+def embedding_backend() -> Optional[EmbeddingBackend]:
+    """Backend named by SCHEMA_EMBEDDING_BACKEND ("module:factory"), or None for lexical-only retrieval."""
+    if not settings.SCHEMA_EMBEDDING_BACKEND:
+        return None
+    module_name, _, attr = settings.SCHEMA_EMBEDDING_BACKEND.partition(":")
+    try:
+        return getattr(importlib.import_module(module_name), attr)()
+    except Exception as e:
+        logger.error(f"Could not load embedding backend {settings.SCHEMA_EMBEDDING_BACKEND}: {e}")
+        return None
+
+
+def table_document(
+    name: str,
+    ddl: str,
+    columns: List[str],
+    description: Optional[str],
+    neighbors: List[str],
+    references: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """neighbors are foreign-key partners in either direction; references the tables this one points to."""
+    terms = Counter()
+    for token in tokenize(name):
+        terms[token] += TABLE_NAME_WEIGHT
+    for text in columns + [description or ""] + neighbors:
+        terms.update(tokenize(text))
+    return {"name": name, "ddl": ddl, "terms": dict(terms), "neighbors": neighbors, "references": references or []}
+
+
+class SchemaIndex:
+    """
+    Lexical (BM25) index over a connection's tables: names, columns, descriptions and foreign-key
+    neighbours. Documents carry their rendered DDL so a prompt can be assembled for the selected
+    tables without touching the metadata DB. If an embedding backend is configured, table vectors
+    are computed at build time and blended into the score.
+    """
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = documents
+        self._by_name = {doc["name"]: doc for doc in documents}
+        self._lengths = [sum(doc["terms"].values()) for doc in documents]
+        self._avg_length = (sum(self._lengths) / len(documents)) if documents else 0
+        frequencies = Counter(term for doc in documents for term in doc["terms"])
+        n = len(documents)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @classmethod
+    def build(cls, documents: List[Dict[str, Any]], backend: Optional[EmbeddingBackend] = None) -> "SchemaIndex":
+        if backend is not None and documents:
+            vectors = backend.embed([doc["ddl"] for doc in documents])
+            for doc, vector in zip(documents, vectors):
+                doc["vector"] = list(vector)
+        return cls(documents)
+
+    @classmethod
+    def loads(cls, content: str) -> "SchemaIndex":
+        return cls(json.loads(content))
+
+    def dumps(self) -> str:
+        return json.dumps(self.documents, separators=(",", ":"))
+
+    def search(self, question: str, top_k: int, backend: Optional[EmbeddingBackend] = None) -> List[str]:
+        """
+        Names of the top_k most relevant tables followed by some of their foreign-key neighbours:
+        at most SCHEMA_RETRIEVAL_NEIGHBORS_PER_TABLE per table and SCHEMA_RETRIEVAL_MAX_NEIGHBORS
+        in total, the tables a hit references first, then the tables referencing it by score.
+        A hub table referenced by everything therefore does not pull the whole schema in.
+        """
+        scores = self._bm25(tokenize(question))
+        if backend is not None and all("vector" in doc for doc in self.documents):
+            scores = self._blend(scores, backend.embed([question])[0])
+
+        ranked = sorted(
+            (i for i, score in enumerate(scores) if score > 0),
+            key=lambda i: scores[i],
+            reverse=True,
+        )[:top_k]
+        selected = [self.documents[i]["name"] for i in ranked]
+        score_of = {doc["name"]: score for doc, score in zip(self.documents, scores)}
+        # Join partners of the hits, so the model can write the joins
+        budget = settings.SCHEMA_RETRIEVAL_MAX_NEIGHBORS
+        for i in ranked:
+            doc = self.documents[i]
+            references = doc.get("references", [])
+            referencing = sorted(
+                (name for name in doc["neighbors"] if name not in references),
+                key=lambda name: score_of.get(name, 0),
+                reverse=True,
+            )
+            added = 0
+            for neighbor in references + referencing:
+                if budget <= 0 or added >= settings.SCHEMA_RETRIEVAL_NEIGHBORS_PER_TABLE:
+                    break
+                if neighbor in self._by_name and neighbor not in selected:
+                    selected.append(neighbor)
+                    added += 1
+                    budget -= 1
+        return selected
+
+    def render(self, names: List[str]) -> str:
+        return "".join(self._by_name[name]["ddl"] for name in names if name in self._by_name)
+
+    def _bm25(self, query: List[str]) -> List[float]:
+        scores = []
+        for doc, length in zip(self.documents, self._lengths):
+            score = 0.0
+            for term in query:
+                tf = doc["terms"].get(term)
+                if not tf:
+                    continue
+                norm = K1 * (1 - B + B * length / self._avg_length)
+                score += self._idf[term] * tf * (K1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def _blend(self, scores: List[float], query_vector: List[float]) -> List[float]:
+        top = max(scores) or 1.0
+        return [
+            (1 - EMBEDDING_WEIGHT) * score / top + EMBEDDING_WEIGHT * max(_cosine(doc["vector"], query_vector), 0)
+            for score, doc in zip(scores, self.documents)
+        ]
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
@@ -0,0 +1,228 @@
+import difflib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+from sqlglot import exp
+from sqlglot.optimizer.scope import Scope, traverse_scope
+from sqlalchemy.orm import Session
+from app.models.metadata import DBConnection
+from app.services import schema_context
+from app.services.dialect import default_schema
+from app.services.metadata_service import SYSTEM_SCHEMAS
+from app.services.sql_rewrite import LIMITABLE_TYPES
+
+SYMBOLS = "symbols"
+
+# Tables the metadata never lists but queries may legitimately read
+SYSTEM_TABLE_PREFIXES = ("pg_", "sqlite_")
+
+
+class SchemaValidationError(ValueError):
+    """SQL references tables or columns that do not exist; errors is a list of structured problems."""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        self.errors = errors
+        super().__init__("; ".join(error["message"] for error in errors))
+
+
+@dataclass
+class SymbolTable:
+    # lower-cased qualified name -> lower-cased column names
+    tables: Dict[str, Set[str]] = field(default_factory=dict)
+    # lower-cased bare table name -> qualified names carrying it (one per schema)
+    by_name: Dict[str, List[str]] = field(default_factory=dict)
+
+    def add(self, qualified_name: str, table_name: str, columns: List[str]) -> None:
+        key = qualified_name.lower()
+        self.tables[key] = {column.lower() for column in columns}
+        self.by_name.setdefault(table_name.lower(), []).append(key)
+
+
+@dataclass
+class ValidationResult:
+    expression: exp.Expression
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    # Set when references were rewritten (e.g. tables qualified with their schema)
+    rewritten: bool = False
+
+
+class SchemaValidator:
+    """
+    Resolves every table and column reference of a statement against the indexed metadata,
+    scope by scope (CTEs, derived tables and correlated subqueries included), without a round
+    trip to the target database. Unqualified tables that only exist in another schema are
+    qualified in place; anything unresolvable is reported as a structured error with suggestions,
+    suitable for feeding back to the LLM.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def symbols(self, connection_id: int) -> Optional[SymbolTable]:
+        """The connection's symbol table, or None if it has not been indexed."""
+        connection = self.db.get(DBConnection, connection_id)
+        if connection is None:
+            return None
+
+        def build() -> Optional[SymbolTable]:
+            tables = schema_context.load_tables(self.db, connection_id)
+            if not tables:
+                return None
+            symbols = SymbolTable()
+            for table in tables:
+                symbols.add(table.qualified_name, table.table_name, [col.column_name for col in table.columns])
+            return symbols
+
+        return schema_context.cached(connection_id, SYMBOLS, connection.schema_version or 0, build)
+
+    def validate(self, connection_id: int, expression: exp.Expression) -> ValidationResult:
+        """
+        Checks a statement; the expression is copied before any rewrite. Connections without
+        indexed metadata are not checked.
+        """
+        symbols = self.symbols(connection_id)
+        result = ValidationResult(expression)
+        if symbols is None:
+            return result
+
+        # Indexed without a qualifier, so e.g. public.users must resolve like users
+        default = default_schema(self.db.get(DBConnection, connection_id))
+        expression = expression.copy()
+        result.expression = expression
+        for scope in traverse_scope(expression):
+            scope_tables = {
+                alias: self._resolve_table(source, symbols, result, default)
+                for alias, source in scope.sources.items()
+                if isinstance(source, exp.Table)
+            }
+            for column in scope.columns:
+                # Unqualified columns of subqueries are also listed by their parent scope
+                if column.find_ancestor(*LIMITABLE_TYPES) is not scope.expression:
+                    continue
+                self._check_column(column, scope, scope_tables, symbols, result)
+        return result
+
+    def _resolve_table(
+        self, table: exp.Table, symbols: SymbolTable, result: ValidationResult, default_schema: Optional[str] = None
+    ) -> Optional[Set[str]]:
+        """Column names of a table source, or None when they cannot be known."""
+        if not isinstance(table.this, exp.Identifier):
+            # Table-valued function
+            return None
+        name, schema = table.name, table.db
+        if (schema and schema.lower() in SYSTEM_SCHEMAS) or name.lower().startswith(SYSTEM_TABLE_PREFIXES):
+            return None
+
+        key = f"{schema}.{name}".lower() if schema else name.lower()
+        if key in symbols.tables:
+            return symbols.tables[key]
+        if schema and default_schema and schema.lower() == default_schema.lower() and name.lower() in symbols.tables:
+            return symbols.tables[name.lower()]
+        if not schema:
+            matches = [q for q in symbols.by_name.get(name.lower(), []) if "." in q]
+            if len(matches) == 1:
+                # Only exists in a non-default schema: qualify the reference
+                table.set("db", exp.to_identifier(matches[0].split(".", 1)[0]))
+                result.rewritten = True
+                return symbols.tables[matches[0]]
+
+        result.errors.append({
+            "code": "unknown_table",
+            "message": f"Table {key} does not exist",
+            "table": key,
+            "suggestions": difflib.get_close_matches(key, symbols.tables.keys(), n=3),
+        })
+        return None
+
+    def _check_column(
+        self,
+        column: exp.Column,
+        scope: Scope,
+        scope_tables: Dict[str, Optional[Set[str]]],
+        symbols: SymbolTable,
+        result: ValidationResult,
+    ) -> None:
+        name = column.name.lower()
+        qualifier = column.table
+        if not isinstance(scope.expression, exp.Select):
+            # ORDER BY of a set operation: only the combined output columns are visible
+            columns = _output_columns(scope.expression)
+            if columns is not None and name not in columns:
+                self._unknown_column(column, qualifier, columns, result)
+            return
+        if qualifier:
+            for current in _scope_chain(scope):
+                source = current.sources.get(qualifier)
+                if source is None:
+                    continue
+                columns = self._source_columns(source, scope_tables if current is scope else None, symbols)
+                if columns is not None and name not in columns:
+                    self._unknown_column(column, qualifier, columns, result)
+                return
+            result.errors.append({
+                "code": "unknown_alias",
+                "message": f"Column {qualifier}.{column.name} refers to unknown table or alias {qualifier}",
+                "table": qualifier,
+                "column": column.name,
+                "suggestions": list(scope.sources.keys()),
+            })
+            return
+
+        aliases = {select.alias.lower() for select in scope.expression.expressions if isinstance(select, exp.Alias)}
+        if name in aliases:
+            # Reference to an output alias (ORDER BY / GROUP BY / HAVING)
+            return
+        candidates = []
+        for current in _scope_chain(scope):
+            for source in current.sources.values():
+                columns = self._source_columns(source, scope_tables if current is scope else None, symbols)
+                if columns is None:
+                    # A source with unknown columns could provide it
+                    return
+                candidates.append(columns)
+            if any(name in columns for columns in candidates):
+                return
+        known = set().union(*candidates) if candidates else set()
+        self._unknown_column(column, None, known, result)
+
+    def _source_columns(self, source: Any, scope_tables: Optional[Dict[str, Optional[Set[str]]]], symbols: SymbolTable) -> Optional[Set[str]]:
+        if isinstance(source, exp.Table):
+            if scope_tables is not None and source.alias_or_name in scope_tables:
+                return scope_tables[source.alias_or_name]
+            key = f"{source.db}.{source.name}".lower() if source.db else source.name.lower()
+            return symbols.tables.get(key)
+        if isinstance(source, Scope):
+            return _output_columns(source.expression)
+        return None
+
+    @staticmethod
+    def _unknown_column(column: exp.Column, qualifier: Optional[str], known: Set[str], result: ValidationResult) -> None:
+        reference = f"{qualifier}.{column.name}" if qualifier else column.name
+        result.errors.append({
+            "code": "unknown_column",
+            "message": f"Column {reference} does not exist",
+            "table": qualifier,
+            "column": column.name,
+            "suggestions": difflib.get_close_matches(column.name.lower(), known, n=3),
+        })
+
+
+def _output_columns(expression: exp.Expression) -> Optional[Set[str]]:
+    """
+    Column names a query exposes, taken from an alias column list such as t(a) when the CTE or
+    derived table has one; None when they cannot be known (SELECT *).
+    """
+    parent = expression.parent
+    alias = parent.args.get("alias") if isinstance(parent, (exp.CTE, exp.Subquery)) else None
+    if alias is not None and alias.columns:
+        return {column.name.lower() for column in alias.columns}
+    names = expression.named_selects
+    if not names or "*" in names:
+        return None
+    return {name.lower() for name in names}
+
+
+def _scope_chain(scope: Scope):
+    """The scope and its enclosing scopes, innermost first (for correlated references)."""
+    while scope is not None:
+        yield scope
+        scope = scope.parent
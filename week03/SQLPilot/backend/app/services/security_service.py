@@ -1,35 +1,76 @@
 import sqlglot
 from sqlglot import exp
+from typing import List, Optional, Tuple
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+DESTRUCTIVE_TYPES = (
+    exp.Drop, 
+    exp.Delete, 
+    # exp.Truncate, # Truncate might be different in newer sqlglot versions
+    exp.Alter, 
+    exp.Update, 
+    exp.Insert,
+    exp.Create, 
+)
+
+class ParsedSQL:
+    """
+    Validated statements for one SQL string. Instances are cached and shared between requests,
+    so downstream stages must treat the expressions as read-only and copy() before rewriting.
+    """
+
+    def __init__(self, sql: str, dialect: Optional[str], expressions: List[exp.Expression]):
+        self.sql = sql
+        self.dialect = dialect
+        self.expressions = expressions
+
+    @property
+    def single(self) -> Optional[exp.Expression]:
+        """The statement when the SQL contains exactly one, otherwise None."""
+        return self.expressions[0] if len(self.expressions) == 1 else None
+
+# (normalized sql, dialect) -> (ParsedSQL, None) or (None, error message)
+_validation_cache = LRUCache(settings.SQL_PARSE_CACHE_SIZE)
 
 class SecurityService:
-    def validate_sql(self, sql: str) -> bool:
+    def validate_sql(self, sql: str, dialect: Optional[str] = None) -> bool:
         """
         Validates SQL to ensure it's safe (read-only for now).
         Returns True if safe, raises ValueError if unsafe.
         """
+        self.parse(sql, dialect)
+        return True
+
+    def parse(self, sql: str, dialect: Optional[str] = None) -> ParsedSQL:
+        """
+        Parses and validates SQL, returning the cached AST for reuse by later stages.
+        Raises ValueError if the SQL is invalid or unsafe.
+        """
+        key = (sql.strip(), dialect)
+        cached = _validation_cache.get(key)
+        if cached is None:
+            cached = self._check(key[0], dialect)
+            _validation_cache.set(key, cached)
+
+        parsed, error = cached
+        if error:
+            raise ValueError(error)
+        return parsed
+
+    def _check(self, sql: str, dialect: Optional[str]) -> Tuple[Optional[ParsedSQL], Optional[str]]:
         try:
             # Parse returns a list of expressions
-            parsed = sqlglot.parse(sql)
+            expressions = [e for e in sqlglot.parse(sql, read=dialect) if e is not None]
         except Exception as e:
-            raise ValueError(f"Invalid SQL syntax: {e}")
+            return None, f"Invalid SQL syntax: {e}"
 
-        for expression in parsed:
-            # Check for destructive commands
+        for expression in expressions:
+            # Check for destructive commands in a single walk over the tree
             # We want to allow SELECT
             # We want to disallow DROP, DELETE, TRUNCATE, ALTER, UPDATE, INSERT
+            node = expression.find(*DESTRUCTIVE_TYPES)
+            if node is not None:
+                return None, f"Destructive command detected: {type(node).__name__.upper()}"
             
-            destructive_types = (
-                exp.Drop, 
-                exp.Delete, 
-                # exp.Truncate, # Truncate might be different in newer sqlglot versions
-                exp.Alter, 
-                exp.Update, 
-                exp.Insert,
-                exp.Create, 
-            )
-            
-            for unsafe_type in destructive_types:
-                if expression.find(unsafe_type):
-                    raise ValueError(f"Destructive command detected: {unsafe_type.__name__.upper()}")
-            
-        return True
+        return ParsedSQL(sql, dialect, expressions), None
@@ -0,0 +1,243 @@
+import base64
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from uuid import UUID
+
+# Optional binary transports; the formats are rejected when their library is not installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+# Compact encoder; default=str only catches types no column converter was chosen for
+json_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=str)
+
+def _isoformat(value):
+    return value.isoformat()
+
+def _decimal(value):
+    # Strings keep the exact precision of NUMERIC columns
+    return str(value)
+
+def _binary(value):
+    return base64.b64encode(bytes(value)).decode("ascii")
+
+_CONVERTERS: Dict[type, Callable[[Any], Any]] = {
+    datetime: _isoformat,
+    date: _isoformat,
+    time: _isoformat,
+    timedelta: lambda value: value.total_seconds(),
+    Decimal: _decimal,
+    UUID: str,
+    bytes: _binary,
+    bytearray: _binary,
+    memoryview: _binary,
+}
+
+# Wire type names for column metadata; bool is listed before int because it subclasses it
+_TYPE_NAMES = (
+    (bool, "boolean"),
+    (int, "integer"),
+    (float, "number"),
+    (Decimal, "decimal"),
+    (str, "string"),
+    (datetime, "datetime"),
+    (date, "date"),
+    (time, "time"),
+    (timedelta, "interval"),
+    (UUID, "uuid"),
+    ((bytes, bytearray, memoryview), "binary"),
+    ((dict, list), "json"),
+)
+
+def _type_name(value_type: type) -> str:
+    for types, name in _TYPE_NAMES:
+        if issubclass(value_type, types):
+            return name
+    return "string"
+
+# MessagePack carries binary natively
+_MSGPACK_CONVERTERS: Dict[type, Callable[[Any], Any]] = {
+    **_CONVERTERS,
+    bytes: None,
+    bytearray: bytes,
+    memoryview: bytes,
+}
+
+# Arrow has native temporal, decimal and binary types; only values it cannot infer are converted
+_ARROW_CONVERTERS: Dict[type, Callable[[Any], Any]] = {
+    UUID: str,
+    memoryview: bytes,
+}
+
+class ColumnConverters:
+    """
+    Per-column value converters for JSON output, chosen from the first non-null value seen in each
+    column. Columns holding JSON-native values get no converter, so rows are converted without
+    per-value type dispatch.
+    """
+
+    def __init__(self, columns: List[str], converters: Dict[type, Callable[[Any], Any]] = _CONVERTERS):
+        self.columns = columns
+        self.converter_map = converters
+        self.converters: List[Optional[Callable[[Any], Any]]] = [None] * len(columns)
+        self.resolved: List[bool] = [False] * len(columns)
+        # Type name per column; "null" until a non-null value has been seen
+        self.types: List[str] = ["null"] * len(columns)
+
+    def convert(self, rows: List[tuple]) -> List[list]:
+        self._resolve(rows)
+        active = [(i, conv) for i, conv in enumerate(self.converters) if conv is not None]
+        if not active:
+            return [list(row) for row in rows]
+
+        converted = []
+        for row in rows:
+            values = list(row)
+            for i, conv in active:
+                if values[i] is not None:
+                    values[i] = conv(values[i])
+            converted.append(values)
+        return converted
+
+    def records(self, rows: List[tuple]) -> List[Dict[str, Any]]:
+        return [dict(zip(self.columns, row)) for row in self.convert(rows)]
+
+    def _resolve(self, rows: List[tuple]) -> None:
+        for i, done in enumerate(self.resolved):
+            if done:
+                continue
+            for row in rows:
+                value = row[i]
+                if value is not None:
+                    self.converters[i] = _converter_for(type(value), self.converter_map)
+                    self.types[i] = _type_name(type(value))
+                    self.resolved[i] = True
+                    break
+
+def _converter_for(value_type: type, converters: Dict[type, Callable[[Any], Any]]) -> Optional[Callable[[Any], Any]]:
+    for base in value_type.__mro__:
+        if base in converters:
+            return converters[base]
+    return None
+
+def msgpack_stream(columns: List[str], batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """
+    A sequence of MessagePack objects: first {"columns": [...]}, then one array of row arrays
+    per batch. Read it with msgpack.Unpacker.
+    """
+    if msgpack is None:
+        raise ValueError("MessagePack output requires the optional 'msgpack' package")
+    packer = msgpack.Packer()
+    converters = ColumnConverters(columns, _MSGPACK_CONVERTERS)
+
+    def generate():
+        yield packer.pack({"columns": columns})
+        for rows in batches:
+            yield packer.pack(converters.convert(rows))
+    return generate()
+
+# DB-API type codes of numeric columns, per SQLAlchemy dialect (PostgreSQL OIDs, MySQL FIELD_TYPE)
+_PG_TYPE_CODES = {16: "boolean", 20: "integer", 21: "integer", 23: "integer", 700: "float", 701: "float", 1700: "decimal"}
+_MYSQL_TYPE_CODES = {0: "decimal", 1: "integer", 2: "integer", 3: "integer", 4: "float", 5: "float", 8: "integer", 9: "integer", 246: "decimal"}
+_DESCRIPTION_TYPE_CODES = {"postgresql": _PG_TYPE_CODES, "mysql": _MYSQL_TYPE_CODES, "mariadb": _MYSQL_TYPE_CODES}
+
+# Decimals whose precision is unknown get the widest decimal128 with this many fractional digits
+_DECIMAL_MAX_PRECISION = 38
+_DECIMAL_SCALE = 18
+
+def arrow_types(dialect: str, description) -> List[Optional[Any]]:
+    """
+    Arrow types of the numeric columns in a DB-API cursor description, so a stream's schema does
+    not depend on the values of its first batch. None where the driver says nothing usable.
+    """
+    codes = _DESCRIPTION_TYPE_CODES.get(dialect)
+    if pyarrow is None or not codes or not description:
+        return [None] * len(description or ())
+    types = []
+    for column in description:
+        kind = codes.get(column[1]) if isinstance(column[1], int) else None
+        if kind == "decimal":
+            precision, scale = column[4], column[5]
+            if isinstance(precision, int) and isinstance(scale, int) and 0 <= scale <= precision <= _DECIMAL_MAX_PRECISION:
+                types.append(pyarrow.decimal128(max(precision, 1), scale))
+            else:
+                types.append(pyarrow.decimal128(_DECIMAL_MAX_PRECISION, _DECIMAL_SCALE))
+        else:
+            types.append({"boolean": pyarrow.bool_(), "integer": pyarrow.int64(), "float": pyarrow.float64()}.get(kind))
+    return types
+
+def _arrow_field_type(values: tuple, declared=None):
+    # Inferred types are widened so later batches fit: integers may turn out to be fractional
+    # (SQLite REAL values, CASE branches) and decimals may carry more digits
+    if declared is not None:
+        return declared
+    inferred = pyarrow.array(values).type
+    if pyarrow.types.is_null(inferred):
+        return pyarrow.string()
+    if pyarrow.types.is_integer(inferred):
+        return pyarrow.float64()
+    if pyarrow.types.is_decimal(inferred) and inferred.precision <= _DECIMAL_MAX_PRECISION:
+        integer_digits = inferred.precision - inferred.scale
+        return pyarrow.decimal128(_DECIMAL_MAX_PRECISION, max(inferred.scale, min(_DECIMAL_SCALE, _DECIMAL_MAX_PRECISION - integer_digits)))
+    return inferred
+
+def _arrow_array(values: tuple, type):
+    if pyarrow.types.is_string(type):
+        return pyarrow.array([None if v is None else str(v) for v in values], type=type)
+    if pyarrow.types.is_floating(type):
+        values = [float(v) if isinstance(v, Decimal) else v for v in values]
+    # Cast rather than convert: converting to a declared type truncates 2.5 to an int64 2
+    return pyarrow.array(values).cast(type, safe=True)
+
+def arrow_stream(columns: List[str], batches: Iterator[List[tuple]], types: Optional[List[Optional[Any]]] = None) -> Iterator[bytes]:
+    """
+    An Arrow IPC stream with one record batch per fetched batch. Column types come from types
+    (see arrow_types) where given, otherwise from the first batch, widened so later batches fit:
+    integers become float64 and decimals get spare precision. Values that still do not fit raise
+    instead of being truncated; columns that are entirely null in the first batch are sent as strings.
+    """
+    if pyarrow is None:
+        raise ValueError("Arrow output requires the optional 'pyarrow' package")
+
+    def generate():
+        converters = ColumnConverters(columns, _ARROW_CONVERTERS)
+        declared = types or [None] * len(columns)
+        sink = io.BytesIO()
+        writer = None
+        schema = None
+        for rows in batches:
+            values = list(zip(*converters.convert(rows)))
+            if schema is None:
+                schema = pyarrow.schema([
+                    pyarrow.field(name, _arrow_field_type(column, declared_type))
+                    for name, column, declared_type in zip(columns, values, declared)
+                ])
+                writer = pyarrow.ipc.new_stream(sink, schema)
+            arrays = [_arrow_array(column, field.type) for column, field in zip(values, schema)]
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+            yield _drain(sink)
+
+        if writer is None:
+            # Empty result: a schema-only stream
+            writer = pyarrow.ipc.new_stream(sink, pyarrow.schema([
+                pyarrow.field(name, declared_type or pyarrow.string()) for name, declared_type in zip(columns, declared)
+            ]))
+        writer.close()
+        yield _drain(sink)
+    return generate()
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate(0)
+    return data
@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+from sqlglot import exp
+from sqlglot.optimizer import optimize
+from sqlglot.optimizer.pushdown_predicates import pushdown_predicates
+from sqlglot.optimizer.pushdown_projections import pushdown_projections
+from sqlglot.optimizer.qualify import qualify
+from sqlglot.optimizer.simplify import simplify
+from sqlglot.optimizer.unnest_subqueries import unnest_subqueries
+from sqlalchemy.orm import Session
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.models.metadata import DBConnection
+from app.services import schema_context
+from app.services.security_service import ParsedSQL
+from app.services.sql_rewrite import LIMITABLE_TYPES
+import logging
+
+logger = logging.getLogger(__name__)
+
+OPTIMIZER = "optimizer"
+
+# sqlglot optimizer rules by name, in the order they run. qualify comes first: the other rules
+# rely on fully qualified columns with SELECT * expanded from the indexed schema.
+OPTIMIZER_RULES = {
+    "qualify": qualify,
+    "pushdown_projections": pushdown_projections,
+    "unnest_subqueries": unnest_subqueries,
+    "pushdown_predicates": pushdown_predicates,
+    "simplify": simplify,
+}
+DEFAULT_RULES = tuple(OPTIMIZER_RULES)
+
+_MISSING = object()
+
+
+@dataclass
+class _ConnectionOptimizer:
+    # {table: {column: type}} of the default schema, as sqlglot expects it
+    schema: Dict[str, Dict[str, str]]
+    # (sql, dialect, rules) -> optimized statement, or None when it was left alone
+    statements: LRUCache
+
+
+class QueryOptimizer:
+    """
+    Rewrites single SELECT statements with sqlglot's optimizer using the connection's indexed
+    schema: qualification (SELECT * expanded), projection pruning, subquery unnesting and
+    predicate pushdown. Only tables of the default schema are known to it; statements it cannot
+    fully resolve are left alone. Results are cached per schema version, and the returned
+    expressions are shared, so callers must copy() before rewriting them.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def optimize(
+        self, connection: DBConnection, parsed: ParsedSQL, rules: Sequence[str] = DEFAULT_RULES
+    ) -> Optional[exp.Expression]:
+        """The optimized statement, or None when it cannot be optimized or nothing changed."""
+        statement = parsed.single
+        if not isinstance(statement, LIMITABLE_TYPES):
+            return None
+        state = self._state(connection)
+        if state is None:
+            return None
+        key = (parsed.sql, parsed.dialect, tuple(rules))
+        optimized = state.statements.get(key, _MISSING)
+        if optimized is _MISSING:
+            optimized = self._optimize(state.schema, statement, parsed.dialect, rules)
+            state.statements.set(key, optimized)
+        return optimized
+
+    @staticmethod
+    def _optimize(
+        schema: Dict[str, Dict[str, str]], statement: exp.Expression, dialect: Optional[str], rules: Sequence[str]
+    ) -> Optional[exp.Expression]:
+        if any(table.db for table in statement.find_all(exp.Table)):
+            # Tables of other schemas are not in the optimizer's schema
+            return None
+        try:
+            optimized = optimize(
+                statement, schema=schema, dialect=dialect, rules=[OPTIMIZER_RULES[rule] for rule in rules]
+            )
+        except Exception as e:
+            # Unknown tables/columns or constructs the optimizer does not support
+            logger.debug(f"Query not optimized: {e}")
+            return None
+        if optimized.sql(dialect=dialect) == statement.sql(dialect=dialect):
+            return None
+        return optimized
+
+    def _state(self, connection: DBConnection) -> Optional[_ConnectionOptimizer]:
+        """Kept with the schema context, so re-indexing drops the optimized statements too."""
+
+        def build() -> Optional[_ConnectionOptimizer]:
+            schema = {
+                table.table_name: {col.column_name: col.data_type for col in table.columns}
+                for table in schema_context.load_tables(self.db, connection.id)
+                if table.schema_name is None
+            }
+            return _ConnectionOptimizer(schema, LRUCache(settings.SQL_OPTIMIZE_CACHE_SIZE)) if schema else None
+
+        return schema_context.cached(connection.id, OPTIMIZER, connection.schema_version or 0, build)
@@ -0,0 +1,31 @@
+from typing import Optional
+from sqlglot import exp
+
+# Statement types a LIMIT can be attached to (SetOperation covers UNION/INTERSECT/EXCEPT)
+LIMITABLE_TYPES = (exp.Select, exp.Union, exp.Intersect, exp.Except)
+
+def existing_limit(expression: exp.Expression) -> Optional[int]:
+    """The literal LIMIT / FETCH FIRST row count of a query, or None if absent or not a constant."""
+    limit = expression.args.get("limit")
+    if limit is None:
+        return None
+    value = limit.args.get("expression") or limit.args.get("count")
+    if isinstance(value, exp.Literal) and not value.is_string:
+        try:
+            return int(value.this)
+        except ValueError:
+            return None
+    return None
+
+def limit_query(expression: exp.Expression, max_rows: int) -> Optional[exp.Expression]:
+    """
+    Returns a copy of a row-returning query capped at max_rows + 1 rows, so the caller can tell a
+    truncated result from one that fits exactly. Returns None when the statement cannot take a
+    LIMIT or already has a constant one within the cap.
+    """
+    if not isinstance(expression, LIMITABLE_TYPES):
+        return None
+    current = existing_limit(expression)
+    if current is not None and current <= max_rows:
+        return None
+    return expression.copy().limit(max_rows + 1)
@@ -1,3 +1,8 @@
+import atexit
+import os
+import shutil
+import sqlite3
+import tempfile
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -5,17 +10,21 @@ from app.db.base import Base
 from app.models.metadata import * # Import all models to register them
 from app.db.session import get_db
 from app.main import app
+from app.services.index_job_service import IndexJobManager
 from fastapi.testclient import TestClient
 
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
-# Use in-memory SQLite for testing metadata store
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# File-backed SQLite for the metadata store: job managers and the async paths open sessions in
+# worker threads, and each needs a connection of its own (an in-memory StaticPool shares one)
+_TEST_DIR = tempfile.mkdtemp(prefix="sqlpilot-tests-")
+atexit.register(shutil.rmtree, _TEST_DIR, ignore_errors=True)
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(_TEST_DIR, 'metadata.db')}"
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}, 
-    poolclass=StaticPool
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=NullPool
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -30,12 +39,34 @@ def db():
         Base.metadata.drop_all(bind=engine)
 
 @pytest.fixture(scope="function")
-def client(db):
+def client(db, index_jobs, monkeypatch):
+
     def override_get_db():
         try:
             yield db
         finally:
             pass
     app.dependency_overrides[get_db] = override_get_db
+    # Streaming endpoints open their own sessions
+    monkeypatch.setattr("app.api.endpoints.query.SessionLocal", TestingSessionLocal)
     yield TestClient(app)
     del app.dependency_overrides[get_db]
+
+@pytest.fixture
+def index_jobs(db, monkeypatch):
+    # Indexing jobs open their own sessions; keep them on the test metadata store
+    manager = IndexJobManager(workers=2, max_per_host=1, max_attempts=2, retry_delay=0, session_factory=TestingSessionLocal)
+    monkeypatch.setattr("app.api.endpoints.connections.index_job_manager", manager)
+    yield manager
+    manager.shutdown(wait=True)
+
+@pytest.fixture
+def target_connection(db, tmp_path):
+    path = tmp_path / "target.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO items (id, name) VALUES (?, ?)", [(i, f"item{i}") for i in range(1, 26)])
+    connection = DBConnection(name="Target", db_type="sqlite", connection_url=f"sqlite:///{path}")
+    db.add(connection)
+    db.commit()
+    return connection
@@ -17,3 +17,12 @@ def test_list_connections(client):
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 1
+
+def test_delete_connection(client):
+    created = client.post(
+        "/api/v1/connections/",
+        json={"name": "Test DB", "db_type": "sqlite", "connection_url": "sqlite:///:memory:"}
+    ).json()
+    response = client.delete(f"/api/v1/connections/{created['id']}")
+    assert response.status_code == 204
+    assert client.get(f"/api/v1/connections/{created['id']}").status_code == 404
@@ -0,0 +1,52 @@
+import io
+from decimal import Decimal
+import pytest
+from unittest.mock import patch
+from app.services import serialization
+
+def test_sql_msgpack_stream(client, target_connection):
+    msgpack = pytest.importorskip("msgpack")
+    response = client.post(
+        "/api/v1/query/sql",
+        json={"connection_id": target_connection.id, "sql": "SELECT id, name FROM items ORDER BY id", "max_rows": 3},
+        headers={"Accept": "application/vnd.msgpack"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.msgpack"
+    header, *batches = list(msgpack.Unpacker(io.BytesIO(response.content)))
+    assert header == {"columns": ["id", "name"]}
+    assert [row for batch in batches for row in batch] == [[1, "item1"], [2, "item2"], [3, "item3"]]
+
+def test_export_arrow_stream(client, target_connection):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    response = client.post(
+        "/api/v1/query/export",
+        json={"connection_id": target_connection.id, "sql": "SELECT id, name FROM items", "format": "csv"},
+        headers={"Accept": "application/vnd.apache.arrow.stream"}
+    )
+    assert response.status_code == 200
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == 25
+    assert table.column_names == ["id", "name"]
+
+def test_binary_format_unavailable(client, target_connection):
+    with patch.object(serialization, "msgpack", None):
+        response = client.post(
+            "/api/v1/query/sql?format=msgpack",
+            json={"connection_id": target_connection.id, "sql": "SELECT id FROM items"}
+        )
+    assert response.status_code == 406
+
+def test_arrow_schema_fits_later_batches():
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    batches = [[(1, Decimal("1.5"))], [(2.5, Decimal("123.234"))]]
+    table = pyarrow.ipc.open_stream(b"".join(serialization.arrow_stream(["n", "d"], iter(batches)))).read_all()
+    assert table.column("n").to_pylist() == [1.0, 2.5]
+    assert table.column("d").to_pylist() == [Decimal("1.5"), Decimal("123.234")]
+
+    # Driver-reported types are kept, and values that do not fit them raise instead of truncating
+    assert serialization.arrow_types("postgresql", [("id", 20, None, 8, None, None, None)]) == [pyarrow.int64()]
+    with pytest.raises(pyarrow.ArrowInvalid):
+        list(serialization.arrow_stream(["n"], iter([[(1,)], [(2.5,)]]), types=[pyarrow.int64()]))
@@ -0,0 +1,34 @@
+from app.services.serialization import ColumnConverters
+
+def test_column_types_inferred_from_values():
+    converters = ColumnConverters(["id", "flag", "price", "name", "empty"])
+    converters.convert([(1, True, 1.5, "a", None)])
+    assert converters.types == ["integer", "boolean", "number", "string", "null"]
+
+def test_columnar_response_via_query_param(client, target_connection):
+    response = client.post(
+        "/api/v1/query/sql?format=columnar",
+        json={"connection_id": target_connection.id, "sql": "SELECT id, name FROM items ORDER BY id", "max_rows": 2}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/vnd.sqlpilot.columnar+json")
+    body = response.json()
+    assert body["columns"] == [{"name": "id", "type": "integer"}, {"name": "name", "type": "string"}]
+    assert body["rows"] == [[1, "item1"], [2, "item2"]]
+    assert body["truncated"] is True
+    assert "data" not in body
+
+def test_columnar_response_via_accept_header(client, target_connection):
+    response = client.post(
+        "/api/v1/query/sql",
+        json={"connection_id": target_connection.id, "sql": "SELECT id FROM items WHERE id = 1"},
+        headers={"Accept": "application/vnd.sqlpilot.columnar+json"}
+    )
+    assert response.json()["rows"] == [[1]]
+
+def test_default_response_shape_unchanged(client, target_connection):
+    response = client.post(
+        "/api/v1/query/sql",
+        json={"connection_id": target_connection.id, "sql": "SELECT id FROM items WHERE id = 1"}
+    )
+    assert response.json()["data"] == [{"id": 1}]
@@ -0,0 +1,89 @@
+from unittest.mock import patch
+import pytest
+from app.services.explain_service import ExplainService, PlanEstimate
+from app.services.job_service import QueryJobManager
+from tests.test_query_jobs import wait_for
+
+SCAN = "SELECT * FROM items WHERE name = 'item3'"
+LOOKUP = "SELECT * FROM items WHERE id = 3"
+
+def run(client, connection, sql, **extra):
+    return client.post("/api/v1/query/sql", json={"connection_id": connection.id, "sql": sql, **extra})
+
+@pytest.fixture
+def guarded(db, target_connection):
+    def configure(action):
+        # SQLite plans are costed 1000 per full scan and 10 per index search
+        target_connection.options = {"guard_max_cost": 500, "guard_action": action}
+        db.commit()
+        return target_connection
+    return configure
+
+def test_no_estimate_without_limits(client, target_connection):
+    assert run(client, target_connection, LOOKUP).json()["estimate"] is None
+    estimate = run(client, target_connection, LOOKUP, explain=True).json()["estimate"]
+    assert estimate["cost"] == 10
+    assert estimate["details"][0].startswith("SEARCH")
+
+def test_expensive_queries_are_rejected(client, guarded):
+    connection = guarded("reject")
+    response = run(client, connection, SCAN)
+    assert response.status_code == 403
+    assert "estimated cost 1,000 (limit 500)" in response.json()["detail"]
+
+    response = run(client, connection, LOOKUP)
+    assert response.status_code == 200
+    assert response.json()["estimate"]["cost"] == 10
+    assert response.json()["data"] == [{"id": 3, "name": "item3"}]
+
+def test_warn_runs_the_query(client, guarded):
+    body = run(client, guarded("warn"), SCAN).json()
+    assert body["data"] == [{"id": 3, "name": "item3"}]
+    assert "exceeds" in body["warning"]
+    assert body["estimate"]["cost"] == 1000
+
+def test_expensive_queries_are_rerouted_to_jobs(client, guarded, monkeypatch, tmp_path):
+    manager = QueryJobManager(
+        workers=1, max_per_connection=1, spool_dir=str(tmp_path / "spool"),
+        retention_seconds=3600, max_retained=10, batch_size=10,
+    )
+    monkeypatch.setattr("app.api.endpoints.query.job_manager", manager)
+
+    response = run(client, guarded("job"), SCAN)
+    assert response.status_code == 202
+    body = response.json()
+    assert body["data"] is None
+    assert wait_for(manager, body["job"]["id"]).status == "succeeded"
+    assert manager.read_rows(body["job"]["id"], 0, 10) == [(3, "item3")]
+
+def test_unplannable_queries_report_the_execution_error(client, guarded):
+    response = run(client, guarded("reject"), "SELECT * FROM missing")
+    assert response.status_code == 500
+    assert "missing" in response.json()["detail"]
+
+def test_paged_and_binary_queries_are_guarded(client, guarded):
+    connection = guarded("reject")
+    response = run(client, connection, SCAN, page_size=10)
+    assert response.status_code == 403
+
+    response = client.post(
+        "/api/v1/query/sql?format=msgpack", json={"connection_id": connection.id, "sql": SCAN}
+    )
+    assert response.status_code == 403
+    assert "estimated cost" in response.json()["detail"]
+
+    assert run(client, connection, LOOKUP, page_size=10).json()["data"] == [{"id": 3, "name": "item3"}]
+
+def test_row_estimates_are_taken_before_the_row_cap(client, db, target_connection):
+    target_connection.options = {"guard_max_rows": 20, "max_rows": 10}
+    db.commit()
+    explained = []
+
+    def explain(connection, sql):
+        explained.append(sql)
+        return PlanEstimate(rows=25)
+
+    with patch.object(ExplainService, "explain", side_effect=explain):
+        response = run(client, target_connection, "SELECT * FROM items")
+    assert response.status_code == 403
+    assert explained == ["SELECT * FROM items"]
@@ -0,0 +1,57 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+import sqlglot
+from app.core.config import settings
+from app.models.metadata import DBConnection
+from app.services.dialect import resolve_dialect, transpile
+from app.services.llm_service import LLMService
+from app.services.metadata_service import MetadataService
+from app.services.query_service import QueryService
+from app.services.security_service import SecurityService
+
+def test_resolve_dialect():
+    assert resolve_dialect(DBConnection(db_type="postgres", connection_url="postgresql://u@h/db")) == "postgres"
+    assert resolve_dialect(DBConnection(db_type="mysql", connection_url="mysql+pymysql://u@h/db")) == "mysql"
+    # Unknown db_type: fall back to the URL's backend
+    assert resolve_dialect(DBConnection(db_type="other", connection_url="mssql+pyodbc://u@h/db")) == "tsql"
+    assert resolve_dialect(DBConnection(db_type="other", connection_url="not a url")) is None
+    assert resolve_dialect(DBConnection(db_type="postgres", connection_url="", options={"dialect": "redshift"})) == "redshift"
+
+def test_connection_dialect_is_used_for_parsing(db, target_connection):
+    mysql = DBConnection(name="m", db_type="mysql", connection_url="mysql+pymysql://u@h/db")
+    db.add(mysql)
+    db.commit()
+    parsed = QueryService(db).parse(mysql.id, "SELECT `id` FROM items")
+    assert parsed.dialect == "mysql"
+    assert parsed.single.sql(dialect="postgres") == 'SELECT "id" FROM items'
+
+def test_transpiled_sql_is_validated_in_the_target_dialect():
+    sql = "SELECT name FROM items WHERE name ILIKE 'item1%' LIMIT 5"
+    with patch("app.services.security_service.sqlglot.parse", wraps=sqlglot.parse) as parse:
+        transpiled = transpile(sql, "postgres", "mysql")
+    assert "ILIKE" not in transpiled
+    assert [call.kwargs["read"] for call in parse.call_args_list] == ["postgres", "mysql"]
+    assert parse.call_args_list[1].args[0] == transpiled
+    assert transpile(sql, "postgres", "mysql") == transpiled
+
+def test_llm_output_is_transpiled_to_the_target_dialect(db, target_connection, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    monkeypatch.setattr(settings, "LLM_SQL_DIALECT", "postgres")
+    MetadataService(db).index_database(target_connection.id)
+
+    prompts = []
+
+    def create(**kwargs):
+        prompts.append(kwargs["messages"][0]["content"])
+        content = json.dumps({"sql": "SELECT id::text AS id FROM items WHERE name ILIKE 'ITEM1%'", "export_format": None})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    with patch("app.services.llm_service.get_client", return_value=client):
+        sql, _ = LLMService(db).generate_sql(target_connection.id, "Items whose name starts with item1")
+    assert "compatible with PostgreSQL" in prompts[0]
+    assert "::" not in sql and "ILIKE" not in sql
+    rows = QueryService(db).execute(target_connection.id, sql).rows
+    assert sorted(row[0] for row in rows) == ["1", "10", "11", "12", "13", "14", "15", "16", "17", "18", "19"]
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.services.engine_registry import EngineRegistry
+
+def make_connection(id, tmp_path, name="target.db"):
+    return SimpleNamespace(id=id, connection_url=f"sqlite:///{tmp_path / name}")
+
+def test_engine_is_reused_per_connection(tmp_path):
+    registry = EngineRegistry(max_engines=4, idle_timeout=0)
+    connection = make_connection(1, tmp_path)
+    assert registry.get_engine(connection) is registry.get_engine(connection)
+
+def test_engine_replaced_when_url_changes(tmp_path):
+    registry = EngineRegistry(max_engines=4, idle_timeout=0)
+    connection = make_connection(1, tmp_path)
+    first = registry.get_engine(connection)
+    connection.connection_url = f"sqlite:///{tmp_path / 'other.db'}"
+    with patch.object(first, "dispose") as dispose:
+        second = registry.get_engine(connection)
+        dispose.assert_called_once()
+    assert second is not first
+
+def test_lru_eviction_disposes_engine(tmp_path):
+    registry = EngineRegistry(max_engines=1, idle_timeout=0)
+    first = registry.get_engine(make_connection(1, tmp_path, "a.db"))
+    with patch.object(first, "dispose") as dispose:
+        registry.get_engine(make_connection(2, tmp_path, "b.db"))
+        dispose.assert_called_once()
+
+def test_invalidate_disposes_engine(tmp_path):
+    registry = EngineRegistry(max_engines=4, idle_timeout=0)
+    connection = make_connection(1, tmp_path)
+    engine = registry.get_engine(connection)
+    with patch.object(engine, "dispose") as dispose:
+        registry.invalidate(connection.id)
+        dispose.assert_called_once()
+    assert registry.get_engine(connection) is not engine
@@ -0,0 +1,71 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+from app.services.explain_service import ExplainService, ExplainError
+from app.services.metadata_service import MetadataService
+from app.services.nl_cache import NLQueryCache
+from app.services.query_service import QueryService
+
+def test_sqlite_plan_ranks_scans_above_index_lookups(target_connection):
+    service = ExplainService()
+    scan = service.explain(target_connection, "SELECT * FROM items WHERE name = 'item3'")
+    lookup = service.explain(target_connection, "SELECT * FROM items WHERE id = 3;")
+    assert lookup.cost < scan.cost
+    assert any(detail.startswith("SCAN") for detail in scan.details)
+
+def test_explain_rejects_unknown_tables(target_connection):
+    with pytest.raises(ExplainError, match="missing"):
+        ExplainService().explain(target_connection, "SELECT * FROM missing")
+
+def test_cheapest_valid_candidate_is_executed(client, db, target_connection, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    MetadataService(db).index_database(target_connection.id)
+    answers = iter([
+        "SELECT name FROM items WHERE name = 'item3'",
+        "SELECT name FROM missing WHERE id = 3",
+        "SELECT name FROM items WHERE id = 3",
+    ])
+
+    async def create(**kwargs):
+        content = json.dumps({"sql": next(answers), "export_format": None})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    with patch("app.services.llm_service.get_async_client", return_value=fake):
+        response = client.post(
+            "/api/v1/query/natural-language",
+            json={"connection_id": target_connection.id, "question": "Name of item 3", "candidates": 3}
+        )
+    assert response.status_code == 200
+    assert response.json()["sql"] == "SELECT name FROM items WHERE id = 3"
+    assert response.json()["data"] == [{"name": "item3"}]
+
+def test_only_the_candidate_that_ran_is_cached(client, db, target_connection, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    MetadataService(db).index_database(target_connection.id)
+    cheapest, fallback = "SELECT name FROM items WHERE id = 3", "SELECT name FROM items WHERE name = 'item3'"
+    answers = iter([cheapest, fallback])
+
+    async def create(**kwargs):
+        content = json.dumps({"sql": next(answers), "export_format": None})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    execute = QueryService.execute
+
+    def failing(self, connection_id, sql, **kwargs):
+        if sql == cheapest:
+            raise RuntimeError("lost connection")
+        return execute(self, connection_id, sql, **kwargs)
+
+    with patch("app.services.llm_service.get_async_client", return_value=fake), \
+            patch.object(QueryService, "execute", failing):
+        response = client.post(
+            "/api/v1/query/natural-language",
+            json={"connection_id": target_connection.id, "question": "Name of item 3", "candidates": 2}
+        )
+    assert response.json()["sql"] == fallback
+    db.expire_all()
+    assert NLQueryCache(db).get(target_connection.id, target_connection.schema_version, "Name of item 3") == (fallback, None)
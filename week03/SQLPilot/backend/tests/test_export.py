@@ -1,4 +1,7 @@
+import json
 import pytest
+from datetime import datetime
+from decimal import Decimal
 from unittest.mock import MagicMock, patch
 from app.services.export_service import ExportService
 from app.schemas.query import ExportQueryRequest
@@ -9,11 +12,20 @@ SAMPLE_DATA = [
     {"id": 2, "name": "Bob", "role": "user"}
 ]
 
+def make_streamed(data, batch_rows=None):
+    """Fake StreamedResult yielding the sample rows in batches."""
+    streamed = MagicMock()
+    streamed.columns = list(data[0].keys())
+    rows = [tuple(row.values()) for row in data]
+    batch_rows = batch_rows or len(rows)
+    streamed.batches.return_value = iter([rows[i:i + batch_rows] for i in range(0, len(rows), batch_rows)])
+    return streamed
+
 def test_export_csv_formatting(db):
     service = ExportService(db)
     # Mock query service to avoid DB calls
     service.query_service = MagicMock()
-    service.query_service.execute_sql.return_value = SAMPLE_DATA
+    service.query_service.stream_sql.return_value = make_streamed(SAMPLE_DATA)
     
     generator = service.export_data(1, "SELECT * FROM users", "csv")
     content = "".join(list(generator))
@@ -27,18 +39,69 @@ def test_export_csv_formatting(db):
 def test_export_json_formatting(db):
     service = ExportService(db)
     service.query_service = MagicMock()
-    service.query_service.execute_sql.return_value = SAMPLE_DATA
+    service.query_service.stream_sql.return_value = make_streamed(SAMPLE_DATA)
     
     generator = service.export_data(1, "SELECT * FROM users", "json")
     content = "".join(list(generator))
     
-    # Check JSON format
-    assert '"name": "Alice"' in content
-    assert '"role": "user"' in content
-    # The JSON output is pretty-printed, so we check for structural elements flexibly
-    assert '[' in content
-    assert '{' in content
-    assert '"id": 1' in content
+    # Check JSON format (compact by default)
+    assert '"name":"Alice"' in content
+    assert '"role":"user"' in content
+    assert json.loads(content) == SAMPLE_DATA
+
+def test_export_json_streams_valid_array_across_batches(db):
+    service = ExportService(db)
+    service.query_service = MagicMock()
+    service.query_service.stream_sql.return_value = make_streamed(SAMPLE_DATA, batch_rows=1)
+
+    chunks = list(service.export_data(1, "SELECT * FROM users", "json"))
+
+    assert len(chunks) == 4
+    assert json.loads("".join(chunks)) == SAMPLE_DATA
+
+def test_export_ndjson_formatting(db):
+    service = ExportService(db)
+    service.query_service = MagicMock()
+    service.query_service.stream_sql.return_value = make_streamed(SAMPLE_DATA)
+
+    content = "".join(service.export_data(1, "SELECT * FROM users", "ndjson"))
+
+    assert [json.loads(line) for line in content.splitlines()] == SAMPLE_DATA
+
+def test_export_json_converts_column_types(db):
+    service = ExportService(db)
+    service.query_service = MagicMock()
+    data = [
+        {"id": 1, "price": None, "created_at": datetime(2024, 1, 2, 3, 4, 5)},
+        {"id": 2, "price": Decimal("10.50"), "created_at": None},
+    ]
+    service.query_service.stream_sql.return_value = make_streamed(data)
+
+    content = "".join(service.export_data(1, "SELECT * FROM orders", "json"))
+
+    assert json.loads(content) == [
+        {"id": 1, "price": None, "created_at": "2024-01-02T03:04:05"},
+        {"id": 2, "price": "10.50", "created_at": None},
+    ]
+
+def test_export_csv_yields_one_chunk_per_batch(db):
+    service = ExportService(db)
+    service.query_service = MagicMock()
+    streamed = make_streamed([{"id": i} for i in range(5)], batch_rows=2)
+    service.query_service.stream_sql.return_value = streamed
+
+    chunks = list(service.export_data(1, "SELECT id FROM t", "csv"))
+
+    # Header chunk followed by batches of 2, 2 and 1 rows
+    assert chunks == ["id\r\n", "0\r\n1\r\n", "2\r\n3\r\n", "4\r\n"]
+    streamed.close.assert_called_once()
+
+def test_export_unsupported_format(db):
+    service = ExportService(db)
+    service.query_service = MagicMock()
+    with pytest.raises(ValueError, match="Unsupported format"):
+        service.export_data(1, "SELECT 1", "xml")
+    service.query_service.stream_sql.assert_not_called()
 
 def test_export_api_csv(client, db):
     # Patch the ExportService.export_data method to return a generator
@@ -0,0 +1,91 @@
+import threading
+import time
+from unittest.mock import patch
+from app.models.metadata import DBConnection, IndexJob
+from app.services.index_job_service import host_key
+from app.services.metadata_service import MetadataService
+
+def wait_for(db, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db.expire_all()
+        job = db.get(IndexJob, job_id)
+        if job.status in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("index job did not finish")
+
+def test_index_status_reports_progress(client, db, tmp_path):
+    import sqlite3
+    path = tmp_path / "target.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    created = client.post(
+        "/api/v1/connections/",
+        json={"name": "Target", "db_type": "sqlite", "connection_url": f"sqlite:///{path}"}
+    ).json()
+
+    job = db.query(IndexJob).filter(IndexJob.connection_id == created["id"]).one()
+    wait_for(db, job.id)
+    status = client.get(f"/api/v1/connections/{created['id']}/index-status").json()
+    assert status["status"] == "succeeded"
+    assert status["trigger"] == "create"
+    assert (status["tables_done"], status["tables_total"]) == (1, 1)
+    assert status["report"]["added"] == ["items"]
+    assert status["duration_seconds"] >= 0
+
+    assert client.post(f"/api/v1/connections/{created['id']}/reindex").status_code == 202
+    assert client.get("/api/v1/connections/999/index-status").status_code == 404
+
+def test_jobs_respect_per_host_cap(index_jobs, db, target_connection):
+    other = DBConnection(name="Same file", db_type="sqlite", connection_url=target_connection.connection_url)
+    db.add(other)
+    db.commit()
+    started, release = threading.Event(), threading.Event()
+    original = MetadataService.index_database
+
+    def blocking(self, connection_id, progress=None):
+        started.set()
+        release.wait(5)
+        return original(self, connection_id, progress)
+
+    with patch.object(MetadataService, "index_database", blocking):
+        first = index_jobs.enqueue(target_connection.id)
+        second = index_jobs.enqueue(other.id)
+        # The first job holds the host's only slot until released
+        assert started.wait(5)
+        db.expire_all()
+        assert db.get(IndexJob, first.id).status == "running"
+        assert db.get(IndexJob, second.id).status == "queued"
+        release.set()
+        assert wait_for(db, first.id).status == "succeeded"
+        assert wait_for(db, second.id).status == "succeeded"
+
+def test_failed_attempt_is_retried(index_jobs, db, target_connection):
+    original = MetadataService.index_database
+    calls = []
+
+    def flaky(self, connection_id, progress=None):
+        calls.append(connection_id)
+        if len(calls) == 1:
+            raise RuntimeError("connection reset")
+        return original(self, connection_id, progress)
+
+    with patch.object(MetadataService, "index_database", flaky):
+        job = wait_for(db, index_jobs.enqueue(target_connection.id).id)
+    assert job.status == "succeeded"
+    assert job.attempts == 2
+    assert job.error is None
+
+def test_resume_picks_up_interrupted_jobs(index_jobs, db, target_connection):
+    job = IndexJob(connection_id=target_connection.id, status="running", trigger="create", attempts=1)
+    db.add(job)
+    db.commit()
+    assert index_jobs.resume() == 1
+    job = wait_for(db, job.id)
+    assert job.status == "succeeded"
+    assert job.attempts == 2
+
+def test_host_key():
+    assert host_key("postgresql://u:p@db1:5432/sales") == host_key("postgresql://u:p@db1:5432/hr")
+    assert host_key("sqlite:///a.db") != host_key("sqlite:///b.db")
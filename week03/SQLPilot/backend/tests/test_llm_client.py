@@ -0,0 +1,117 @@
+import asyncio
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.services.llm_client import SingleFlight, get_client, get_async_client
+from app.services.llm_service import LLMService
+from app.services.metadata_service import MetadataService
+from app.services.nl_cache import NLQueryCache
+
+def test_clients_are_shared_per_endpoint():
+    assert get_client("http://localhost:11434/v1", "ollama") is get_client("http://localhost:11434/v1", "ollama")
+    assert get_client("http://localhost:11434/v1", "ollama") is not get_client("http://other:11434/v1", "ollama")
+
+    async def clients():
+        return get_async_client("http://localhost:11434/v1", "ollama"), get_async_client("http://localhost:11434/v1", "ollama")
+    first, second = asyncio.run(clients())
+    assert first is second
+
+def test_concurrent_identical_calls_are_coalesced():
+    flight = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "SELECT 1"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("q", slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["SELECT 1"] * 5
+    assert len(calls) == 1
+    # Not cached: the next call runs again
+    flight.do("q", slow)
+    assert len(calls) == 2
+
+def test_coalesced_async_callers_share_errors():
+    flight = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise RuntimeError("rate limited")
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async("q", failing) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [str(r) for r in results] == ["rate limited"] * 3
+    assert len(calls) == 1
+
+def test_nl_endpoint_awaits_async_client(client, db, target_connection, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    MetadataService(db).index_database(target_connection.id)
+
+    async def create(**kwargs):
+        content = json.dumps({"sql": "SELECT count(*) AS n FROM items", "export_format": None})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    with patch("app.services.llm_service.get_async_client", return_value=fake):
+        response = client.post(
+            "/api/v1/query/natural-language",
+            json={"connection_id": target_connection.id, "question": "How many items?"}
+        )
+    assert response.status_code == 200
+    assert response.json()["sql"] == "SELECT count(*) AS n FROM items"
+    assert response.json()["data"] == [{"n": 25}]
+
+def test_async_generation_shares_only_the_completion(db, target_connection, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    MetadataService(db).index_database(target_connection.id)
+    calls, threads = [], []
+    joined = asyncio.Event()
+
+    class CountingFlight(SingleFlight):
+        callers = 0
+
+        async def do_async(self, key, fn):
+            # Registration is synchronous, so once both callers got here they share one flight
+            self.callers += 1
+            if self.callers == 2:
+                joined.set()
+            return await super().do_async(key, fn)
+
+    async def create(**kwargs):
+        calls.append(1)
+        await joined.wait()
+        content = json.dumps({"sql": "SELECT count(*) AS n FROM items", "export_format": None})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    lookup = NLQueryCache.get
+
+    def get(cache, *args):
+        threads.append((threading.current_thread(), cache.db))
+        return lookup(cache, *args)
+
+    async def run():
+        questions = ("How many items?", "how many items")
+        return await asyncio.gather(*(LLMService(db).agenerate_sql(target_connection.id, q) for q in questions))
+
+    monkeypatch.setattr("app.services.llm_service.single_flight", CountingFlight())
+    with patch("app.services.llm_service.get_async_client", return_value=fake), patch.object(NLQueryCache, "get", get):
+        results = asyncio.run(asyncio.wait_for(run(), 5))
+    assert results == [("SELECT count(*) AS n FROM items", None)] * 2
+    assert len(calls) == 1
+    # Cache lookups ran in worker threads, on sessions other than the caller's
+    assert len(threads) == 2
+    assert all(thread is not threading.main_thread() and session is not db for thread, session in threads)
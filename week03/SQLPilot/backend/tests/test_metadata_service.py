@@ -0,0 +1,108 @@
+import sqlite3
+from app.models.metadata import TableMetadata
+from app.services.metadata_service import MetadataService
+
+def target_path(connection):
+    return connection.connection_url.removeprefix("sqlite:///")
+
+def test_initial_index(db, target_connection):
+    report = MetadataService(db).index_database(target_connection.id)
+    assert report["added"] == ["items"]
+    assert report["schema_version"] == 1
+
+    table = db.query(TableMetadata).filter(TableMetadata.table_name == "items").one()
+    assert [(c.column_name, c.is_primary_key) for c in table.columns] == [("id", True), ("name", False)]
+
+def test_reindex_only_touches_changed_tables(db, target_connection):
+    service = MetadataService(db)
+    service.index_database(target_connection.id)
+    items_id = db.query(TableMetadata).filter(TableMetadata.table_name == "items").one().id
+
+    report = service.index_database(target_connection.id)
+    assert report == {"added": [], "updated": [], "removed": [], "unchanged": 1, "schema_version": 1}
+
+    with sqlite3.connect(target_path(target_connection)) as conn:
+        conn.execute("CREATE TABLE tags (id INTEGER PRIMARY KEY, label TEXT)")
+        conn.execute("ALTER TABLE items ADD COLUMN price REAL")
+
+    report = service.index_database(target_connection.id)
+    assert report["added"] == ["tags"]
+    assert report["updated"] == ["items"]
+    assert report["schema_version"] == 2
+
+    items = db.query(TableMetadata).filter(TableMetadata.table_name == "items").one()
+    assert items.id == items_id
+    assert [c.column_name for c in items.columns] == ["id", "name", "price"]
+
+    with sqlite3.connect(target_path(target_connection)) as conn:
+        conn.execute("DROP TABLE tags")
+    assert service.index_database(target_connection.id)["removed"] == ["tags"]
+
+def test_reflection_fallback_matches_bulk(db, target_connection):
+    from sqlalchemy import inspect
+    from unittest.mock import patch
+    with sqlite3.connect(target_path(target_connection)) as conn:
+        conn.execute("CREATE TABLE tags (id INTEGER PRIMARY KEY, item_id INTEGER REFERENCES items(id))")
+
+    service = MetadataService(db)
+    inspector = inspect(sqlite3_engine(target_connection))
+    bulk = service._reflect(inspector)
+    with patch.object(type(inspector), "get_multi_columns", side_effect=NotImplementedError):
+        fallback = service._reflect(inspector)
+
+    assert bulk == fallback
+    assert {c["column_name"]: c["is_foreign_key"] for c in bulk["tags"]} == {"id": False, "item_id": True}
+
+def sqlite3_engine(connection):
+    from sqlalchemy import create_engine
+    return create_engine(connection.connection_url)
+
+def test_index_reflects_every_schema(db, target_connection, tmp_path):
+    from sqlalchemy import event
+    from app.services.engine_registry import engine_registry
+    archive = tmp_path / "archive.db"
+    with sqlite3.connect(archive) as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, archived_at TEXT)")
+
+    engine = engine_registry.get_engine(target_connection)
+    event.listen(engine, "connect", lambda dbapi_conn, _: dbapi_conn.execute(f"ATTACH DATABASE '{archive}' AS archive"))
+    try:
+        report = MetadataService(db).index_database(target_connection.id)
+    finally:
+        engine_registry.invalidate(target_connection.id)
+
+    assert sorted(report["added"]) == ["archive.items", "items"]
+    archived = db.query(TableMetadata).filter(TableMetadata.schema_name == "archive").one()
+    assert [c.column_name for c in archived.columns] == ["id", "archived_at"]
+
+def test_schema_selection(target_connection):
+    from unittest.mock import MagicMock
+    inspector = MagicMock(default_schema_name="public")
+    inspector.get_schema_names.return_value = ["information_schema", "pg_catalog", "pg_temp_3", "public", "sales"]
+    service = MetadataService(None)
+    assert service._schemas(inspector, target_connection) == [None, "sales"]
+
+    target_connection.options = {"schemas": ["sales"]}
+    assert service._schemas(inspector, target_connection) == ["sales"]
+
+def test_mysql_indexes_only_the_connected_database(target_connection):
+    from unittest.mock import MagicMock
+    inspector = MagicMock(default_schema_name="shop")
+    inspector.dialect.name = "mysql"
+    inspector.get_schema_names.return_value = ["information_schema", "mysql", "shop", "billing", "other_app"]
+    service = MetadataService(None)
+    assert service._schemas(inspector, target_connection) == [None]
+    inspector.get_schema_names.assert_not_called()
+
+    target_connection.options = {"schemas": ["shop", "billing"]}
+    assert service._schemas(inspector, target_connection) == [None, "billing"]
+
+def test_foreign_key_targets_are_recorded(db, target_connection):
+    with sqlite3.connect(target_path(target_connection)) as conn:
+        conn.execute("CREATE TABLE tags (id INTEGER PRIMARY KEY, item_id INTEGER REFERENCES items(id))")
+    MetadataService(db).index_database(target_connection.id)
+
+    tags = db.query(TableMetadata).filter(TableMetadata.table_name == "tags").one()
+    assert [(c.column_name, c.foreign_table, c.foreign_column) for c in tags.columns] == [
+        ("id", None, None), ("item_id", "items", "id"),
+    ]
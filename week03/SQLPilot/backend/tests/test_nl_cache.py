@@ -0,0 +1,94 @@
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.core.config import settings
+from app.models.metadata import NLQueryCacheEntry
+from app.services.llm_service import LLMService
+from app.services.metadata_service import MetadataService
+from app.services.nl_cache import NLQueryCache, normalize_question
+
+def test_normalize_question():
+    assert normalize_question("  How many USERS signed up, last week?? ") == "how many users signed up last week"
+    assert normalize_question("Ｈｏｗ many users") == "how many users"
+    assert normalize_question("Orders over $1,000.50?") == "orders over $1,000.50"
+
+def test_operators_are_not_folded(db, target_connection):
+    assert normalize_question("orders with total > 100") != normalize_question("orders with total < 100")
+    assert normalize_question("growth of -5%") != normalize_question("growth of 5")
+
+    cache = NLQueryCache(db)
+    cache.put(target_connection.id, 1, "orders with total > 100", "SELECT * FROM orders WHERE total > 100", None)
+    assert cache.get(target_connection.id, 1, "orders with total < 100") is None
+
+def test_hit_requires_same_schema_version(db, target_connection):
+    cache = NLQueryCache(db)
+    cache.put(target_connection.id, 1, "How many items?", "SELECT count(*) FROM items", None)
+
+    assert cache.get(target_connection.id, 1, "how many items") == ("SELECT count(*) FROM items", None)
+    assert cache.get(target_connection.id, 2, "how many items") is None
+    # Hits are buffered rather than committed by the lookup
+    assert db.query(NLQueryCacheEntry).one().hits == 0
+    cache.flush_hits()
+    assert db.query(NLQueryCacheEntry).one().hits == 1
+
+def test_expired_entries_miss(db, target_connection):
+    cache = NLQueryCache(db)
+    cache.put(target_connection.id, 1, "How many items?", "SELECT count(*) FROM items", None)
+    db.query(NLQueryCacheEntry).update({"created_at": datetime.utcnow() - timedelta(seconds=settings.NL_CACHE_TTL_SECONDS + 1)})
+    db.commit()
+    assert cache.get(target_connection.id, 1, "How many items?") is None
+
+def test_least_recently_used_entries_are_evicted(db, target_connection, monkeypatch):
+    monkeypatch.setattr(settings, "NL_CACHE_MAX_ENTRIES", 2)
+    cache = NLQueryCache(db)
+    cache.put(target_connection.id, 1, "first", "SELECT 1", None)
+    cache.put(target_connection.id, 1, "second", "SELECT 2", None)
+    cache.get(target_connection.id, 1, "first")
+    db.query(NLQueryCacheEntry).filter(NLQueryCacheEntry.normalized_question == "second").update(
+        {"last_used_at": datetime.utcnow() - timedelta(minutes=1)}
+    )
+    cache.put(target_connection.id, 1, "third", "SELECT 3", None)
+    assert {e.normalized_question for e in db.query(NLQueryCacheEntry)} == {"first", "third"}
+
+def test_eviction_sweeps_only_when_over_the_limit(db, target_connection, monkeypatch):
+    monkeypatch.setattr(settings, "NL_CACHE_MAX_ENTRIES", 100)
+    cache = NLQueryCache(db)
+    with patch.object(NLQueryCache, "_evict", autospec=True, side_effect=NLQueryCache._evict) as evict:
+        for i in range(120):
+            cache.put(target_connection.id, 1, f"question {i}", f"SELECT {i}", None)
+    # Each sweep trims to 90 entries, so the next one is ten inserts away
+    assert 2 <= evict.call_count <= 3
+    assert db.query(NLQueryCacheEntry).count() <= 100
+
+def test_similar_questions_share_sql_when_enabled(db, target_connection, monkeypatch):
+    cache = NLQueryCache(db)
+    cache.put(target_connection.id, 1, "how many users signed up last week", "SELECT 1", None)
+    assert cache.get(target_connection.id, 1, "how many users signed up in the last week") is None
+
+    monkeypatch.setattr(settings, "NL_CACHE_SIMILARITY_THRESHOLD", 0.9)
+    assert cache.get(target_connection.id, 1, "how many users signed up in the last week") == ("SELECT 1", None)
+    assert cache.get(target_connection.id, 1, "list the newest orders") is None
+
+def fake_openai(sql):
+    content = json.dumps({"sql": sql, "export_format": None})
+    response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: response)))
+    return patch("app.services.llm_service.get_client", return_value=client)
+
+def test_llm_service_reuses_generated_sql_until_reindex(db, target_connection, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    indexer = MetadataService(db)
+    indexer.index_database(target_connection.id)
+
+    with fake_openai("SELECT count(*) FROM items") as client:
+        assert LLMService(db).generate_sql(target_connection.id, "How many items?")[0] == "SELECT count(*) FROM items"
+        assert LLMService(db).generate_sql(target_connection.id, "how many items") == ("SELECT count(*) FROM items", None)
+    assert client.call_count == 1
+
+    with sqlite3.connect(target_connection.connection_url.removeprefix("sqlite:///")) as conn:
+        conn.execute("ALTER TABLE items ADD COLUMN price REAL")
+    indexer.index_database(target_connection.id)
+    assert db.query(NLQueryCacheEntry).count() == 0
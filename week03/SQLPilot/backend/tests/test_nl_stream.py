@@ -0,0 +1,76 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+from app.core.config import settings
+from app.services.metadata_service import MetadataService
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+class FakeStream:
+    def __init__(self, parts):
+        self.parts = parts
+        self.closed = False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for part in self.parts:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+
+    async def close(self):
+        self.closed = True
+
+@pytest.fixture
+def llm_stream(db, target_connection, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    MetadataService(db).index_database(target_connection.id)
+
+    def stream_sql(sql):
+        content = json.dumps({"sql": sql, "export_format": None})
+        stream = FakeStream([content[:10], content[10:]])
+
+        async def create(**kwargs):
+            assert kwargs["stream"] is True
+            return stream
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        return stream, patch("app.services.llm_service.get_async_client", return_value=client)
+    return stream_sql
+
+def test_stream_emits_tokens_sql_and_row_batches(client, target_connection, llm_stream, monkeypatch):
+    monkeypatch.setattr(settings, "NL_STREAM_BATCH_SIZE", 10)
+    stream, patched = llm_stream("SELECT id FROM items ORDER BY id")
+    with patched:
+        response = client.post(
+            "/api/v1/query/natural-language/stream",
+            json={"connection_id": target_connection.id, "question": "All item ids"}
+        )
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    kinds = [kind for kind, _ in events]
+
+    assert kinds == ["stage", "token", "token", "sql", "stage", "columns", "rows", "rows", "rows", "done"]
+    assert "".join(data["text"] for kind, data in events if kind == "token").startswith('{"sql"')
+    assert events[3][1]["sql"] == "SELECT id FROM items ORDER BY id"
+    assert [row for kind, data in events if kind == "rows" for row in data["rows"]] == [[i] for i in range(1, 26)]
+    assert events[-1][1] == {"row_count": 25, "truncated": False, "row_limit": settings.QUERY_MAX_ROWS}
+    assert stream.closed
+
+def test_stream_reports_rejected_sql(client, target_connection, llm_stream):
+    _, patched = llm_stream("DROP TABLE items")
+    with patched:
+        response = client.post(
+            "/api/v1/query/natural-language/stream",
+            json={"connection_id": target_connection.id, "question": "Remove the items"}
+        )
+    kind, data = parse_events(response.text)[-1]
+    assert kind == "error"
+    assert data["status"] == 400
+    assert "Destructive" in data["detail"]
@@ -0,0 +1,45 @@
+import pytest
+from app.services.query_service import QueryService
+from app.services.cursor_registry import CursorNotFoundError
+
+def test_paged_query_walks_all_rows(db, target_connection):
+    service = QueryService(db)
+    result = service.execute(target_connection.id, "SELECT id FROM items ORDER BY id", page_size=10)
+    ids = [row[0] for row in result.rows]
+    assert result.next_cursor is not None
+
+    while result.next_cursor:
+        result = service.fetch_page(result.next_cursor, 10)
+        ids.extend(row[0] for row in result.rows)
+
+    assert ids == list(range(1, 26))
+
+def test_exhausted_cursor_is_released(db, target_connection):
+    service = QueryService(db)
+    result = service.execute(target_connection.id, "SELECT id FROM items", page_size=20)
+    cursor = result.next_cursor
+    last = service.fetch_page(cursor, 20)
+    assert len(last.rows) == 5
+    assert last.next_cursor is None
+    with pytest.raises(CursorNotFoundError):
+        service.fetch_page(cursor, 20)
+
+def test_single_page_result_has_no_cursor(db, target_connection):
+    service = QueryService(db)
+    result = service.execute(target_connection.id, "SELECT id FROM items", page_size=25)
+    assert len(result.rows) == 25
+    assert result.next_cursor is None
+
+def test_paged_query_api(client, target_connection):
+    response = client.post(
+        "/api/v1/query/sql",
+        json={"connection_id": target_connection.id, "sql": "SELECT id, name FROM items ORDER BY id", "page_size": 20}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["data"][0] == {"id": 1, "name": "item1"}
+
+    response = client.post(f"/api/v1/query/cursors/{body['next_cursor']}/next?page_size=20")
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 5
+    assert response.json()["next_cursor"] is None
@@ -0,0 +1,90 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from app.services.query_service import QueryService
+from app.services.query_control import query_control, QueryCancelledError, QueryTimeoutError
+
+# Counts to a billion on SQLite; only finishes if nothing interrupts it
+SLOW_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+    "SELECT count(*) FROM c"
+)
+
+def test_statement_timeout(db, target_connection):
+    target_connection.options = {"statement_timeout": 0.2}
+    db.commit()
+    started = time.monotonic()
+    with pytest.raises(QueryTimeoutError):
+        QueryService(db).execute(target_connection.id, SLOW_SQL)
+    assert time.monotonic() - started < 5
+
+def test_cancel_running_query(db, target_connection):
+    target_connection.options = {"statement_timeout": 0}
+    db.commit()
+    errors = []
+
+    def run():
+        try:
+            QueryService(db).execute(target_connection.id, SLOW_SQL, query_id="slow-1")
+        except Exception as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    for _ in range(100):
+        if query_control.cancel("slow-1"):
+            break
+        time.sleep(0.02)
+    worker.join(timeout=5)
+
+    assert not worker.is_alive()
+    assert isinstance(errors[0], QueryCancelledError)
+
+def test_query_id_returned(db, target_connection):
+    result = QueryService(db).execute(target_connection.id, "SELECT 1", query_id="q-1")
+    assert result.query_id == "q-1"
+    assert query_control.cancel("q-1") is False
+
+def test_cancel_unknown_query_api(client):
+    assert client.delete("/api/v1/query/unknown").status_code == 404
+
+def test_stream_can_be_cancelled_between_batches(db, target_connection):
+    sql = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) SELECT x FROM c"
+    streamed = QueryService(db).stream_sql(target_connection.id, sql, query_id="stream-1")
+    try:
+        assert len(streamed.fetch(100)) == 100
+        assert query_control.cancel("stream-1")
+        with pytest.raises(QueryCancelledError):
+            streamed.fetch(1_000_000)
+    finally:
+        streamed.close()
+    assert not query_control.cancel("stream-1")
+
+def test_binary_queries_are_timed_and_cancellable(client, db, target_connection):
+    target_connection.options = {"statement_timeout": 0.2}
+    db.commit()
+    with patch.object(query_control, "track", wraps=query_control.track) as track:
+        response = client.post(
+            "/api/v1/query/sql?format=msgpack",
+            json={"connection_id": target_connection.id, "sql": SLOW_SQL, "query_id": "binary-1"},
+        )
+    assert response.status_code == 408
+    track.assert_called_once_with("binary-1", target_connection.id, 0.2)
+
+def test_paged_queries_are_timed_and_cancellable(client, db, target_connection):
+    target_connection.options = {"statement_timeout": 0.2}
+    db.commit()
+    response = client.post(
+        "/api/v1/query/sql",
+        json={"connection_id": target_connection.id, "sql": SLOW_SQL, "page_size": 10, "query_id": "paged-1"},
+    )
+    assert response.status_code == 408
+
+    sql = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) SELECT x FROM c"
+    service = QueryService(db)
+    result = service.execute(target_connection.id, sql, page_size=100, query_id="paged-2")
+    assert result.query_id == "paged-2" and result.next_cursor
+    assert query_control.cancel("paged-2")
+    with pytest.raises(QueryCancelledError):
+        service.fetch_page(result.next_cursor, 1_000_000)
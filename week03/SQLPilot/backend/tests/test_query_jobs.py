@@ -0,0 +1,100 @@
+import os
+import stat
+import threading
+import time
+from unittest.mock import patch
+import pytest
+from app.services.engine_registry import engine_registry
+from app.services.job_service import QueryJobManager, JobNotFoundError
+
+def wait_for(manager, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job.status in ("succeeded", "failed", "cancelled"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+@pytest.fixture
+def manager(tmp_path):
+    return QueryJobManager(
+        workers=2, max_per_connection=1, spool_dir=str(tmp_path / "spool"),
+        retention_seconds=3600, max_retained=10, batch_size=10,
+    )
+
+def test_job_spools_and_pages_rows(manager, target_connection):
+    job = manager.submit(target_connection, "SELECT id FROM items ORDER BY id")
+    job = wait_for(manager, job.id)
+
+    assert job.status == "succeeded"
+    assert job.rows_fetched == 25
+    assert len(job.batches) == 3
+    assert manager.read_rows(job.id, 8, 5) == [(i,) for i in range(9, 14)]
+    assert [row for batch in manager.iter_batches(job.id) for row in batch] == [(i,) for i in range(1, 26)]
+
+def test_jobs_respect_per_connection_cap(manager, target_connection):
+    release = threading.Event()
+    original = engine_registry.get_engine
+
+    def blocking(connection):
+        release.wait(5)
+        return original(connection)
+
+    with patch.object(engine_registry, "get_engine", blocking):
+        jobs = [manager.submit(target_connection, "SELECT id FROM items") for _ in range(3)]
+        assert [job.status for job in jobs] == ["running", "queued", "queued"]
+        release.set()
+        assert all(wait_for(manager, job.id).status == "succeeded" for job in jobs)
+
+def test_failed_job_reports_error(manager, target_connection):
+    job = wait_for(manager, manager.submit(target_connection, "SELECT * FROM missing").id)
+    assert job.status == "failed"
+    assert "missing" in job.error
+    assert manager.read_rows(job.id, 0, 10) == []
+
+def test_delete_job_removes_spool(manager, target_connection, tmp_path):
+    job = wait_for(manager, manager.submit(target_connection, "SELECT id FROM items").id)
+    manager.delete(job.id)
+    assert list((tmp_path / "spool").iterdir()) == []
+    with pytest.raises(JobNotFoundError):
+        manager.get(job.id)
+
+def test_spools_are_kept_in_a_private_directory(target_connection, tmp_path):
+    default = QueryJobManager(
+        workers=1, max_per_connection=1, spool_dir=None,
+        retention_seconds=3600, max_retained=10, batch_size=10,
+    )
+    job = wait_for(default, default.submit(target_connection, "SELECT 1").id)
+    assert os.path.dirname(job.spool_path) == default.spool_dir
+    assert stat.S_IMODE(os.stat(default.spool_dir).st_mode) == 0o700
+
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    os.chmod(shared, 0o777)
+    exposed = QueryJobManager(
+        workers=1, max_per_connection=1, spool_dir=str(shared),
+        retention_seconds=3600, max_retained=10, batch_size=10,
+    )
+    with pytest.raises(PermissionError):
+        exposed.submit(target_connection, "SELECT 1")
+
+def test_job_api(client, target_connection):
+    response = client.post("/api/v1/query/jobs/", json={"connection_id": target_connection.id, "sql": "SELECT id, name FROM items"})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    for _ in range(500):
+        status = client.get(f"/api/v1/query/jobs/{job_id}").json()
+        if status["status"] == "succeeded":
+            break
+        time.sleep(0.01)
+    assert status["rows_fetched"] == 25
+
+    rows = client.get(f"/api/v1/query/jobs/{job_id}/rows?offset=24&limit=10").json()
+    assert rows["data"] == [{"id": 25, "name": "item25"}]
+
+    export = client.get(f"/api/v1/query/jobs/{job_id}/export?format=csv")
+    assert export.text.splitlines()[:2] == ["id,name", "1,item1"]
+
+    assert client.delete(f"/api/v1/query/jobs/{job_id}").status_code == 204
@@ -1,5 +1,9 @@
 import pytest
+import sqlglot
+from sqlglot import exp
+from app.services.query_service import QueryService
 from app.services.security_service import SecurityService
+from app.services.sql_rewrite import limit_query
 
 def test_security_validation_safe():
     service = SecurityService()
@@ -16,3 +20,47 @@ def test_security_validation_unsafe():
         
     with pytest.raises(ValueError, match="Destructive command detected"):
         service.validate_sql("UPDATE users SET name='hacked'")
+
+def test_security_validation_cached():
+    service = SecurityService()
+    parsed = service.parse("SELECT id FROM users")
+    assert service.parse("  SELECT id FROM users  ") is parsed
+    assert parsed.single.find(exp.Table).name == "users"
+
+def test_security_validation_caches_rejections():
+    service = SecurityService()
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Destructive command detected: INSERT"):
+            service.validate_sql("INSERT INTO users VALUES (1)")
+
+def test_security_validation_nested_destructive():
+    service = SecurityService()
+    with pytest.raises(ValueError, match="Destructive command detected"):
+        service.validate_sql("WITH d AS (DELETE FROM users RETURNING id) SELECT * FROM d", dialect="postgres")
+
+def test_limit_query_injects_and_tightens():
+    assert limit_query(sqlglot.parse_one("SELECT * FROM users"), 100).sql() == "SELECT * FROM users LIMIT 101"
+    assert limit_query(sqlglot.parse_one("SELECT * FROM users LIMIT 5000"), 100).sql() == "SELECT * FROM users LIMIT 101"
+    assert limit_query(sqlglot.parse_one("SELECT * FROM users LIMIT 10"), 100) is None
+    assert limit_query(sqlglot.parse_one("SHOW TABLES", read="mysql"), 100) is None
+
+def test_execute_truncates_to_row_limit(db, target_connection):
+    service = QueryService(db)
+
+    result = service.execute(target_connection.id, "SELECT id FROM items ORDER BY id", max_rows=10)
+    assert len(result.rows) == 10
+    assert result.truncated is True
+    assert result.row_limit == 10
+
+    result = service.execute(target_connection.id, "SELECT id FROM items", max_rows=25)
+    assert len(result.rows) == 25
+    assert result.truncated is False
+
+def test_execute_connection_row_limit_and_opt_out(db, target_connection):
+    target_connection.options = {"max_rows": 5}
+    db.commit()
+    service = QueryService(db)
+
+    assert len(service.execute(target_connection.id, "SELECT id FROM items").rows) == 5
+    assert len(service.execute(target_connection.id, "SELECT id FROM items", max_rows=50).rows) == 5
+    assert len(service.execute(target_connection.id, "SELECT id FROM items", apply_limit=False).rows) == 25
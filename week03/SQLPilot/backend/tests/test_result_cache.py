@@ -0,0 +1,72 @@
+import os
+import pickle
+import sqlite3
+import pytest
+from app.services.result_cache import ResultCache, result_cache
+from app.services.query_service import QueryService
+from app.services.metadata_service import MetadataService
+from app.services.security_service import SecurityService
+
+ROWS = [(1, "a"), (2, "b")]
+
+def test_fingerprint_ignores_formatting():
+    from app.services.result_cache import fingerprint_sql
+    security = SecurityService()
+    assert fingerprint_sql(security.parse("select id from items").expressions) == \
+        fingerprint_sql(security.parse("SELECT  id\nFROM items -- all").expressions)
+
+def test_cache_hit_and_ttl_expiry():
+    cache = ResultCache(max_bytes=1 << 20, max_entry_bytes=1 << 20)
+    cache.put(1, "fp", ["id", "name"], ROWS)
+    columns, rows, age = cache.get(1, "fp", ttl=60)
+    assert columns == ["id", "name"] and rows == ROWS and age >= 0
+    assert cache.get(1, "fp", ttl=-1) is None
+    assert cache.get(1, "fp", ttl=60) is None
+
+def test_memory_budget_spills_to_disk(tmp_path):
+    cache = ResultCache(max_bytes=100, max_entry_bytes=100, spill_dir=str(tmp_path))
+    cache.put(1, "first", ["id", "name"], ROWS)
+    cache.put(1, "second", ["id", "name"], ROWS)
+    assert len(list(tmp_path.iterdir())) == 1
+    assert cache.get(1, "first", ttl=60)[1] == ROWS
+
+    cache.invalidate(1)
+    assert cache.get(1, "first", ttl=60) is None
+    assert cache.get(1, "second", ttl=60) is None
+    assert list(tmp_path.iterdir()) == []
+
+def test_shared_spill_directory_is_not_trusted(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    # A file planted by another user must not be unpickled
+    (shared / "1-first.pkl").write_bytes(pickle.dumps((["id"], [(666,)], 0.0)))
+    cache = ResultCache(max_bytes=100, max_entry_bytes=100, spill_dir=str(shared))
+    assert cache.get(1, "first", ttl=float("inf")) is None
+
+    cache.put(1, "second", ["id", "name"], ROWS)
+    cache.put(1, "third", ["id", "name"], ROWS)
+    assert sorted(p.name for p in shared.iterdir()) == ["1-first.pkl"]
+
+def test_execute_uses_cache_until_reindex(db, target_connection):
+    result_cache.invalidate(target_connection.id)
+    service = QueryService(db)
+
+    first = service.execute(target_connection.id, "SELECT count(*) AS n FROM items", use_cache=True)
+    assert first.cache_hit is False
+
+    with sqlite3.connect(target_connection.connection_url.removeprefix("sqlite:///")) as conn:
+        conn.execute("INSERT INTO items (id, name) VALUES (100, 'new')")
+
+    second = service.execute(target_connection.id, "select count(*) as n from items", use_cache=True)
+    assert second.cache_hit is True
+    assert second.rows == first.rows
+
+    MetadataService(db).index_database(target_connection.id)
+    third = service.execute(target_connection.id, "SELECT count(*) AS n FROM items", use_cache=True)
+    assert third.cache_hit is False
+    assert third.rows == [(26,)]
+
+def test_execute_without_cache_reports_nothing(db, target_connection):
+    result = QueryService(db).execute(target_connection.id, "SELECT 1")
+    assert result.cache_hit is None
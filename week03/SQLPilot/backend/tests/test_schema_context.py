@@ -0,0 +1,70 @@
+import sqlite3
+from contextlib import contextmanager
+from sqlalchemy import event
+from app.core.config import settings
+from app.models.metadata import SchemaArtifact
+from app.services import schema_context
+from app.services.metadata_service import MetadataService
+from app.services.schema_context import SchemaContextService
+
+@contextmanager
+def recorded_statements(db):
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.get_bind(), "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", record)
+
+def target_path(connection):
+    return connection.connection_url.removeprefix("sqlite:///")
+
+def test_schema_prompt_is_built_at_index_time(db, target_connection):
+    MetadataService(db).index_database(target_connection.id)
+    assert {(a.kind, a.schema_version) for a in db.query(SchemaArtifact)} == {("ddl", 1), ("retrieval", 1)}
+
+    # Survives a restart: the in-memory copy is gone but the stored one is reused
+    schema_context.evict(target_connection.id)
+    service = SchemaContextService(db)
+    with recorded_statements(db) as statements:
+        ddl = service.get_ddl(target_connection.id)
+    assert ddl == "CREATE TABLE items (\n  id INTEGER PRIMARY KEY,\n  name TEXT\n);\n\n"
+    assert not any("table_metadata" in sql for sql in statements)
+
+def test_reindex_rebuilds_schema_prompt(db, target_connection):
+    indexer = MetadataService(db)
+    indexer.index_database(target_connection.id)
+    service = SchemaContextService(db)
+    service.get_ddl(target_connection.id)
+
+    with sqlite3.connect(target_path(target_connection)) as conn:
+        conn.execute("ALTER TABLE items ADD COLUMN price REAL")
+    indexer.index_database(target_connection.id)
+
+    assert {a.schema_version for a in db.query(SchemaArtifact)} == {2}
+    assert "price REAL" in service.get_ddl(target_connection.id)
+
+def test_unindexed_connection_has_no_prompt(db, target_connection):
+    assert SchemaContextService(db).get_ddl(target_connection.id) is None
+    assert db.query(SchemaArtifact).count() == 0
+
+def test_large_schema_prompt_only_has_relevant_tables(db, target_connection, monkeypatch):
+    with sqlite3.connect(target_path(target_connection)) as conn:
+        conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, email TEXT)")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id), total REAL)")
+        for i in range(10):
+            conn.execute(f"CREATE TABLE audit_log_{i} (id INTEGER PRIMARY KEY, event TEXT)")
+    MetadataService(db).index_database(target_connection.id)
+    monkeypatch.setattr(settings, "SCHEMA_PROMPT_FULL_MAX_TABLES", 5)
+    monkeypatch.setattr(settings, "SCHEMA_RETRIEVAL_TOP_K", 1)
+
+    prompt = SchemaContextService(db).get_prompt_schema(target_connection.id, "Total of all orders last month")
+    # The best match plus its join partner
+    assert prompt.startswith("CREATE TABLE orders")
+    assert "customer_id INTEGER REFERENCES customers(id)" in prompt
+    assert "CREATE TABLE customers" in prompt
+    assert "audit_log" not in prompt and "CREATE TABLE items" not in prompt
+
+    monkeypatch.setattr(settings, "SCHEMA_PROMPT_FULL_MAX_TABLES", 30)
+    assert "audit_log_9" in SchemaContextService(db).get_prompt_schema(target_connection.id, "orders")
@@ -0,0 +1,49 @@
+from app.core.config import settings
+from app.services.schema_retrieval import SchemaIndex, table_document, tokenize
+
+def make_index(backend=None):
+    documents = [
+        table_document("customers", "CREATE TABLE customers;", ["id", "email"], None, ["orders"]),
+        table_document("orders", "CREATE TABLE orders;", ["id", "customerId", "total"], None, ["customers"]),
+        table_document("shipments", "CREATE TABLE shipments;", ["id", "carrier"], "Parcels sent to buyers", []),
+    ]
+    return SchemaIndex.build(documents, backend)
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("orderItems customer_id Categories") == ["order", "item", "customer", "id", "category"]
+
+def test_search_returns_hits_then_neighbors():
+    index = SchemaIndex.loads(make_index().dumps())
+    assert index.search("customer emails", top_k=1) == ["customers", "orders"]
+    assert index.search("which carrier", top_k=3) == ["shipments"]
+    assert index.search("weather", top_k=3) == []
+
+def test_hub_tables_do_not_pull_in_every_neighbor(monkeypatch):
+    monkeypatch.setattr(settings, "SCHEMA_RETRIEVAL_NEIGHBORS_PER_TABLE", 2)
+    monkeypatch.setattr(settings, "SCHEMA_RETRIEVAL_MAX_NEIGHBORS", 3)
+    referencing = [f"log{i}" for i in range(10)] + ["accounts"]
+    documents = [
+        table_document("users", "CREATE TABLE users;", ["id", "email", "tenant_id"], None, ["tenants"] + referencing, ["tenants"]),
+        table_document("tenants", "CREATE TABLE tenants;", ["id", "plan"], None, ["users"]),
+        table_document("accounts", "CREATE TABLE accounts;", ["id", "user_id", "balance"], None, ["users"], ["users"]),
+    ] + [table_document(name, f"CREATE TABLE {name};", ["id", "user_id"], None, ["users"], ["users"]) for name in referencing[:-1]]
+    index = SchemaIndex.build(documents)
+    # The referenced table first, then the best scoring of the many referencing ones
+    assert index.search("users email", top_k=1) == ["users", "tenants", "accounts"]
+    assert index.search("email", top_k=1) == ["users", "tenants", "log0"]
+    monkeypatch.setattr(settings, "SCHEMA_RETRIEVAL_MAX_NEIGHBORS", 1)
+    assert index.search("users email", top_k=1) == ["users", "tenants"]
+
+class SynonymBackend:
+    """Embeds texts as one dimension per group of synonyms."""
+    groups = [("shipment", "delivery"), ("customer", "client")]
+
+    def embed(self, texts):
+        return [[float(any(word in text.lower() for word in group)) for group in self.groups] for text in texts]
+
+def test_embedding_backend_finds_semantic_matches():
+    backend = SynonymBackend()
+    index = make_index(backend)
+    assert all("vector" in doc for doc in index.documents)
+    # No lexical overlap with "shipments", but the embeddings agree
+    assert index.search("delivery status", top_k=1, backend=backend) == ["shipments"]
@@ -0,0 +1,109 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+import sqlglot
+from app.models.metadata import ColumnMetadata, TableMetadata
+from app.services import schema_context
+from app.services.llm_service import LLMService
+from app.services.metadata_service import MetadataService
+from app.services.schema_validator import SchemaValidationError, SchemaValidator
+
+@pytest.fixture
+def indexed(db, target_connection):
+    def table(name, columns, schema=None):
+        db.add(TableMetadata(
+            connection_id=target_connection.id,
+            schema_name=schema,
+            table_name=name,
+            columns=[ColumnMetadata(column_name=c, data_type="TEXT") for c in columns],
+        ))
+
+    table("users", ["id", "name", "email"])
+    table("orders", ["id", "user_id", "total"])
+    table("invoices", ["id", "order_id", "amount"], schema="billing")
+    target_connection.schema_version = 1
+    db.commit()
+    # Written directly rather than by re-indexing, which would drop cached copies
+    schema_context.evict(target_connection.id)
+    return target_connection
+
+def check(db, connection, sql):
+    return SchemaValidator(db).validate(connection.id, sqlglot.parse_one(sql))
+
+def test_valid_references_pass(db, indexed):
+    result = check(db, indexed, """
+        WITH big AS (SELECT user_id, SUM(total) AS spent FROM orders GROUP BY user_id)
+        SELECT u.name, b.spent FROM users u JOIN big b ON b.user_id = u.id
+        WHERE EXISTS (SELECT 1 FROM orders o WHERE o.user_id = u.id)
+        ORDER BY spent DESC
+    """)
+    assert result.errors == []
+    assert not result.rewritten
+
+def test_unknown_table_and_column_suggest_names(db, indexed):
+    errors = check(db, indexed, "SELECT u.emial FROM users u JOIN order o ON o.user_id = u.id").errors
+    assert {e["code"] for e in errors} == {"unknown_table", "unknown_column"}
+    column = next(e for e in errors if e["code"] == "unknown_column")
+    assert column["suggestions"] == ["email"]
+    table = next(e for e in errors if e["code"] == "unknown_table")
+    assert "orders" in table["suggestions"]
+
+def test_unqualified_columns_resolve_through_derived_tables(db, indexed):
+    assert check(db, indexed, "SELECT name FROM (SELECT name FROM users) AS t").errors == []
+    errors = check(db, indexed, "SELECT email FROM (SELECT name FROM users) AS t").errors
+    assert [e["column"] for e in errors] == ["email"]
+
+def test_tables_of_another_schema_are_qualified(db, indexed):
+    result = check(db, indexed, "SELECT amount FROM invoices WHERE order_id = 1")
+    assert result.errors == []
+    assert result.rewritten
+    assert result.expression.sql() == "SELECT amount FROM billing.invoices WHERE order_id = 1"
+
+def test_unindexed_connections_are_not_checked(db, target_connection):
+    assert check(db, target_connection, "SELECT * FROM anything").errors == []
+
+def answers(*sqls):
+    contents = iter(json.dumps({"sql": sql, "export_format": None}) for sql in sqls)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["messages"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=next(contents)))])
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return patch("app.services.llm_service.get_client", return_value=client), calls
+
+def test_invalid_sql_gets_one_repair_pass(db, target_connection, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("LLM_PROVIDER", "openai")
+    MetadataService(db).index_database(target_connection.id)
+
+    fake, calls = answers("SELECT title FROM items", "SELECT name FROM items")
+    with fake:
+        assert LLMService(db).generate_sql(target_connection.id, "Item names") == ("SELECT name FROM items", None)
+    assert len(calls) == 2
+    assert '"unknown_column"' in calls[1][-1]["content"]
+
+    fake, calls = answers("SELECT title FROM items", "SELECT label FROM items")
+    with fake, pytest.raises(SchemaValidationError, match="label"):
+        LLMService(db).generate_sql(target_connection.id, "Item titles")
+
+def test_set_operations_and_alias_column_lists(db, indexed):
+    assert check(db, indexed, "SELECT id FROM users UNION SELECT id FROM orders ORDER BY id").errors == []
+    errors = check(db, indexed, "SELECT id FROM users UNION SELECT id FROM orders ORDER BY total").errors
+    assert [e["column"] for e in errors] == ["total"]
+
+    assert check(db, indexed, "WITH t(a) AS (SELECT 1) SELECT a FROM t").errors == []
+    assert check(db, indexed, "SELECT a FROM (SELECT id FROM users) AS t(a)").errors == []
+    errors = check(db, indexed, "SELECT id FROM (SELECT id FROM users) AS t(a)").errors
+    assert [e["column"] for e in errors] == ["id"]
+
+def test_default_schema_qualifiers_resolve(db, indexed):
+    assert check(db, indexed, "SELECT u.id FROM main.users AS u").errors == []
+    errors = check(db, indexed, "SELECT id FROM public.users").errors
+    assert [e["code"] for e in errors] == ["unknown_table"]
+
+    indexed.db_type, indexed.connection_url = "postgres", "postgresql://u@h/db"
+    db.commit()
+    assert check(db, indexed, "SELECT id FROM public.users").errors == []
+    assert check(db, indexed, "SELECT amount FROM billing.invoices").errors == []
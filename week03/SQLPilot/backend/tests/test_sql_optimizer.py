@@ -0,0 +1,45 @@
+import sqlite3
+from app.services.metadata_service import MetadataService
+from app.services.query_service import QueryService
+
+def test_predicates_are_pushed_into_subqueries(db, target_connection):
+    MetadataService(db).index_database(target_connection.id)
+    sql = "SELECT * FROM (SELECT * FROM items) t WHERE t.id = 3"
+
+    result = QueryService(db).execute(target_connection.id, sql, optimize=True)
+    assert result.optimized
+    assert result.optimized_sql == (
+        "SELECT t.id AS id, t.name AS name FROM "
+        "(SELECT items.id AS id, items.name AS name FROM items AS items WHERE items.id = 3) AS t"
+    )
+    assert result.rows == QueryService(db).execute(target_connection.id, sql).rows == [(3, "item3")]
+
+def test_unoptimizable_statements_run_unchanged(db, target_connection):
+    MetadataService(db).index_database(target_connection.id)
+    service = QueryService(db)
+    # Unknown to the indexed schema
+    result = service.execute(target_connection.id, "SELECT * FROM sqlite_master", optimize=True)
+    assert result.optimized is False and result.optimized_sql is None
+    assert service.execute(target_connection.id, "SELECT 1").optimized is None
+
+def test_reindexing_refreshes_the_expanded_columns(db, target_connection):
+    indexer = MetadataService(db)
+    indexer.index_database(target_connection.id)
+    service = QueryService(db)
+    assert service.execute(target_connection.id, "SELECT * FROM items", optimize=True).columns == ["id", "name"]
+
+    with sqlite3.connect(target_connection.connection_url.removeprefix("sqlite:///")) as conn:
+        conn.execute("ALTER TABLE items ADD COLUMN price REAL")
+    indexer.index_database(target_connection.id)
+    assert service.execute(target_connection.id, "SELECT * FROM items", optimize=True).columns == ["id", "name", "price"]
+
+def test_sql_endpoint_returns_original_and_optimized_sql(client, db, target_connection):
+    MetadataService(db).index_database(target_connection.id)
+    sql = "SELECT name FROM items WHERE id IN (SELECT id FROM items WHERE name = 'item3')"
+    response = client.post("/api/v1/query/sql", json={"connection_id": target_connection.id, "sql": sql, "optimize": True})
+    body = response.json()
+    assert response.status_code == 200
+    assert body["optimized"] is True
+    assert body["original_sql"] == sql
+    assert "JOIN" in body["sql"]
+    assert body["data"] == [{"name": "item3"}]
@@ -4,3 +4,7 @@ export const getConnections = () => client.get('/connections/');
 export const createConnection = (data) => client.post('/connections/', data);
 export const getConnection = (id) => client.get(`/connections/${id}`);
 export const getConnectionSchema = (id) => client.get(`/connections/${id}/schema`);
+export const updateConnection = (id, data) => client.put(`/connections/${id}`, data);
+export const deleteConnection = (id) => client.delete(`/connections/${id}`);
+export const getIndexStatus = (id) => client.get(`/connections/${id}/index-status`);
+export const reindexConnection = (id) => client.post(`/connections/${id}/reindex`);
@@ -1,8 +1,70 @@
 import client from './client';
 
-export const executeSql = (connectionId, sql) => client.post('/query/sql', { connection_id: connectionId, sql });
-export const executeNlQuery = (connectionId, question) => client.post('/query/natural-language', { connection_id: connectionId, question });
+// Query results are requested in the compact columnar shape ({ columns, rows }) and expanded
+// here into row objects, so callers keep reading `data.data` as before.
+const COLUMNAR = { format: 'columnar' };
+
+const fromColumnar = (response) => {
+  // Queries moved to a background job by the cost guard come back as a plain 202 response
+  if (!response.data.columns) return response;
+  const { columns, rows, ...meta } = response.data;
+  const names = columns.map((col) => col.name);
+  const data = rows.length || meta.rows_affected == null
+    ? rows.map((row) => Object.fromEntries(names.map((name, i) => [name, row[i]])))
+    : [{ message: 'Query executed successfully', rows_affected: meta.rows_affected }];
+  response.data = { ...meta, columns, data };
+  return response;
+};
+
+export const executeSql = (connectionId, sql, { pageSize = null, queryId = null, explain = false } = {}) => client.post('/query/sql', {
+  connection_id: connectionId, sql, page_size: pageSize, query_id: queryId, explain,
+}, { params: COLUMNAR }).then(fromColumnar);
+export const fetchNextPage = (cursor, pageSize = 1000) => client.post(`/query/cursors/${cursor}/next`, null, {
+  params: { ...COLUMNAR, page_size: pageSize },
+}).then(fromColumnar);
+export const closeCursor = (cursor) => client.delete(`/query/cursors/${cursor}`);
+export const executeNlQuery = (connectionId, question, { queryId = null } = {}) => client.post('/query/natural-language', {
+  connection_id: connectionId, question, query_id: queryId,
+}, { params: COLUMNAR }).then(fromColumnar);
+
+// Streams /query/natural-language/stream, calling onEvent(event, data) for each Server-Sent Event
+// (stage, token, repair, sql, columns, rows, done, error). Abort the signal to stop the LLM call and the query.
+export const streamNlQuery = async (connectionId, question, { queryId = null, onEvent, signal } = {}) => {
+  const response = await fetch(`${client.defaults.baseURL}/query/natural-language/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify({ connection_id: connectionId, question, query_id: queryId }),
+    signal,
+  });
+  if (!response.ok) {
+    const body = await response.json().catch(() => ({}));
+    throw new Error(body.detail || response.statusText);
+  }
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    const blocks = buffer.split('\n\n');
+    buffer = blocks.pop();
+    for (const block of blocks) {
+      const fields = Object.fromEntries(block.split('\n').map((line) => {
+        const i = line.indexOf(': ');
+        return [line.slice(0, i), line.slice(i + 2)];
+      }));
+      onEvent(fields.event, JSON.parse(fields.data));
+    }
+  }
+};
+export const cancelQuery = (queryId) => client.delete(`/query/${queryId}`);
 export const exportData = (connectionId, sql, format) => client.post('/query/export', 
   { connection_id: connectionId, sql, format },
   { responseType: 'blob' }
 );
+
+export const submitQueryJob = (connectionId, sql) => client.post('/query/jobs/', { connection_id: connectionId, sql });
+export const getQueryJob = (jobId) => client.get(`/query/jobs/${jobId}`);
+export const getQueryJobRows = (jobId, offset = 0, limit = 1000) => client.get(`/query/jobs/${jobId}/rows`, { params: { offset, limit } });
+export const exportQueryJob = (jobId, format) => client.get(`/query/jobs/${jobId}/export`, { params: { format }, responseType: 'blob' });
+export const deleteQueryJob = (jobId) => client.delete(`/query/jobs/${jobId}`);